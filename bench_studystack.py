@@ -0,0 +1,215 @@
+"""Headless benchmarks for StudyStack deck operations.
+
+Generates synthetic decks in both supported JSON shapes ([q, a] pairs and
+{"question", "answer"} objects), times load, save, navigation, grading,
+search and restart at each size, and prints one JSON object per
+measurement so runs can be diffed across commits:
+
+    python bench_studystack.py --sizes 100 10000 1000000 --out bench.jsonl
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import studystack
+
+SIZES = [10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+SHAPES = ["list", "dict"]
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+
+
+# -------------------- Synthetic decks --------------------
+def make_deck_file(path, size, shape, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i in range(size):
+            q = f"Question {i}: what follows {rng.choice(WORDS)}?"
+            a = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+            item = [q, a] if shape == "list" else {"question": q, "answer": a}
+            f.write(("," if i else "") + json.dumps(item) + "\n")
+        f.write("]\n")
+
+
+def journal_for(path):
+    return studystack.DeckJournal(path, os.path.splitext(path)[0] + ".journal")
+
+
+# -------------------- Timing --------------------
+def measure(fn, repeat=1, memory=False):
+    """Run fn repeat times; return (best seconds, peak traced bytes or None)."""
+    best, peak = float("inf"), None
+    for _ in range(repeat):
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if memory:
+            peak = max(peak or 0, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        best = min(best, elapsed)
+    return best, peak
+
+
+def per_call(fn, calls):
+    def run():
+        for _ in range(calls):
+            fn()
+    seconds, _ = measure(run)
+    return seconds / calls
+
+
+# -------------------- Benchmarks --------------------
+def bench_deck(workdir, size, shape, args):
+    path = os.path.join(workdir, f"deck-{shape}-{size}.json")
+    make_deck_file(path, size, shape)
+    results = []
+
+    def emit(op, seconds, peak=None, **extra):
+        row = {"op": op, "size": size, "shape": shape, "seconds": seconds}
+        if peak is not None:
+            row["peak_bytes"] = peak
+        row.update(extra)
+        results.append(row)
+
+    seconds, peak = measure(lambda: studystack.safe_load_flashcards(journal_for(path)),
+                            args.repeat, args.memory)
+    emit("load_full", seconds, peak)
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        partial = studystack.JsonDeck(path)
+        best = min(best, time.perf_counter() - start)
+        partial.wait()      # don't leave a loader thread competing with later timings
+    emit("load_first_batch", best)
+
+    def stream_all():
+        studystack.JsonDeck(path).wait()
+    seconds, peak = measure(stream_all, args.repeat, args.memory)
+    emit("load_streamed", seconds, peak)
+
+    deck = studystack.JsonDeck(path)
+    deck.wait()
+
+    snapshot = path + ".copy"
+    shutil.copyfile(path, snapshot)
+    copy_journal = journal_for(snapshot)
+    seconds, peak = measure(lambda: studystack.safe_save_flashcards(deck.cards, copy_journal),
+                            args.repeat, args.memory)
+    emit("save_full", seconds, peak, bytes=os.path.getsize(snapshot))
+
+    # One journaled edit, undone right away so the deck size stays put.
+    journal = deck.journal
+    before = os.path.getsize(journal.journal) if os.path.exists(journal.journal) else 0
+
+    def edit():
+        deck.add("bench question", "bench answer")
+        deck.delete(len(deck) - 1)
+    emit("save_journal_edit", per_call(edit, 50),
+         bytes=(os.path.getsize(journal.journal) - before) // 100)
+
+    session = studystack.StudySession(deck)
+    for i in range(0, len(deck), 2):
+        deck.mark_answered(i, True)
+
+    def hop():
+        if session.next() is None:
+            session.card_index = 0
+    emit("navigate_next", per_call(hop, 2000))
+
+    def hop_back():
+        if session.prev() is None:
+            session.card_index = len(deck) - 1
+    emit("navigate_prev", per_call(hop_back, 2000))
+
+    emit("completion_check", per_call(session.finished, 2000))
+
+    matcher = studystack.AnswerMatcher()
+    cards = [deck[random.randrange(len(deck))] for _ in range(500)]
+    typed = [c["a"][:-1] + "x" if len(c["a"]) > 6 else c["a"] for c in cards]
+
+    def grade():
+        for card, text in zip(cards, typed):
+            matcher.check(text, card["a"])
+    studystack.answer_forms.cache_clear()
+    seconds, _ = measure(grade)
+    emit("grade_answer", seconds / len(cards))
+
+    seconds, peak = measure(lambda: studystack.TextIndex(deck.cards).build(len(deck)), 1, args.memory)
+    emit("search_index_build", seconds, peak)
+    deck.build_search(len(deck))
+    queries = ["question", "what fol", "alpha be", f"question {size // 2}"]
+    emit("search", per_call(lambda: [deck.search(q) for q in queries], 50) / len(queries))
+
+    seconds, peak = measure(session.restart, args.repeat, args.memory)
+    emit("restart", seconds, peak)
+    return results
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                             text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def check_scaling(results, limit):
+    """Fail when navigation at the largest size is more than limit x the smallest."""
+    failures = []
+    for op in ("navigate_next", "navigate_prev", "completion_check"):
+        rows = sorted((r for r in results if r["op"] == op), key=lambda r: r["size"])
+        if len(rows) >= 2 and rows[-1]["seconds"] > limit * rows[0]["seconds"]:
+            failures.append(f"{op}: {rows[0]['size']} -> {rows[-1]['size']} cards went from "
+                            f"{rows[0]['seconds'] * 1e6:.1f} us to {rows[-1]['seconds'] * 1e6:.1f} us")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark StudyStack deck operations")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=SHAPES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per timing; the best is kept")
+    parser.add_argument("--memory", action="store_true", help="record peak memory (slower)")
+    parser.add_argument("--out", help="append JSON lines here instead of stdout")
+    parser.add_argument("--max-nav-ratio", type=float,
+                        help="exit non-zero if navigation slows down more than this factor "
+                             "from the smallest to the largest size")
+    args = parser.parse_args(argv)
+
+    meta = {"revision": git_revision(), "python": platform.python_version(),
+            "platform": platform.platform(), "timestamp": int(time.time())}
+    out = open(args.out, "a", encoding="utf-8") if args.out else sys.stdout
+    results = []
+    with tempfile.TemporaryDirectory(prefix="studystack-bench-") as workdir:
+        for size in sorted(args.sizes):
+            for shape in args.shapes:
+                for row in bench_deck(workdir, size, shape, args):
+                    row.update(meta)
+                    out.write(json.dumps(row) + "\n")
+                    out.flush()
+                    results.append(row)
+    if args.out:
+        out.close()
+
+    if args.max_nav_ratio:
+        failures = check_scaling(results, args.max_nav_ratio)
+        for line in failures:
+            print("SCALING REGRESSION " + line, file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
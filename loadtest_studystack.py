@@ -0,0 +1,141 @@
+"""Load test for the StudyStack classroom quiz server.
+
+Starts `studystack.py --serve` on a free localhost port with a synthetic
+deck, then connects many simulated students at once. Each joins, answers
+cards (some right, some wrong) and checks the leaderboard now and then,
+like the Tk client does. Per-request latency percentiles are printed as
+one JSON object per request type, so runs can be diffed across commits:
+
+    python loadtest_studystack.py --clients 200 --answers 50 --out load.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_studystack import git_revision, make_deck_file
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# -------------------- Server --------------------
+def start_server(deck_path):
+    """Run the server in a child process; returns (process, host, port)."""
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "studystack.py"), "--deck", deck_path,
+                             "--serve", "127.0.0.1:0"],
+                            stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(deck_path))
+    line = proc.stdout.readline()       # "Serving N cards on host:port"
+    if not line.startswith("Serving"):
+        proc.kill()
+        raise RuntimeError(f"server did not start: {line!r}")
+    host, port = line.split()[-1].rsplit(":", 1)
+    # Keep reading the console leaderboard so a full pipe never stalls the server.
+    threading.Thread(target=proc.stdout.read, daemon=True).start()
+    return proc, host, int(port)
+
+
+# -------------------- Clients --------------------
+async def student(host, port, n, args, latencies, rng):
+    """One simulated student; appends (op, seconds) to latencies."""
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    latencies.append(("connect", time.perf_counter() - start))
+
+    async def request(op, **fields):
+        start = time.perf_counter()
+        writer.write(json.dumps({"op": op, **fields}).encode("utf-8") + b"\n")
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        latencies.append((op, time.perf_counter() - start))
+        return reply
+
+    try:
+        card = (await request("join", name=f"student-{n}"))["card"]
+        for i in range(args.answers):
+            if card is None:
+                break
+            if args.think:
+                await asyncio.sleep(rng.uniform(0, 2 * args.think))
+            # Right answers need the card; the server sends it back on a wrong one.
+            text = args.known.get(card["q"], "no idea") if rng.random() < args.accuracy else "no idea"
+            card = (await request("answer", text=text))["card"]
+            if i % args.board_every == 0:
+                await request("leaderboard")
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def run_clients(host, port, args):
+    latencies = []
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    await asyncio.gather(*(student(host, port, n, args, latencies, random.Random(rng.random()))
+                           for n in range(args.clients)))
+    return latencies, time.perf_counter() - start
+
+
+def summarize(latencies, seconds, args):
+    by_op = {}
+    for op, s in latencies:
+        by_op.setdefault(op, []).append(s)
+    by_op["all"] = [s for op, s in latencies if op != "connect"]
+    rows = []
+    for op, values in sorted(by_op.items()):
+        values.sort()
+        rows.append({"op": op, "clients": args.clients, "requests": len(values),
+                     "per_second": len(values) / seconds if seconds else 0.0,
+                     "p50_ms": percentile(values, 0.50) * 1e3, "p90_ms": percentile(values, 0.90) * 1e3,
+                     "p99_ms": percentile(values, 0.99) * 1e3, "max_ms": values[-1] * 1e3})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the StudyStack classroom server")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--answers", type=int, default=50, help="answers per client")
+    parser.add_argument("--cards", type=int, default=1000, help="synthetic deck size")
+    parser.add_argument("--accuracy", type=float, default=0.7, help="share of answers given right")
+    parser.add_argument("--board-every", type=int, default=5, help="leaderboard request every N answers")
+    parser.add_argument("--think", type=float, default=0.0, help="mean seconds a student thinks per card")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="append JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    meta = {"revision": git_revision(), "python": platform.python_version(),
+            "platform": platform.platform(), "timestamp": int(time.time())}
+    with tempfile.TemporaryDirectory(prefix="studystack-load-") as workdir:
+        deck_path = os.path.join(workdir, "deck.json")
+        make_deck_file(deck_path, args.cards, "list", args.seed)
+        with open(deck_path, encoding="utf-8") as f:
+            args.known = dict(json.load(f))
+        proc, host, port = start_server(deck_path)
+        try:
+            latencies, seconds = asyncio.run(run_clients(host, port, args))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    out = open(args.out, "a", encoding="utf-8") if args.out else sys.stdout
+    for row in summarize(latencies, seconds, args):
+        row.update(meta)
+        out.write(json.dumps(row) + "\n")
+    if args.out:
+        out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
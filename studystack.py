@@ -1,9 +1,28 @@
-import tkinter as tk
-from tkinter import messagebox
+import bisect
+import codecs
+import collections
+import csv
+import hashlib
+import heapq
+import itertools
 import json
+import math
+import mmap
 import os
+import queue
 import random
+import re
+import shutil
+import subprocess
+import sys
 import threading
+import unicodedata
+import wave
+import time
+from array import array
+from functools import lru_cache, partial, wraps
+
+LAUNCHED = time.perf_counter()  # origin of the --profile-startup timings
 
 # Try importing winsound (Windows)py
 try:
@@ -13,8 +32,37 @@ except Exception:
     winsound = None
     WINSOUND_AVAILABLE = False
 
+# tkinter is only imported once the GUI starts, so headless tools that just
+# read or grade decks don't pay for it.
+tk = None
+messagebox = None
+
+def _load_tk():
+    global tk, messagebox
+    if tk is None:
+        import tkinter
+        from tkinter import messagebox as tk_messagebox
+        tk, messagebox = tkinter, tk_messagebox
+    return tk
+
+def report_error(title, message):
+    if messagebox is not None:
+        messagebox.showerror(title, message)
+    else:
+        print(f"{title}: {message}", file=sys.stderr)
+
 # -------------------- Constants --------------------
 FLASH_JSON = "flashcards.json"
+FLASH_JOURNAL = "flashcards.journal"
+FLASH_DB = "flashcards.db"
+WORKSPACE_DIR = "decks"       # every deck file in here shows up in the intro's deck picker
+DECK_EXTENSIONS = (".json", ".db", ".sqlite", ".sqlite3")
+DECK_CACHE_BYTES = 256 << 20  # open decks kept in memory before the least recent is closed
+CARD_OVERHEAD_BYTES = 250     # rough in-memory cost of one JSON-backed card besides its text
+JOURNAL_COMPACT_EVERY = 500   # journal records before folding into the snapshot
+JOURNAL_COMPACT_BYTES = 8 << 20   # ...or this much journal, e.g. after a bulk import
+DEDUPE_MATCH_ANSWER = False   # True: a duplicate must repeat the answer as well as the question
+CHECKPOINT_EVERY = 1000       # session log lines before a fresh session snapshot
 BGM_FILE = "bgm.wav"
 
 # Color scheme
@@ -27,62 +75,3455 @@ TEXT_COLOR = "#000000"
 BUTTON_COLOR = "#F7D6E0"
 SUBMIT_COLOR = "#3498DB"
 
-FONT_STYLE = ("Helvetica", 18, "bold")
-CARD_FONT_STYLE = ("Helvetica", 23, "italic")
-SCORE_FONT_STYLE = ("Helvetica", 15)
+FONT_STYLE = ("Helvetica", 18, "bold")
+CARD_FONT_STYLE = ("Helvetica", 23, "italic")
+SCORE_FONT_STYLE = ("Helvetica", 15)
+
+QUESTION_COLORS = [
+    "#F4DF26", "#F79CA6", "#B4E57C",
+    "#C2AAEE", "#FCD191", "#F79ABA", "#C7EE9A"
+]
+
+FALLBACK_FLASHCARDS = [
+    ("What is Python?", "A high-level programming language."),
+    ("What is a variable?", "A container that stores data."),
+    ("What is a loop?", "A structure that repeats actions."),
+    ("What is a function?", "A reusable block of code."),
+    ("What planet is known as the Red Planet?", "Mars"),
+    ("What is H2O?", "Water"),
+]
+
+# -------------------- Instrumentation --------------------
+class Histogram:
+    """Latency histogram with power-of-two microsecond buckets.
+
+    Bucket i counts samples under 2**i microseconds (and at least
+    2**(i-1)), so percentiles are upper bounds within a factor of two;
+    count, total and max are exact.
+    """
+
+    __slots__ = ("count", "total", "max", "buckets")
+    BUCKETS = 32    # the last one holds everything over ~18 minutes
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * self.BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        """Seconds below which about q (0..1) of the samples fall."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+
+class Stats:
+    """Process-wide latency histograms, counters and bytes written.
+
+    Off by default. While off, timed() wrappers cost one attribute check
+    and observe()/count()/wrote() return at once, so the hooks can stay
+    on hot paths. Safe to call from any thread.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = collections.Counter()
+            self.written = collections.Counter()
+            self.stalls = collections.deque(maxlen=50)    # (wall time, seconds late)
+            self.since = time.time()
+
+    def enable(self, on=True):
+        self.enabled = on
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.add(seconds)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += n
+
+    def wrote(self, name, nbytes):
+        if self.enabled:
+            with self.lock:
+                self.written[name] += nbytes
+
+    def stall(self, seconds):
+        if self.enabled:
+            with self.lock:
+                self.stalls.append((time.time(), seconds))
+
+    def timed(self, name):
+        """Decorator recording each call's duration under name."""
+        def wrap(fn):
+            @wraps(fn)
+            def timed_call(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return timed_call
+        return wrap
+
+    # ---- reporting ----
+    def snapshot(self):
+        """Everything recorded so far as plain JSON-ready data."""
+        with self.lock:
+            ops = {name: {"count": h.count, "total_s": h.total,
+                          "mean_ms": h.total / h.count * 1e3 if h.count else 0.0,
+                          "p50_ms": h.percentile(0.5) * 1e3, "p95_ms": h.percentile(0.95) * 1e3,
+                          "p99_ms": h.percentile(0.99) * 1e3, "max_ms": h.max * 1e3}
+                   for name, h in sorted(self.histograms.items())}
+            return {"since": self.since, "now": time.time(), "ops": ops,
+                    "counters": dict(self.counters), "bytes": dict(self.written),
+                    "stalls": [{"at": at, "ms": late * 1e3} for at, late in self.stalls]}
+
+    CSV_FIELDS = ["kind", "name", "count", "total_s", "mean_ms", "p50_ms", "p95_ms", "p99_ms",
+                  "max_ms", "value"]
+
+    def export(self, path):
+        """Write a snapshot to path: CSV for a .csv name, JSON otherwise."""
+        data = self.snapshot()
+        if os.path.splitext(path)[1].lower() == ".csv":
+            def write(f):
+                writer = csv.DictWriter(f, self.CSV_FIELDS)
+                writer.writeheader()
+                for name, row in data["ops"].items():
+                    writer.writerow({"kind": "latency", "name": name, **row})
+                for name, n in sorted(data["counters"].items()):
+                    writer.writerow({"kind": "counter", "name": name, "value": n})
+                for name, n in sorted(data["bytes"].items()):
+                    writer.writerow({"kind": "bytes", "name": name, "value": n})
+            atomic_write(path, write, newline="")
+        else:
+            atomic_write(path, lambda f: json.dump(data, f, indent=1))
+
+
+STATS = Stats()
+
+
+class LagMonitor:
+    """Watches the Tk event loop for stalls.
+
+    An after() tick is scheduled every INTERVAL_MS; how late it actually
+    runs is how long the loop was busy. Lateness goes into the "ui.lag"
+    histogram and anything past STALL_MS is also logged as a stall. Only
+    runs while STATS is enabled.
+    """
+
+    INTERVAL_MS = 100
+    STALL_MS = 250
+
+    def __init__(self, root):
+        self.root = root
+        self.job = None
+        self.due = 0.0
+
+    def start(self):
+        if self.job is None and STATS.enabled:
+            self.due = time.perf_counter() + self.INTERVAL_MS / 1000
+            self.job = self.root.after(self.INTERVAL_MS, self._tick)
+
+    def stop(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def _tick(self):
+        self.job = None
+        if not STATS.enabled:
+            return
+        late = max(0.0, time.perf_counter() - self.due)
+        STATS.observe("ui.lag", late)
+        if late * 1000 > self.STALL_MS:
+            STATS.count("ui.stalls")
+            STATS.stall(late)
+        self.start()
+
+
+class StartupProfile:
+    """Phase timings of one launch, for --profile-startup.
+
+    mark(phase) closes the phase that ran since the previous mark, and
+    milestone() notes a point such as first paint. Times count from
+    LAUNCHED, when this module started running, so interpreter start-up
+    and a one-file build's unpacking come before zero. Phases also go to
+    STATS as "startup.<phase>".
+    """
+
+    def __init__(self, origin=None):
+        self.origin = LAUNCHED if origin is None else origin
+        self.last = self.origin
+        self.phases = []        # (phase, start, seconds), start relative to origin
+        self.milestones = []    # (name, seconds since origin)
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, self.last - self.origin, now - self.last))
+        STATS.observe("startup." + phase, now - self.last)
+        self.last = now
+
+    def milestone(self, name):
+        self.milestones.append((name, time.perf_counter() - self.origin))
+
+    def report(self, out=None):
+        print(f"{'phase':<12}{'start ms':>10}{'took ms':>10}", file=out)
+        for phase, start, seconds in self.phases:
+            print(f"{phase:<12}{start * 1e3:>10.1f}{seconds * 1e3:>10.1f}", file=out)
+        for name, at in self.milestones:
+            print(f"{name}: {at * 1e3:.1f} ms", file=out)
+
+# -------------------- Card Model --------------------
+class Card:
+    """One flashcard, slotted to keep large decks small.
+
+    Supports the dict-style access the app has always used
+    (card["q"], card.get("answered_correctly"), card.pop(...)); an unset
+    answered_correctly slot behaves like a missing key.
+    """
+
+    __slots__ = ("q", "a", "answered", "answered_correctly")
+    KEYS = __slots__
+
+    def __init__(self, q, a, answered=False):
+        self.q = q
+        # Short answers ("Mars", "True") repeat a lot across a deck.
+        self.a = sys.intern(a) if len(a) <= 32 else a
+        self.answered = answered
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.KEYS and hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.KEYS else default
+
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        if key == "answered_correctly":
+            del self.answered_correctly
+        return value
+
+    def keys(self):
+        return [k for k in self.KEYS if hasattr(self, k)]
+
+    def __repr__(self):
+        return f"Card({self.q!r}, {self.a!r}, answered={self.answered!r})"
+
+
+class SqliteCard(Card):
+    __slots__ = ("id",)
+    KEYS = Card.KEYS + ("id",)
+
+    def __init__(self, rid, q, a, answered=False):
+        Card.__init__(self, q, a, answered)
+        self.id = rid
+
+# -------------------- Helpers --------------------
+def _parse_card_item(item):
+    if isinstance(item, (list, tuple)) and len(item) >= 2:
+        return str(item[0]), str(item[1])
+    if isinstance(item, dict):
+        q = item.get("question") or item.get("q")
+        a = item.get("answer") or item.get("a")
+        if q and a:
+            return str(q), str(a)
+    return None
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """Yield the items of a top-level JSON array as they are read from f."""
+    decoder = json.JSONDecoder()
+    buf, pos = f.read(chunk_size), 0
+    started = False
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or buf[pos] == "," or (buf[pos] == "[" and not started)):
+            started = started or buf[pos] == "["
+            pos += 1
+        if pos >= len(buf):
+            more = f.read(chunk_size)
+            if not more:
+                return
+            buf, pos = buf[pos:] + more, 0
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            more = f.read(chunk_size)
+            if not more:
+                raise
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield item
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+class MappedText:
+    """Read-only text view of a memory-mapped file, for iter_json_array.
+
+    Pages come straight from the OS page cache, so reopening a deck that
+    was read recently costs no disk I/O and no second buffered copy.
+    """
+
+    def __init__(self, path, encoding="utf-8"):
+        self.f = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.map = b""      # empty files can't be mapped
+        self.pos = 0
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+
+    def read(self, size=-1):
+        end = len(self.map) if size < 0 else min(self.pos + size, len(self.map))
+        chunk, self.pos = self.map[self.pos:end], end
+        return self.decoder.decode(chunk, final=end == len(self.map))
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.f.close()
+
+def _iter_card_pairs(items):
+    # Keep whatever parsed before a corrupt tail, like the old bare except did.
+    try:
+        for item in items:
+            pair = _parse_card_item(item)
+            if pair:
+                yield pair
+    except:
+        return
+
+def atomic_write(path, write, newline=None):
+    """Write path via write(f) on a temp file, then swap it in with os.replace.
+
+    newline is passed to open(); use "" for the csv module.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline=newline) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+@STATS.timed("deck.load")
+def safe_load_flashcards(journal=None):
+    journal = journal or DeckJournal()
+    cards = [Card(q, a) for q, a in journal.load()]
+    if not cards:
+        for q, a in FALLBACK_FLASHCARDS:
+            cards.append(Card(q, a))
+        # The fallback deck only exists in memory, so the first edit has to
+        # write a full snapshot instead of a journal record.
+        journal.stale = True
+    return cards
+
+@STATS.timed("deck.save")
+def safe_save_flashcards(cards, journal=None):
+    journal = journal or DeckJournal()
+    try:
+        journal.write_snapshot(cards)
+    except Exception as e:
+        report_error("Error", f"Could not save:\n{e}")
+
+# -------------------- Deck Journal --------------------
+class DeckJournal:
+    """Append-only edit log layered over the FLASH_JSON snapshot.
+
+    Every add/delete is one JSON line tagged with a sequence number, so an
+    edit costs a single small append no matter how big the deck is. Once
+    enough records pile up, a background thread folds them into a new
+    snapshot. The snapshot starts with a {"seq": N} header (ignored by the
+    card parser) so records already folded in are skipped on replay, which
+    keeps a crash between the two atomic renames harmless.
+    """
+
+    def __init__(self, snapshot=FLASH_JSON, journal=FLASH_JOURNAL):
+        self.snapshot = snapshot
+        self.journal = journal
+        self.seq = 0
+        self.pending = []       # (seq, line) records not folded into the snapshot yet
+        self.stale = False      # snapshot does not reflect the deck in memory
+        self.generation = 0
+        self.compacting = False
+        self.lock = threading.Lock()
+
+    # ---- reading ----
+    def _read_journal(self, base, upto=None):
+        records = []
+        if not os.path.exists(self.journal):
+            return records
+        with open(self.journal, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    n = int(rec["n"])
+                except:
+                    continue    # torn write from a crash
+                if n <= base or (upto is not None and n > upto):
+                    continue
+                records.append((n, line if line.endswith("\n") else line + "\n", rec))
+        return records
+
+    @staticmethod
+    def _fold(pairs, records):
+        """Stream snapshot pairs with the journal applied on the fly.
+
+        A delete removes the leftmost live copy of its card, so the first
+        k snapshot copies of a pair deleted k times are dropped as they
+        stream past; what is left of the journal is settled at the end.
+        """
+        def batch(rec):
+            if "cards" in rec:
+                return [(str(q), str(a)) for q, a in rec["cards"]]
+            return [(str(rec.get("q", "")), str(rec.get("a", "")))]
+
+        dels = {}
+        for _, _, rec in records:
+            if rec.get("op") == "del":
+                for pair in batch(rec):
+                    dels[pair] = dels.get(pair, 0) + 1
+        seen = {}
+        for pair in pairs:
+            if pair in dels:
+                seen[pair] = seen.get(pair, 0) + 1
+                if seen[pair] <= dels[pair]:
+                    continue
+            yield pair
+
+        added, slots = [], {}
+        for _, _, rec in records:
+            if rec.get("op") == "add":
+                for pair in batch(rec):
+                    slots.setdefault(pair, []).append(len(added))
+                    added.append(pair)
+            elif rec.get("op") == "del":
+                for pair in batch(rec):
+                    if seen.get(pair, 0) > 0:
+                        seen[pair] -= 1
+                    elif slots.get(pair):
+                        added[slots[pair].pop(0)] = None
+        for pair in added:
+            if pair is not None:
+                yield pair
+
+    def iter_pairs(self, upto=None):
+        """Yield (q, a) for the current deck while the snapshot is parsed.
+
+        Without upto this also syncs the journal bookkeeping, so it must be
+        started before any new edits are recorded.
+        """
+        f, items, base = None, iter(()), 0
+        if os.path.exists(self.snapshot):
+            try:
+                f = MappedText(self.snapshot)
+                items = iter_json_array(f)
+                first = next(items, None)
+                if isinstance(first, dict) and "seq" in first and not (first.get("q") or first.get("question")):
+                    base = int(first["seq"])
+                elif first is not None:
+                    items = itertools.chain([first], items)
+            except:
+                items = iter(())
+        try:
+            records = self._read_journal(base, upto)
+        except:
+            records = []
+        if upto is None:
+            with self.lock:
+                self.pending = [(n, line) for n, line, _ in records]
+                self.seq = max([base] + [n for n, _, _ in records])
+                self.stale = False
+        try:
+            yield from self._fold(_iter_card_pairs(items), records)
+        finally:
+            if f:
+                f.close()
+
+    def load(self):
+        return list(self.iter_pairs())
+
+    # ---- writing ----
+    def _dump_snapshot(self, f, pairs, seq):
+        f.write("[\n")
+        f.write(json.dumps({"seq": seq}))
+        for q, a in pairs:
+            f.write(",\n")
+            f.write(json.dumps([q, a], ensure_ascii=False))
+        f.write("\n]\n")
+
+    def _rewrite_journal(self):
+        if self.pending:
+            atomic_write(self.journal, lambda f: f.writelines(l for _, l in self.pending))
+        elif os.path.exists(self.journal):
+            os.remove(self.journal)
+
+    def write_snapshot(self, cards):
+        pairs = [(c["q"], c["a"]) for c in cards if c is not None]
+        with self.lock:
+            self.generation += 1
+            atomic_write(self.snapshot, lambda f: self._dump_snapshot(f, pairs, self.seq))
+            if STATS.enabled:
+                STATS.wrote("deck.snapshot", os.path.getsize(self.snapshot))
+            self.pending = []
+            self._rewrite_journal()
+            self.stale = False
+
+    @STATS.timed("deck.journal_append")
+    def _append(self, body):
+        with self.lock:
+            self.seq += 1
+            line = json.dumps({"n": self.seq, **body}, ensure_ascii=False) + "\n"
+            with open(self.journal, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            STATS.wrote("deck.journal", len(line))
+            self.pending.append((self.seq, line))
+        self.maybe_compact()
+
+    def _record(self, cards, body):
+        try:
+            if self.stale:
+                self.write_snapshot(cards)
+            else:
+                self._append(body)
+        except Exception as e:
+            report_error("Error", f"Could not save:\n{e}")
+
+    def record_add(self, cards, card):
+        self._record(cards, {"op": "add", "q": card["q"], "a": card["a"]})
+
+    def record_add_many(self, cards, added):
+        # One record per batch keeps bulk imports to a single append.
+        self._record(cards, {"op": "add", "cards": [[c["q"], c["a"]] for c in added]})
+
+    def record_delete(self, cards, card):
+        self._record(cards, {"op": "del", "q": card["q"], "a": card["a"]})
+
+    def record_delete_many(self, cards, removed):
+        self._record(cards, {"op": "del", "cards": [[c["q"], c["a"]] for c in removed]})
+
+    # ---- compaction ----
+    def maybe_compact(self):
+        if self.compacting:
+            return
+        if len(self.pending) < JOURNAL_COMPACT_EVERY and \
+                sum(len(line) for _, line in self.pending) < JOURNAL_COMPACT_BYTES:
+            return
+        self.compacting = True
+        with self.lock:
+            upto, gen = self.seq, self.generation
+        threading.Thread(target=self._compact, args=(upto, gen), daemon=True).start()
+
+    def _compact(self, upto, gen):
+        try:
+            pairs = list(self.iter_pairs(upto))
+            tmp = self.snapshot + ".compact"
+            with open(tmp, "w", encoding="utf-8") as f:
+                self._dump_snapshot(f, pairs, upto)
+                f.flush()
+                os.fsync(f.fileno())
+            with self.lock:
+                if gen != self.generation:
+                    # A full save landed while we were folding; ours is older.
+                    os.remove(tmp)
+                    return
+                os.replace(tmp, self.snapshot)
+                if STATS.enabled:
+                    STATS.wrote("deck.snapshot", os.path.getsize(self.snapshot))
+                self.pending = [(n, l) for n, l in self.pending if n > upto]
+                self._rewrite_journal()
+        except:
+            pass    # the journal still holds every record, nothing is lost
+        finally:
+            self.compacting = False
+
+# -------------------- Quiz Order --------------------
+class LazyPermutation:
+    """Seeded bijection on range(n), evaluated one index at a time.
+
+    A four-round Feistel network over the smallest even bit width that
+    covers n, cycle-walking until the result lands inside range(n); the
+    inverse runs the rounds backwards. Nothing O(n) is ever built, and the
+    same (n, seed) always gives the same order.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, n, seed):
+        self.n = n
+        bits = max(2, (n - 1).bit_length())
+        self.half = (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
+        rng = random.Random(seed)
+        self.keys = [rng.getrandbits(64) for _ in range(self.ROUNDS)]
+
+    def _f(self, x, key):
+        h = ((x ^ key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        return (h ^ (h >> 29)) & self.mask
+
+    def __getitem__(self, i):
+        half, mask, f = self.half, self.mask, self._f
+        while True:
+            left, right = i >> half, i & mask
+            for key in self.keys:
+                left, right = right, left ^ f(right, key)
+            i = (left << half) | right
+            if i < self.n:
+                return i
+
+    def index(self, value):
+        half, mask, f = self.half, self.mask, self._f
+        while True:
+            left, right = value >> half, value & mask
+            for key in reversed(self.keys):
+                left, right = right ^ f(left, key), left
+            value = (left << half) | right
+            if value < self.n:
+                return value
+
+class QuizOrder:
+    """Quiz position -> storage index, computed on demand.
+
+    Positions below base go through a LazyPermutation of range(base);
+    positions past it (cards added since) map to themselves. A delete
+    moves the last position into the hole, and those exceptions are kept
+    in `moved` (with `where` as its inverse), so adds, deletes and a
+    whole new order are all O(1) apart from storage indices listed as
+    dead. With track set, `touched` collects positions whose mapping
+    changed, for backends that persist the order.
+    """
+
+    def __init__(self, size, seed, base=None, dead=(), track=False):
+        self.seed = seed
+        self.base = size if base is None else base
+        self.perm = LazyPermutation(self.base, seed)
+        self.size = size
+        self.moved = {}
+        self.where = {}
+        self.touched = set() if track else None
+        for s in dead:
+            p = self.index(s)
+            if p is not None:
+                self.remove(p)
+
+    @classmethod
+    def restore(cls, size, seed, base, moved, track=False):
+        """Rebuild an order saved as (size, seed, base, moved)."""
+        order = cls(base, seed, track=track)
+        order.size = size
+        order.moved = dict(moved)
+        order.where = {s: p for p, s in order.moved.items()}
+        return order
+
+    def __len__(self):
+        return self.size
+
+    def _natural(self, p):
+        return self.perm[p] if p < self.base else p
+
+    def __getitem__(self, p):
+        s = self.moved.get(p)
+        return self._natural(p) if s is None else s
+
+    def index(self, s):
+        """Position of storage index s, or None if it is not in the quiz."""
+        p = self.where.get(s)
+        if p is not None:
+            return p
+        p = self.perm.index(s) if s < self.base else s
+        return p if p < self.size and p not in self.moved else None
+
+    def _put(self, p, s):
+        old = self.moved.pop(p, None)
+        if old is not None and self.where.get(old) == p:
+            del self.where[old]
+        self.where.pop(s, None)
+        if s != self._natural(p):
+            self.moved[p] = s
+            self.where[s] = p
+        if self.touched is not None:
+            self.touched.add(p)
+
+    def append(self, s):
+        p = self.size
+        self.size += 1
+        self._put(p, s)
+        return p
+
+    def extend(self, start, count):
+        """Append storage indices start .. start + count - 1."""
+        if start == self.size >= self.base and not self.moved:
+            self.size += count      # nothing was ever moved: identity tail
+        else:
+            for s in range(start, start + count):
+                self.append(s)
+
+    def remove(self, p):
+        """Drop position p, moving the last position into the hole."""
+        last = self.size - 1
+        gone = self[p]      # storage index leaving the quiz
+        if p != last:
+            self._put(p, self[last])
+        old = self.moved.pop(last, None)
+        if old is not None and self.where.get(old) == last:
+            del self.where[old]
+        if self.touched is not None:
+            self.touched.add(last)
+        self.size -= 1
+        return gone
+
+    def swap(self, p, q):
+        sp, sq = self[p], self[q]
+        self._put(p, sq)
+        self._put(q, sp)
+
+    def pin(self, p, s):
+        """Make position p hold storage index s, swapping with its old spot."""
+        q = self.index(s)
+        if q is not None and q != p:
+            self.swap(p, q)
+
+# -------------------- Unanswered Index --------------------
+class UnansweredIndex:
+    """Fenwick tree over quiz positions counting the answered ones.
+
+    Open counts are a node's span minus its answered count, and only nodes
+    covering an answered position are stored, so reset() is O(1) and
+    memory follows the number of answered cards rather than the deck.
+    Finding the nearest unanswered card on either side of a position, and
+    flipping one card's state, are O(log n).
+    """
+
+    def __init__(self, size=0):
+        self.reset(size)
+
+    def reset(self, size):
+        self.size = size
+        self.closed = set()
+        self.tree = {}
+
+    def rebuild(self, flags):
+        flags = list(flags)
+        self.reset(len(flags))
+        for i, flag in enumerate(flags):
+            if not flag:
+                self.set(i, 0)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def total(self):
+        return self.size - len(self.closed)
+
+    def _add(self, index, delta):
+        tree, n, i = self.tree, self.size, index + 1
+        while i <= n:
+            value = tree.get(i, 0) + delta
+            if value:
+                tree[i] = value
+            else:
+                del tree[i]
+            i += i & -i
+
+    def _closed_prefix(self, count):
+        total, tree = 0, self.tree
+        while count > 0:
+            total += tree.get(count, 0)
+            count &= count - 1
+        return total
+
+    def prefix(self, count):
+        """Number of open cards among the first count positions."""
+        return count - self._closed_prefix(count)
+
+    def set(self, index, value):
+        if value and index in self.closed:
+            self.closed.remove(index)
+            self._add(index, -1)
+        elif not value and index not in self.closed:
+            self.closed.add(index)
+            self._add(index, 1)
+
+    def append(self, value=1):
+        n = self.size = self.size + 1
+        if self.closed:
+            # Node n spans positions n - lowbit(n) .. n - 1.
+            covered = self._closed_prefix(n - 1) - self._closed_prefix(n - (n & -n))
+            if covered:
+                self.tree[n] = covered
+        if not value:
+            self.set(n - 1, 0)
+
+    def extend(self, values):
+        values = list(values)
+        if not self.closed and all(values):
+            self.size += len(values)
+            return
+        for value in values:
+            self.append(value)
+
+    def pop(self):
+        # The last node only ever covers itself among the remaining ones.
+        self.tree.pop(self.size, None)
+        self.closed.discard(self.size - 1)
+        self.size -= 1
+
+    def is_open(self, index):
+        return index not in self.closed
+
+    def find(self, k):
+        """0-based position of the k-th open card (1-based k)."""
+        pos, tree, n = 0, self.tree, self.size
+        step = 1 << n.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= n:
+                here = (nxt & -nxt) - tree.get(nxt, 0)
+                if here < k:
+                    pos = nxt
+                    k -= here
+            step >>= 1
+        return pos
+
+    def nearest(self, index, step=1):
+        n = self.size
+        if step > 0:
+            k = self.prefix(min(index + 1, n))
+            return self.find(k + 1) if k < self.total else None
+        k = self.prefix(min(max(index, 0), n))
+        return self.find(k) if k > 0 else None
+
+# -------------------- Duplicate Index --------------------
+def _dedupe_text(text, normalize=None):
+    # Questions that are all punctuation still need a key of their own.
+    return (normalize or normalize_answer)(text) or text.strip().casefold()
+
+class DuplicateIndex:
+    """Multiset of normalized card keys, for O(1) duplicate checks.
+
+    A key is the normalized question, or question and answer when
+    match_answer is set. Only hash(key) is kept, which holds the index to
+    one small int per distinct card; a false match needs a 64-bit hash
+    collision. Keys seen once live in a set, extra copies in a dict.
+    """
+
+    def __init__(self, match_answer=DEDUPE_MATCH_ANSWER):
+        self.match_answer = match_answer
+        self.keys = set()
+        self.extra = {}
+
+    def key(self, q, a, normalize=None):
+        k = _dedupe_text(q, normalize)
+        if self.match_answer:
+            k = (k, _dedupe_text(a, normalize))
+        return hash(k)
+
+    def key_of_forms(self, forms):
+        """Key from (question, answer) already run through _dedupe_text."""
+        return hash(forms if self.match_answer else forms[0])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def add_key(self, key):
+        if key in self.keys:
+            self.extra[key] = self.extra.get(key, 0) + 1
+        else:
+            self.keys.add(key)
+
+    def discard_key(self, key):
+        copies = self.extra.get(key)
+        if copies:
+            if copies == 1:
+                del self.extra[key]
+            else:
+                self.extra[key] = copies - 1
+        else:
+            self.keys.discard(key)
+
+    def rebuild(self, cards):
+        self.keys, self.extra = set(), {}
+        for c in cards:
+            self.add_key(self.key(c["q"], c["a"]))
+
+# -------------------- Search Index --------------------
+_WORD = re.compile(r"[^\W_]+")
+
+def _fold_text(text):
+    if not text.isascii():
+        text = "".join(ch for ch in unicodedata.normalize("NFKD", text)
+                       if not unicodedata.combining(ch))
+    return text.casefold()
+
+def search_words(text):
+    """Casefolded, accent-free words of text."""
+    return set(_WORD.findall(_fold_text(text)))
+
+class TextIndex:
+    """Inverted index from question/answer words to cards.
+
+    Postings hold the Card objects themselves, so positions can change
+    under shuffles and swap-deletes without touching the index. A sorted
+    vocabulary turns every query word into a prefix range. The initial
+    build runs in steps (see build()) so the UI never stalls on it; add
+    and remove keep it current afterwards.
+    """
+
+    RANGE_SCAN = 4096   # widest prefix range whose postings are counted
+
+    def __init__(self, cards):
+        self.postings = {}
+        self.words = []
+        self.fresh = []     # words not merged into the sorted list yet
+        self.pending = list(cards)
+        self.cursor = 0
+        self.skip = set()   # removed before the build reached them
+
+    @property
+    def ready(self):
+        return self.pending is None
+
+    def _index(self, card, fresh):
+        postings = self.postings
+        for word in search_words(card.q + " " + card.a):
+            cards = postings.get(word)
+            if cards is None:
+                postings[word] = cards = set()
+                fresh.append(word)
+            cards.add(card)
+
+    def build(self, limit=5000):
+        """Index up to limit more cards; returns True once complete."""
+        if self.pending is None:
+            return True
+        end = min(self.cursor + limit, len(self.pending))
+        for card in self.pending[self.cursor:end]:
+            if card is not None and card not in self.skip:
+                self._index(card, self.fresh)
+        self.cursor = end
+        if end == len(self.pending):
+            self.pending = None
+            self.skip = set()
+            self._merge()
+        return self.pending is None
+
+    def _merge(self):
+        if self.fresh:
+            self.fresh.sort()
+            self.words.extend(self.fresh)
+            self.words.sort()   # two sorted runs: a linear merge
+            self.fresh = []
+
+    def add(self, card):
+        self._index(card, self.fresh)
+
+    def remove(self, card):
+        if self.pending is not None:
+            self.skip.add(card)
+        for word in search_words(card.q + " " + card.a):
+            cards = self.postings.get(word)
+            if cards is None:
+                continue
+            cards.discard(card)
+            if not cards:
+                del self.postings[word]
+                self._merge()
+                i = bisect.bisect_left(self.words, word)
+                if i < len(self.words) and self.words[i] == word:
+                    del self.words[i]
+
+    def _range(self, prefix):
+        self._merge()
+        lo = bisect.bisect_left(self.words, prefix)
+        return lo, bisect.bisect_left(self.words, prefix + "\U0010ffff", lo)
+
+    def search(self, query, limit=50):
+        """Cards matching every query word as a prefix, at most limit."""
+        terms = []
+        for term in search_words(query):
+            lo, hi = self._range(term)
+            if lo == hi:
+                return []
+            words = self.words[lo:hi]
+            cost = (sum(len(self.postings[w]) for w in words)
+                    if len(words) <= self.RANGE_SCAN else float("inf"))
+            terms.append((cost, term, words))
+        if not terms:
+            return []
+        terms.sort(key=lambda t: t[0])
+        cost, _, words = terms[0]
+        if cost == float("inf") or len(terms) == 1:
+            # A single term, or only huge prefix ranges: walk the first one
+            # and check any others per card, stopping at limit matches.
+            candidates = itertools.chain.from_iterable(self.postings[w] for w in words)
+            return self._filter(candidates, [t for _, t, _ in terms[1:]], limit)
+        # Start from the rarest term and intersect the rest in, cheapest
+        # first; each word costs at most the smaller of its postings and
+        # the matches so far.
+        postings = self.postings
+        matches = set(postings[words[0]]) if len(words) == 1 else set().union(*(postings[w] for w in words))
+        wide = []
+        for cost, term, words in terms[1:]:
+            if len(words) > len(matches):
+                wide.append(term)   # cheaper to check the few cards left
+                continue
+            if len(words) == 1:
+                matches &= postings[words[0]]
+            else:
+                matches = set().union(*(matches & postings[w] for w in words))
+            if not matches:
+                return []
+        return self._filter(matches, wide, limit)
+
+    @staticmethod
+    def _filter(candidates, wide, limit):
+        """Up to limit candidates that also have a word starting with each
+        of the wide terms, checked against the card's text."""
+        starts = [re.compile(r"(?<![^\W_])" + re.escape(t)) for t in wide]
+        results, seen = [], set()
+        for card in candidates:
+            if card in seen:
+                continue
+            seen.add(card)
+            if starts:
+                text = _fold_text(card.q + " " + card.a)
+                if not all(p.search(text) for p in starts):
+                    continue
+            results.append(card)
+            if len(results) >= limit:
+                break
+        return results
+
+# -------------------- Deck Backends --------------------
+class JsonDeck:
+    """The whole deck in memory, persisted through a DeckJournal.
+
+    self.cards holds the deck in stored order and is never shuffled; a
+    delete leaves None behind until a later restart compacts the list.
+    Quiz order is a seeded QuizOrder over those storage indices, and
+    answered state for the current round lives in self.results, so a
+    restart only picks a new seed and drops that dict.
+
+    Only the first FIRST_BATCH cards are parsed up front; a loader thread
+    streams the rest into a queue and drain() (called from the UI loop)
+    appends them. Once loading finishes the seeded order is laid over the
+    whole deck, with the positions the student has already passed pinned
+    in place. Duplicate keys are hashed on the loader thread too, so
+    self.dupes is complete as soon as loading is.
+    """
+
+    FIRST_BATCH = 200
+    BATCH_SIZE = 2000
+
+    def __init__(self, path=FLASH_JSON, seed=None):
+        self.opened = time.perf_counter()
+        self.path = path
+        self.journal = DeckJournal(path, os.path.splitext(path)[0] + ".journal")
+        self.incoming = queue.Queue()
+        self.seed = random.getrandbits(63) if seed is None else seed
+        pairs = self.journal.iter_pairs()
+        self.cards = [Card(q, a) for q, a in itertools.islice(pairs, self.FIRST_BATCH)]
+        self.holes = set()      # storage indices of deleted cards
+        self.slots = {c: s for s, c in enumerate(self.cards)}   # Card -> storage index
+        self.results = {}       # Card -> answered correctly, this round
+        self.restoring = {}     # checkpointed answers not placed yet, see restore_answers()
+        self.answered_count = 0
+        self.correct = 0
+        self.dupes = DuplicateIndex()
+        self.dupes.rebuild(self.cards)
+        self.text = None    # TextIndex, built on demand by build_search()
+        self.closed = False     # tells the loader thread to stop
+        self.loading = len(self.cards) == self.FIRST_BATCH
+        if self.loading:
+            threading.Thread(target=self._load_rest, args=(pairs,), daemon=True).start()
+        elif not self.cards:
+            self.cards = safe_load_flashcards(self.journal)
+            self.slots = {c: s for s, c in enumerate(self.cards)}
+            self.dupes.rebuild(self.cards)
+        self.order = QuizOrder(len(self.cards), self.seed)
+        self.open = UnansweredIndex(len(self.cards))
+        if seed is not None:
+            self.wait()     # the same seed must always give the same order
+
+    def _load_rest(self, pairs):
+        # The uncached normalizer: a million one-off questions would only
+        # flush the answer cache the grader relies on.
+        key, normalize = self.dupes.key, normalize_answer.__wrapped__
+        try:
+            while not self.closed:
+                batch = [(q, a, key(q, a, normalize))
+                         for q, a in itertools.islice(pairs, self.BATCH_SIZE)]
+                if not batch:
+                    break
+                self.incoming.put(batch)
+        finally:
+            pairs.close()       # unmaps the file at once if we stopped early
+            self.incoming.put(None)
+
+    def _deal(self, batch):
+        # Streamed cards join the end of the quiz until loading finishes.
+        add_key, start = self.dupes.add_key, len(self.cards)
+        for _, _, key in batch:
+            add_key(key)
+        self.cards.extend(Card(q, a) for q, a, _ in batch)
+        self.slots.update(zip(self.cards[start:], itertools.count(start)))
+        self.order.extend(start, len(batch))
+        self.open.extend([1] * len(batch))
+
+    def _settle(self, frontier):
+        """Loading is done: lay the seeded order over the whole deck,
+        keeping positions up to frontier where the student saw them."""
+        self.loading = False
+        STATS.observe("deck.load_streamed", time.perf_counter() - self.opened)
+        old = self.order
+        self.order = QuizOrder(len(self.cards), self.seed, dead=self.holes)
+        for p in range(min(frontier + 1, len(old))):
+            self.order.pin(p, old[p])
+        self._reopen()
+        if self.restoring:
+            self._place()
+
+    def _reopen(self):
+        """Rebuild the open-position index after the order changed."""
+        self.open.reset(len(self.order))
+        if self.results:
+            for s, c in enumerate(self.cards):
+                if c is not None and c in self.results:
+                    self.open.set(self.order.index(s), 0)
+
+    def drain(self, frontier=0, limit=20000):
+        """Move streamed cards into the deck; returns True once loading is done."""
+        moved = 0
+        while self.loading and moved < limit:
+            try:
+                batch = self.incoming.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                self._settle(frontier)
+                break
+            self._deal(batch)
+            moved += len(batch)
+        return not self.loading
+
+    def wait(self):
+        """Block until the whole deck is loaded (for non-GUI callers)."""
+        while self.loading:
+            batch = self.incoming.get()
+            if batch is None:
+                self._settle(-1)
+            else:
+                self._deal(batch)
+
+    def _fix(self, card):
+        # Answered state lives in self.results; bring the card's copy in line.
+        result = self.results.get(card)
+        if result is None:
+            if card.answered:
+                card.answered = False
+                card.pop("answered_correctly", None)
+        else:
+            card.answered = True
+            card.answered_correctly = result
+        return card
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, index):
+        n = len(self.order)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("card index out of range")
+        return self._fix(self.cards[self.order[index]])
+
+    def __iter__(self):
+        """Every card, in stored (not quiz) order."""
+        for c in self.cards:
+            if c is not None:
+                yield self._fix(c)
+
+    @property
+    def match_answer(self):
+        return self.dupes.match_answer
+
+    def has_duplicate(self, q, a):
+        """True if the deck already holds a card with the same key."""
+        return self.dupes.key(q, a) in self.dupes
+
+    def has_duplicate_forms(self, forms):
+        return self.dupes.key_of_forms(forms) in self.dupes
+
+    def add(self, q, a):
+        card = Card(q, a)
+        self.slots[card] = len(self.cards)
+        self.cards.append(card)
+        self.order.append(len(self.cards) - 1)
+        self.open.append(1)
+        self.dupes.add_key(self.dupes.key(q, a))
+        if self.text is not None:
+            self.text.add(card)
+        self.journal.record_add(self.cards, card)
+        return card
+
+    def add_many(self, pairs, forms=None):
+        """Append pairs; forms optionally holds their _dedupe_text forms."""
+        added = [Card(q, a) for q, a in pairs]
+        start = len(self.cards)
+        self.cards.extend(added)
+        self.slots.update(zip(added, itertools.count(start)))
+        self.order.extend(start, len(added))
+        self.open.extend([1] * len(added))
+        dupes = self.dupes
+        if forms is None:
+            for c in added:
+                dupes.add_key(dupes.key(c.q, c.a))
+        else:
+            for f in forms:
+                dupes.add_key(dupes.key_of_forms(f))
+        if self.text is not None:
+            for c in added:
+                self.text.add(c)
+        self.journal.record_add_many(self.cards, added)
+        return len(added)
+
+    def _drop(self, index):
+        """Take one position out of the quiz; the last one fills its place."""
+        last_open = self.open.is_open(len(self.order) - 1)
+        s = self.order.remove(index)
+        card = self.cards[s]
+        self.cards[s] = None
+        del self.slots[card]
+        self.holes.add(s)
+        self.open.set(index, last_open)
+        self.open.pop()
+        result = self.results.pop(card, None)
+        if result is not None:
+            self.answered_count -= 1
+            self.correct -= bool(result)
+        self.dupes.discard_key(self.dupes.key(card.q, card.a))
+        if self.text is not None:
+            self.text.remove(card)
+        return card
+
+    def delete(self, index):
+        card = self[index]
+        self._drop(index)
+        self.journal.record_delete(self.cards, card)
+        return card
+
+    def delete_many(self, cards):
+        """Remove several cards with one journal record; returns those removed."""
+        slots = sorted({self.slots[c] for c in cards if c in self.slots})
+        removed = [self._fix(self.cards[s]) for s in slots]
+        for s in slots:
+            self._drop(self.order.index(s))
+        if removed:
+            self.journal.record_delete_many(self.cards, removed)
+        return removed
+
+    def dedupe(self):
+        """Drop every card whose key repeats an earlier one; returns them."""
+        self.wait()
+        key, seen, removed = self.dupes.key, set(), []
+        for c in self.cards:
+            if c is None:
+                continue
+            k = key(c.q, c.a)
+            if k in seen:
+                removed.append(c)
+            else:
+                seen.add(k)
+        return self.delete_many(removed)
+
+    # ---- search ----
+    def build_search(self, limit=1000):
+        """Advance the search index build; True once search covers the deck."""
+        if self.loading:
+            return False
+        if self.text is None:
+            self.text = TextIndex(self.cards)
+        return self.text.build(limit)
+
+    def search(self, query, limit=50):
+        if self.text is None:
+            return []
+        return [self._fix(c) for c in self.text.search(query, limit)]
+
+    def position(self, card):
+        """Current quiz position of card, or None once it has been deleted."""
+        s = self.slots.get(card)
+        return None if s is None else self.order.index(s)
+
+    def locate(self, keys):
+        """(position, (q, a)) for every card whose pair is in keys."""
+        for s, c in enumerate(self.cards):
+            if c is not None and (c.q, c.a) in keys:
+                yield self.order.index(s), (c.q, c.a)
+
+    # ---- browsing ----
+    SORT_KEYS = {
+        "q": lambda c: _dedupe_text(c.q, normalize_answer.__wrapped__),
+        "a": lambda c: _dedupe_text(c.a, normalize_answer.__wrapped__),
+    }
+
+    def sort_order(self, column, reverse=False):
+        """Cards sorted by column, for DeckListing; safe off the Tk thread."""
+        cards = [c for c in list(self.cards) if c is not None]
+        if column == "status":
+            results = self.results
+            key = lambda c: (c in results, bool(results.get(c)))
+        else:
+            key = self.SORT_KEYS[column]
+        return sorted(cards, key=key, reverse=reverse)
+
+    def handle(self, card):
+        return card
+
+    def resolve(self, handles):
+        return [self._fix(c) for c in handles]
+
+    # ---- rounds ----
+    def shuffle(self, seed=None):
+        """Start a new quiz order: O(1) plus any deletes since the last one.
+        While the deck is still loading only the seed changes; _settle()
+        lays the order over the whole deck once it is in."""
+        self.seed = random.getrandbits(63) if seed is None else seed
+        if self.loading:
+            return
+        if len(self.holes) > len(self.cards) // 4:
+            self.cards = [c for c in self.cards if c is not None]
+            self.slots = {c: s for s, c in enumerate(self.cards)}
+            self.holes = set()
+        self.order = QuizOrder(len(self.cards), self.seed, dead=self.holes)
+        self._reopen()
+
+    def reset_progress(self):
+        self.results = {}
+        self.open.reset(len(self.order))
+        self.answered_count = 0
+        self.correct = 0
+
+    def _record(self, card, correct):
+        """Set card's result for this round; True if it had none yet."""
+        old = self.results.get(card)
+        if old is None:
+            self.answered_count += 1
+        else:
+            self.correct -= bool(old)
+        self.results[card] = correct
+        self.correct += bool(correct)
+        return old is None
+
+    def mark_answered(self, index, correct):
+        card = self[index]
+        if self._record(card, correct):
+            self.open.set(index, 0)
+        card.answered = True
+        card.answered_correctly = correct
+
+    def all_answered(self):
+        return not self.loading and self.answered_count == len(self.order)
+
+    def correct_count(self):
+        return self.correct
+
+    def next_unanswered(self, index, step=1):
+        """Position of the closest unanswered card past index, or None."""
+        return self.open.nearest(index, step)
+
+    def answered_positions(self):
+        """Quiz positions answered this round, in no particular order."""
+        return list(self.open.closed)
+
+    # ---- checkpoints ----
+    def storage_index(self, index):
+        return self.order[index]
+
+    def slot_position(self, slot, check):
+        """Quiz position of the card with checksum check, expected at
+        storage index slot; None if it is gone or not streamed in yet."""
+        card = self.cards[slot] if 0 <= slot < len(self.cards) else None
+        if card is None or _card_check(card) != check:
+            if self.loading:
+                return None
+            # Reloading closed the gaps deletes left, so look it up by checksum.
+            slot = next((s for s, c in enumerate(self.cards)
+                         if c is not None and _card_check(c) == check), None)
+            if slot is None:
+                return None
+        return self.order.index(slot)
+
+    def answered_state(self):
+        """{storage index: [correct, checksum]} for this round; safe to call
+        off the Tk thread, as the session checkpoint's writer does."""
+        state = dict(self.restoring)
+        slots = self.slots
+        for card, correct in list(self.results.items()):
+            s = slots.get(card)
+            if s is not None:
+                state[s] = [bool(correct), _card_check(card)]
+        return state
+
+    def restore_answers(self, answers):
+        """Mark answers saved by a SessionCheckpoint ({storage index:
+        [correct, checksum]}). Cards not streamed in yet wait for
+        _settle(), so this never blocks on loading."""
+        self.restoring.update(answers)
+        self._place()
+
+    def _place(self):
+        cards, waiting, moved = self.cards, {}, {}
+        for s, entry in self.restoring.items():
+            card = cards[s] if s < len(cards) else None
+            if card is not None and _card_check(card) == entry[1]:
+                if self._record(card, entry[0]):
+                    self.open.set(self.order.index(s), 0)
+            elif self.loading:
+                waiting[s] = entry
+            else:
+                moved[entry[1]] = entry[0]
+        if moved:
+            # The deck changed since the checkpoint: find those cards by checksum.
+            for s, card in enumerate(cards):
+                if card is None or card in self.results:
+                    continue
+                correct = moved.pop(_card_check(card), None)
+                if correct is not None:
+                    self._record(card, correct)
+                    self.open.set(self.order.index(s), 0)
+                    if not moved:
+                        break
+        self.restoring = waiting
+
+    def close(self):
+        """Stop the loader thread if the file is still streaming in."""
+        self.closed = True
+
+
+class SqliteDeck:
+    """Deck stored in an indexed SQLite file.
+
+    Rows keep their stored order in `pos`, which a restart never rewrites.
+    Quiz order is a QuizOrder whose seed and exceptions live in the meta
+    and quiz_moved tables, and `answered` holds the round a card was
+    answered in, so a restart is a new seed plus a round bump. Rows are
+    read a page at a time around the positions the UI actually asks for,
+    so memory and startup stay flat however large the deck gets. A
+    brand-new file is seeded from seed_from, or from the fallback deck
+    when seed_from is None; one whose cards were all deleted stays empty.
+    Normalized question and answer keys are stored per row and indexed for
+    duplicate checks, and an FTS5 table kept in step by triggers serves
+    search.
+    """
+
+    PAGE_SIZE = 256
+    MAX_PAGES = 16
+    COLUMNS = "id, q, a, answered, correct"
+    KEY_VERSION = 2     # bumped whenever normalize_answer changes the stored qkey/akey
+    INSERT = ("INSERT INTO cards (q, a, pos, qkey, akey) "
+              "VALUES (?1, ?2, ?3, dedupe_text(?1), dedupe_text(?2))")
+
+    def __init__(self, path=FLASH_DB, seed_from=FLASH_JSON, seed=None):
+        import sqlite3
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.create_function("dedupe_text", 1, _dedupe_text, deterministic=True)
+        self.match_answer = DEDUPE_MATCH_ANSWER
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS cards (
+                id INTEGER PRIMARY KEY,
+                q TEXT NOT NULL,
+                a TEXT NOT NULL,
+                answered INTEGER NOT NULL DEFAULT 0,
+                correct INTEGER NOT NULL DEFAULT 0,
+                pos INTEGER NOT NULL,
+                qkey TEXT,
+                akey TEXT
+            );
+            CREATE INDEX IF NOT EXISTS cards_pos ON cards(pos);
+            CREATE INDEX IF NOT EXISTS cards_open ON cards(answered, pos);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS quiz_moved (p INTEGER PRIMARY KEY, s INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS quiz_dead (s INTEGER PRIMARY KEY);
+        """)
+        columns = [r[1] for r in self.db.execute("PRAGMA table_info(cards)")]
+        if "qkey" not in columns:
+            # Decks made before duplicate detection; keyed below.
+            with self.db:
+                self.db.execute("ALTER TABLE cards ADD COLUMN qkey TEXT")
+                self.db.execute("ALTER TABLE cards ADD COLUMN akey TEXT")
+        self.db.execute("CREATE INDEX IF NOT EXISTS cards_key ON cards(qkey, akey)")
+        self.fts = self._create_fts()
+        self.pages = {}
+        self.loading = False
+        self.count = self.db.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        if meta.get("keys") != self.KEY_VERSION:
+            # Unkeyed rows, or keys from an older normalize_answer: key every row once.
+            with self.db:
+                self.db.execute("UPDATE cards SET qkey = dedupe_text(q), akey = dedupe_text(a)")
+            self._save_meta({"keys": self.KEY_VERSION})
+        if self.count == 0 and "seed" not in meta:
+            # A brand-new file; an emptied deck stays empty.
+            if seed_from is None:
+                pairs = list(FALLBACK_FLASHCARDS)
+            else:
+                pairs = [(c["q"], c["a"]) for c in safe_load_flashcards(DeckJournal(seed_from))]
+            with self.db:
+                self.db.executemany(self.INSERT, ((q, a, i) for i, (q, a) in enumerate(pairs)))
+            self.count = len(pairs)
+            meta = {"base": self.count}
+        if "seed" not in meta:
+            # A file from before lazy ordering already stores its quiz order
+            # in pos; base 0 keeps that order, and its answered = 1 rows
+            # count as round 1.
+            meta = {"seed": random.getrandbits(63) if seed is None else seed,
+                    "round": 1, "base": meta.get("base", 0)}
+            self._save_meta(meta)
+        self.seed, self.round = meta["seed"], meta["round"]
+        self.storage = self.db.execute(
+            "SELECT MAX((SELECT COALESCE(MAX(pos), -1) FROM cards),"
+            " (SELECT COALESCE(MAX(s), -1) FROM quiz_dead)) + 1").fetchone()[0]
+        self.order = QuizOrder.restore(self.count, self.seed, meta["base"],
+                                       self.db.execute("SELECT p, s FROM quiz_moved"), track=True)
+        self.open = UnansweredIndex()
+        self._reopen()
+        if seed is not None and seed != self.seed:
+            self.shuffle(seed)
+
+    def _save_meta(self, values):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                values.items())
+
+    def _save_order(self):
+        """Write the quiz positions QuizOrder touched since the last save."""
+        order = self.order
+        touched, order.touched = order.touched, set()
+        moved = [(p, order.moved[p]) for p in touched if p in order.moved]
+        self.db.executemany("DELETE FROM quiz_moved WHERE p = ?",
+                            ((p,) for p in touched if p not in order.moved))
+        self.db.executemany("INSERT OR REPLACE INTO quiz_moved (p, s) VALUES (?, ?)", moved)
+
+    def _reopen(self):
+        """Reload which quiz positions were answered this round."""
+        self.open.reset(self.count)
+        index = self.order.index
+        for (pos,) in self.db.execute("SELECT pos FROM cards WHERE answered = ?", (self.round,)):
+            self.open.set(index(pos), 0)
+        self.answered_count, self.correct = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(correct), 0) FROM cards WHERE answered = ?",
+            (self.round,)).fetchone()
+
+    # ---- paging ----
+    def _card(self, row):
+        rid, q, a, answered, correct = row
+        card = SqliteCard(rid, q, a, answered == self.round)
+        if card.answered:
+            card["answered_correctly"] = bool(correct)
+        return card
+
+    def _page(self, page_no):
+        page = self.pages.pop(page_no, None)
+        if page is None:
+            start = page_no * self.PAGE_SIZE
+            slots = [self.order[p] for p in range(start, min(start + self.PAGE_SIZE, self.count))]
+            rows = self.db.execute(
+                f"SELECT pos, {self.COLUMNS} FROM cards WHERE pos IN (%s)" % ",".join("?" * len(slots)),
+                slots)
+            found = {row[0]: self._card(row[1:]) for row in rows}
+            page = [found[s] for s in slots]
+            if len(self.pages) >= self.MAX_PAGES:
+                self.pages.pop(next(iter(self.pages)))
+        self.pages[page_no] = page    # most recently used goes last
+        return page
+
+    def __len__(self):
+        return self.count
+
+    def drain(self, frontier=0, limit=None):
+        return True
+
+    def wait(self):
+        pass
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("card index out of range")
+        return self._page(index // self.PAGE_SIZE)[index % self.PAGE_SIZE]
+
+    def __iter__(self):
+        """Every card, in stored (not quiz) order."""
+        for row in self.db.execute(f"SELECT {self.COLUMNS} FROM cards ORDER BY pos").fetchall():
+            yield self._card(row)
+
+    def _create_fts(self):
+        import sqlite3
+        exists = self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'cards_fts'").fetchone()
+        try:
+            with self.db:
+                self.db.executescript("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+                        q, a, content='cards', content_rowid='id', prefix='1 2 3',
+                        tokenize='unicode61 remove_diacritics 2');
+                    CREATE TRIGGER IF NOT EXISTS cards_fts_add AFTER INSERT ON cards BEGIN
+                        INSERT INTO cards_fts(rowid, q, a) VALUES (new.id, new.q, new.a);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS cards_fts_del AFTER DELETE ON cards BEGIN
+                        INSERT INTO cards_fts(cards_fts, rowid, q, a) VALUES ('delete', old.id, old.q, old.a);
+                    END;
+                """)
+                if not exists:
+                    self.db.execute("INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError:
+            return False    # SQLite built without FTS5: search falls back to LIKE
+        return True
+
+    # ---- search ----
+    def build_search(self, limit=None):
+        return True
+
+    def search(self, query, limit=50):
+        words = search_words(query)
+        if not words:
+            return []
+        if self.fts:
+            rows = self.db.execute(
+                "SELECT c.id, c.q, c.a, c.answered, c.correct "
+                "FROM cards_fts JOIN cards c ON c.id = cards_fts.rowid "
+                "WHERE cards_fts MATCH ? LIMIT ?",
+                (" ".join(f'"{w}"*' for w in words), limit))
+        else:
+            where = " AND ".join(["(q LIKE ? OR a LIKE ?)"] * len(words))
+            args = [f"%{w}%" for w in words for _ in (0, 1)]
+            rows = self.db.execute(f"SELECT {self.COLUMNS} FROM cards WHERE {where} LIMIT ?",
+                                   args + [limit])
+        return [self._card(row) for row in rows]
+
+    def position(self, card):
+        row = self.db.execute("SELECT pos FROM cards WHERE id = ?", (card["id"],)).fetchone()
+        return self.order.index(row[0]) if row else None
+
+    LOCATE_CHUNK = 500      # keys per indexed lookup, under SQLite's parameter limit
+
+    def locate(self, keys):
+        """(position, (q, a)) for every card whose pair is in keys.
+
+        Keys are looked up through the indexed qkey column, so the cost
+        follows len(keys) rather than the deck size. Once keys cover a
+        good part of the deck, one streamed pass over the table is cheaper.
+        """
+        index = self.order.index
+        if len(keys) * 4 >= self.count:
+            rows = self.db.execute("SELECT pos, q, a FROM cards")
+        else:
+            qkeys = list({_dedupe_text(q) for q, _ in keys})
+            rows = itertools.chain.from_iterable(
+                self.db.execute("SELECT pos, q, a FROM cards WHERE qkey IN "
+                                f"({', '.join('?' * len(chunk))})", chunk)
+                for chunk in (qkeys[i:i + self.LOCATE_CHUNK]
+                              for i in range(0, len(qkeys), self.LOCATE_CHUNK)))
+        for pos, q, a in rows:
+            if (q, a) in keys:
+                yield index(pos), (q, a)
+
+    # ---- duplicates ----
+    def has_duplicate(self, q, a):
+        return self.has_duplicate_forms((_dedupe_text(q), _dedupe_text(a)))
+
+    def has_duplicate_forms(self, forms):
+        if self.match_answer:
+            sql, args = "SELECT 1 FROM cards WHERE qkey = ? AND akey = ? LIMIT 1", forms
+        else:
+            sql, args = "SELECT 1 FROM cards WHERE qkey = ? LIMIT 1", forms[:1]
+        return self.db.execute(sql, args).fetchone() is not None
+
+    def dedupe(self):
+        """Delete every card whose key repeats one earlier in stored order."""
+        group = "qkey, akey" if self.match_answer else "qkey"
+        rows = self.db.execute(
+            f"SELECT {self.COLUMNS} FROM ("
+            f"  SELECT *, ROW_NUMBER() OVER (PARTITION BY {group} ORDER BY pos) AS copy FROM cards"
+            ") WHERE copy > 1")
+        return self.delete_many([self._card(row) for row in rows])
+
+    # ---- mutation ----
+    def add(self, q, a):
+        with self.db:
+            cur = self.db.execute(self.INSERT, (q, a, self.storage))
+            self.order.append(self.storage)
+            self._save_order()
+        self.pages.pop(self.count // self.PAGE_SIZE, None)
+        self.storage += 1
+        self.count += 1
+        self.open.append(1)
+        return SqliteCard(cur.lastrowid, q, a)
+
+    def add_many(self, pairs, forms=None):
+        pairs = list(pairs)
+        start = self.storage
+        with self.db:
+            if forms is None:
+                self.db.executemany(self.INSERT, ((q, a, start + i) for i, (q, a) in enumerate(pairs)))
+            else:
+                self.db.executemany(
+                    "INSERT INTO cards (q, a, pos, qkey, akey) VALUES (?, ?, ?, ?, ?)",
+                    ((q, a, start + i, fq, fa) for i, ((q, a), (fq, fa)) in enumerate(zip(pairs, forms))))
+            self.order.extend(start, len(pairs))
+            self._save_order()
+        self.pages.pop(self.count // self.PAGE_SIZE, None)
+        self.storage += len(pairs)
+        self.count += len(pairs)
+        self.open.extend([1] * len(pairs))
+        return len(pairs)
+
+    def _drop(self, index, card):
+        # Inside a transaction: the last quiz position moves into the hole.
+        last = self.count - 1
+        last_open = self.open.is_open(last)
+        slot = self.order.remove(index)
+        self.db.execute("DELETE FROM cards WHERE id = ?", (card["id"],))
+        self.db.execute("INSERT OR IGNORE INTO quiz_dead (s) VALUES (?)", (slot,))
+        self.open.set(index, last_open)
+        self.open.pop()
+        self.count -= 1
+        if card["answered"]:
+            self.answered_count -= 1
+            self.correct -= bool(card.get("answered_correctly"))
+        for p in (index, last):
+            self.pages.pop(p // self.PAGE_SIZE, None)
+
+    def delete(self, index):
+        card = self[index]
+        with self.db:
+            self._drop(index, card)
+            self._save_order()
+        return card
+
+    def delete_many(self, cards):
+        """Delete several cards in one transaction."""
+        cards = list(cards)
+        if not cards:
+            return cards
+        with self.db:
+            for card in cards:
+                index = self.position(card)
+                if index is not None:
+                    self._drop(index, card)
+            self._save_order()
+        return cards
+
+    # ---- browsing ----
+    SORT_COLUMNS = {"q": ("qkey",), "a": ("akey",),
+                    "status": ("answered = {round}", "correct * (answered = {round})")}
+
+    def sort_order(self, column, reverse=False):
+        """Row ids sorted by column; opens its own connection, so it can
+        run off the Tk thread."""
+        import sqlite3
+        direction = " DESC" if reverse else ""
+        order = ", ".join(c.format(round=int(self.round)) + direction
+                          for c in self.SORT_COLUMNS[column])
+        db = sqlite3.connect(self.path)
+        try:
+            return [r[0] for r in db.execute(f"SELECT id FROM cards ORDER BY {order}, pos")]
+        finally:
+            db.close()
+
+    def handle(self, card):
+        return card["id"]
+
+    def resolve(self, ids):
+        ids = list(ids)
+        found = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self.db.execute(
+                f"SELECT {self.COLUMNS} FROM cards WHERE id IN (%s)" % ",".join("?" * len(chunk)),
+                chunk)
+            for row in rows:
+                found[row[0]] = self._card(row)
+        return [found[i] for i in ids if i in found]
+
+    # ---- rounds ----
+    def shuffle(self, seed=None):
+        """Start a new quiz order without touching the card rows, unless
+        enough have been deleted that closing the gaps in pos pays off."""
+        self.seed = random.getrandbits(63) if seed is None else seed
+        dead = [s for (s,) in self.db.execute("SELECT s FROM quiz_dead")]
+        with self.db:
+            if len(dead) > self.storage // 4:
+                self.db.execute("CREATE TEMP TABLE renumber (id INTEGER PRIMARY KEY, pos INTEGER)")
+                self.db.execute("INSERT INTO renumber SELECT id, ROW_NUMBER() OVER (ORDER BY pos) - 1 FROM cards")
+                self.db.execute("UPDATE cards SET pos = (SELECT pos FROM renumber WHERE renumber.id = cards.id)")
+                self.db.execute("DROP TABLE renumber")
+                self.db.execute("DELETE FROM quiz_dead")
+                self.storage, dead = self.count, []
+            self.order = QuizOrder(self.storage, self.seed, dead=dead, track=True)
+            self.order.touched = set()
+            self.db.execute("DELETE FROM quiz_moved")
+            self.db.executemany("INSERT INTO quiz_moved (p, s) VALUES (?, ?)", self.order.moved.items())
+            self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                (("seed", self.seed), ("base", self.storage)))
+        self.pages.clear()
+        self._reopen()
+
+    def reset_progress(self):
+        self.round += 1
+        self._save_meta({"round": self.round})
+        self.pages.clear()
+        self.open.reset(self.count)
+        self.answered_count = 0
+        self.correct = 0
+
+    def mark_answered(self, index, correct):
+        card = self[index]
+        if card["answered"]:
+            self.correct -= bool(card.get("answered_correctly"))
+        else:
+            self.answered_count += 1
+            self.open.set(index, 0)
+        card["answered"] = True
+        card["answered_correctly"] = correct
+        self.correct += bool(correct)
+        with self.db:
+            self.db.execute("UPDATE cards SET answered = ?, correct = ? WHERE id = ?",
+                            (self.round, int(correct), card["id"]))
+
+    def all_answered(self):
+        return self.answered_count == self.count
+
+    def correct_count(self):
+        return self.correct
+
+    def next_unanswered(self, index, step=1):
+        return self.open.nearest(index, step)
+
+    def answered_positions(self):
+        return list(self.open.closed)
+
+    # ---- checkpoints ----
+    def storage_index(self, index):
+        return self.order[index]
+
+    def slot_position(self, slot, check):
+        row = self.db.execute("SELECT q, a FROM cards WHERE pos = ?", (slot,)).fetchone()
+        if row is None or _pair_check(*row) != check:
+            return None
+        return self.order.index(slot)
+
+    def answered_state(self):
+        """{pos: [correct, checksum]} for this round; opens its own
+        connection, so the session checkpoint's writer can call it."""
+        import sqlite3
+        db = sqlite3.connect(self.path)
+        try:
+            rows = db.execute("SELECT pos, correct, q, a FROM cards WHERE answered = ?", (self.round,))
+            return {pos: [bool(correct), _pair_check(q, a)] for pos, correct, q, a in rows}
+        finally:
+            db.close()
+
+    def restore_answers(self, answers):
+        """Mark answers saved by a SessionCheckpoint ({pos: [correct,
+        checksum]}). The rows normally hold them already; only the ones
+        they lack are written, in one transaction."""
+        round_, updates, moved = self.round, [], {}
+        slots = list(answers)
+        for start in range(0, len(slots), 500):
+            chunk = slots[start:start + 500]
+            found = set()
+            rows = self.db.execute(
+                "SELECT pos, answered, correct, q, a FROM cards WHERE pos IN (%s)" % ",".join("?" * len(chunk)),
+                chunk)
+            for pos, answered, correct, q, a in rows:
+                found.add(pos)
+                ok, check = answers[pos]
+                if answered == round_ and bool(correct) == ok:
+                    continue
+                if _pair_check(q, a) == check:
+                    updates.append((pos, answered, correct, ok))
+                else:
+                    moved[check] = ok
+            for pos in chunk:
+                if pos not in found:
+                    ok, check = answers[pos]
+                    moved[check] = ok
+        if moved:
+            # The deck changed since the checkpoint: find those cards by checksum.
+            for pos, answered, correct, q, a in self.db.execute(
+                    "SELECT pos, answered, correct, q, a FROM cards WHERE answered != ?", (round_,)):
+                ok = moved.pop(_pair_check(q, a), None)
+                if ok is not None:
+                    updates.append((pos, answered, correct, ok))
+                    if not moved:
+                        break
+        if not updates:
+            return
+        with self.db:
+            self.db.executemany("UPDATE cards SET answered = ?, correct = ? WHERE pos = ?",
+                                ((round_, int(ok), pos) for pos, _, _, ok in updates))
+        for pos, answered, correct, ok in updates:
+            if answered == round_:
+                self.correct -= bool(correct)
+            else:
+                self.answered_count += 1
+                self.open.set(self.order.index(pos), 0)
+            self.correct += bool(ok)
+        self.pages.clear()
+
+    def close(self):
+        self.db.close()
+
+
+def default_deck_path():
+    return FLASH_DB if os.path.exists(FLASH_DB) else FLASH_JSON
+
+@STATS.timed("deck.open")
+def open_deck(path=None, seed=None):
+    """Pick the backend from the file extension (.db/.sqlite -> SQLite)."""
+    if path is None:
+        path = default_deck_path()
+    if os.path.splitext(path)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+        # Only the working-directory deck migrates from FLASH_JSON.
+        default = os.path.abspath(path) == os.path.abspath(FLASH_DB)
+        return SqliteDeck(path, seed_from=FLASH_JSON if default else None, seed=seed)
+    return JsonDeck(path, seed)
+
+# -------------------- Answer Matching --------------------
+_ASCII_DROP = bytes(c for c in range(128) if not chr(c).isalnum())
+# Punctuation that is part of a number: "3.14", "-5", ".5", "1/2".
+_NUMBER_MARKS = re.compile(r"((?<=\d)/(?=\d)|[.\-](?=\d))")
+_NUMERIC = re.compile(r"[\d./\-]+")
+# Alternatives are split on ";" or a spaced " / ", never on "km/h" or "1/2".
+_ALTERNATIVES = re.compile(r";|\s+/\s+")
+
+def _strip_punctuation(text):
+    if text.isascii():
+        return text.lower().encode().translate(None, _ASCII_DROP).decode()
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in text
+                   if ch.isalnum() and not unicodedata.combining(ch))
+
+@lru_cache(maxsize=65536)
+def normalize_answer(text):
+    """Casefold, strip accents, drop punctuation and whitespace.
+
+    A ".", "-" or "/" inside or in front of a number stays, so "3.14",
+    "-5" and "1/2" don't collapse into "314", "5" and "12".
+    """
+    parts = _NUMBER_MARKS.split(text)
+    if len(parts) == 1:
+        return _strip_punctuation(text)
+    return "".join(part if i % 2 else _strip_punctuation(part) for i, part in enumerate(parts))
+
+def _is_numeric(form):
+    return _NUMERIC.fullmatch(form) is not None
+
+@lru_cache(maxsize=16384)
+def answer_forms(answer):
+    """Every accepted normalized form of a stored answer.
+
+    "colour; color" and "UK / United Kingdom" accept either side; the
+    whole answer is always accepted too. If any side is a single character
+    or just a number ("9.81 m / s", "10 / 20"), only the whole answer is.
+    """
+    whole = normalize_answer(answer)
+    parts = [form for form in map(normalize_answer, _ALTERNATIVES.split(answer)) if form]
+    if len(parts) < 2 or any(len(form) < 2 or _is_numeric(form) for form in parts):
+        return (whole,) if whole else ()
+    forms = [whole] if whole else []
+    for form in parts:
+        if form not in forms:
+            forms.append(form)
+    return tuple(forms)
+
+def edit_distance_within(a, b, limit):
+    """Levenshtein distance of a and b if it is <= limit, else None.
+
+    Bit-parallel (Myers/Hyyrö) over Python ints, one pass over b, giving
+    up as soon as the remaining characters can no longer bring the score
+    back under the limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    if not a or not b:
+        return max(len(a), len(b))
+    peq = {}
+    for i, ch in enumerate(a):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    mask = (1 << len(a)) - 1
+    high = 1 << (len(a) - 1)
+    pv, mv, score = mask, 0, len(a)
+    remaining = len(b)
+    for ch in b:
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        remaining -= 1
+        if score - remaining > limit:
+            return None
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return score if score <= limit else None
+
+class AnswerMatcher:
+    """Grades typed answers against a card's answer.
+
+    Returns "exact" for a normalized match, "typo" when the answer is
+    within the edit budget of one of the accepted forms, else None.
+    Answers shorter than FUZZY_MIN_LEN, or purely numeric ones, must
+    match exactly.
+    """
+
+    FUZZY_MIN_LEN = 5
+    FUZZY_RATIO = 0.15
+
+    def __init__(self, fuzzy=True):
+        self.fuzzy = fuzzy
+
+    @STATS.timed("answer.grade")
+    def check(self, user, answer):
+        typed = normalize_answer(user)
+        if not typed:
+            return None
+        forms = answer_forms(answer)
+        if typed in forms:
+            return "exact"
+        if not self.fuzzy:
+            return None
+        for form in forms:
+            if len(form) < self.FUZZY_MIN_LEN or _is_numeric(form):
+                continue
+            if edit_distance_within(typed, form, int(len(form) * self.FUZZY_RATIO)) is not None:
+                return "typo"
+        return None
+
+# -------------------- Spaced Repetition --------------------
+class Scheduler:
+    """SM-2 style review queue over a deck.
+
+    Cards that have been graded at least once carry [ease, interval_days,
+    reps, due] and sit in a min-heap keyed on due time, so the most overdue
+    card is found in O(log n). Cards never seen before are served in deck
+    order once nothing is due. State is keyed on (question, answer) and
+    saved next to the deck file from a background thread.
+    """
+
+    START_EASE = 2.5
+    MIN_EASE = 1.3
+    LEARN_STEP = 60         # seconds before a missed card comes back
+    DAY = 86400
+
+    def __init__(self, deck, path=None):
+        self.deck = deck
+        self.path = path or os.path.splitext(deck.path)[0] + ".sched.json"
+        self.state = {}     # (q, a) -> [ease, interval, reps, due]
+        self.heap = []      # (due, tiebreak, position, key)
+        self.counter = itertools.count()
+        self.new_cursor = 0
+        self.saving = False
+        self.dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, st in data.get("cards", {}).items():
+                q, a = key.split("\x1f", 1)
+                self.state[(q, a)] = [float(st[0]), float(st[1]), int(st[2]), float(st[3])]
+        except:
+            pass
+        self.remap()
+
+    def remap(self):
+        """Rebuild the heap with current deck positions, after the deck moved cards."""
+        heap = []
+        if self.state:
+            for pos, key in self.deck.locate(self.state):
+                heap.append((self.state[key][3], next(self.counter), pos, key))
+        heapq.heapify(heap)
+        self.heap = heap
+
+    def restart(self):
+        self.new_cursor = 0
+        self.remap()
+
+    def _top(self):
+        heap, deck = self.heap, self.deck
+        while heap:
+            due, _, pos, key = heap[0]
+            st = self.state.get(key)
+            if st is None or st[3] != due:
+                heapq.heappop(heap)     # superseded by a later grade
+                continue
+            if pos >= len(deck) or (deck[pos]["q"], deck[pos]["a"]) != key:
+                self.remap()
+                heap = self.heap
+                continue
+            return heap[0]
+        return None
+
+    def next_due(self):
+        top = self._top()
+        return top[0] if top else None
+
+    def next_position(self, now=None):
+        """Deck position to study next, or None when nothing is due."""
+        now = time.time() if now is None else now
+        top = self._top()
+        if top and top[0] <= now:
+            return top[2]
+        deck = self.deck
+        while self.new_cursor < len(deck):
+            card = deck[self.new_cursor]
+            self.new_cursor += 1
+            if (card["q"], card["a"]) not in self.state:
+                return self.new_cursor - 1
+        return None
+
+    def grade(self, pos, correct, now=None):
+        now = time.time() if now is None else now
+        card = self.deck[pos]
+        key = (card["q"], card["a"])
+        ease, interval, reps, due = self.state.get(key, (self.START_EASE, 0, 0, 0))
+        quality = 4 if correct else 1
+        if correct:
+            reps += 1
+            interval = 1 if reps == 1 else 6 if reps == 2 else round(interval * ease, 2)
+            due = now + interval * self.DAY
+        else:
+            reps, interval = 0, 0
+            due = now + self.LEARN_STEP
+        ease = max(self.MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self.state[key] = [ease, interval, reps, due]
+        heapq.heappush(self.heap, (due, next(self.counter), pos, key))
+        self.save_async()
+
+    def forget(self, card):
+        if self.state.pop((card["q"], card["a"]), None) is not None:
+            self.save_async()
+
+    def save_async(self):
+        self.dirty = True
+        if self.saving:
+            return
+        self.saving = True
+        threading.Thread(target=self._save_loop, daemon=True).start()
+
+    def _save_loop(self):
+        try:
+            while self.dirty:
+                self.dirty = False
+                cards = {q + "\x1f" + a: st for (q, a), st in list(self.state.items())}
+                try:
+                    atomic_write(self.path, lambda f: json.dump({"version": 1, "cards": cards}, f))
+                    if STATS.enabled:
+                        STATS.wrote("schedule", os.path.getsize(self.path))
+                except:
+                    pass
+        finally:
+            self.saving = False
+
+# -------------------- Study Session --------------------
+class StudySession:
+    """Quiz state and rules for one student, with no GUI attached.
+
+    FlashcardApp drives one of these and only handles widgets; load tests
+    and command-line tools can run the same logic headlessly.
+    """
+
+    def __init__(self, deck, spaced=False, matcher=None):
+        self.deck = deck
+        self.matcher = matcher or AnswerMatcher()
+        self.scheduler = Scheduler(deck) if spaced else None
+        self.checkpoint = None      # SessionCheckpoint recording this session
+
+        # A SQLite deck keeps answered state, so pick up where it left off.
+        self.score = deck.correct_count()
+        self.card_index = 0
+        self.caught_up = False      # spaced mode: nothing is due right now
+        if deck and deck[0]["answered"]:
+            self.card_index = deck.next_unanswered(0) or 0
+
+    def current(self):
+        return self.deck[self.card_index] if self.deck else None
+
+    def finished(self):
+        return self.scheduler is None and self.deck.all_answered()
+
+    def next(self):
+        """Move to the next card to study; returns its position or None."""
+        if not self.deck:
+            return None
+        if self.scheduler is not None:
+            index = self.scheduler.next_position()
+            self.caught_up = index is None
+        else:
+            index = self.deck.next_unanswered(self.card_index, 1)
+        if index is not None:
+            self.card_index = index
+            self._moved()
+        return index
+
+    def prev(self):
+        if not self.deck or self.scheduler is not None:
+            return None
+        index = self.deck.next_unanswered(self.card_index, -1)
+        if index is not None:
+            self.card_index = index
+            self._moved()
+        return index
+
+    def _moved(self):
+        if self.checkpoint is not None:
+            self.checkpoint.move(self)
+
+    def _rebased(self):
+        # Many cards changed at once: start the checkpoint over from a snapshot.
+        if self.checkpoint is not None:
+            self.checkpoint.rebase(self)
+
+    def check(self, text, index=None):
+        """Grade text against a card without recording anything."""
+        card = self.deck[self.card_index if index is None else index]
+        return self.matcher.check(text, card["a"])
+
+    def record(self, index, verdict):
+        if verdict:
+            self.score += 1
+        self.deck.mark_answered(index, bool(verdict))
+        if self.scheduler is not None:
+            self.scheduler.grade(index, bool(verdict))
+        if self.checkpoint is not None:
+            self.checkpoint.answer(self, index, bool(verdict))
+
+    def answer(self, text):
+        """Grade and record an answer for the current card."""
+        verdict = self.check(text)
+        self.record(self.card_index, verdict)
+        return verdict
+
+    def restart(self, seed=None):
+        """Start a new round in a fresh order; the same seed gives the same order."""
+        self.score = 0
+        self.card_index = 0
+        self.deck.reset_progress()
+        self.deck.shuffle(seed)
+        if self.scheduler is not None:
+            self.scheduler.restart()
+            self.next()
+        self._rebased()
+
+    def set_spaced(self, on):
+        if on and self.scheduler is None:
+            self.scheduler = Scheduler(self.deck)
+            self.next()
+        elif not on and self.scheduler is not None:
+            self.scheduler = None
+            self.caught_up = False
+            if self.deck and self.deck[self.card_index]["answered"]:
+                index = self.deck.next_unanswered(self.card_index)
+                if index is None:
+                    index = self.deck.next_unanswered(self.card_index, -1)
+                if index is not None:
+                    self.card_index = index
+
+    @STATS.timed("deck.search")
+    def search(self, query, limit=50):
+        return self.deck.search(query, limit)
+
+    def jump(self, card):
+        """Make card the current one; returns its position or None if gone."""
+        index = self.deck.position(card)
+        if index is not None:
+            self.card_index = index
+            self.caught_up = False
+            self._moved()
+        return index
+
+    def is_duplicate(self, q, a):
+        return self.deck.has_duplicate(q, a)
+
+    def add(self, q, a):
+        card = self.deck.add(q, a)
+        self.card_index = len(self.deck) - 1
+        self.caught_up = False
+        return card
+
+    def delete(self):
+        slot = self.deck.storage_index(self.card_index)
+        card = self.deck.delete(self.card_index)
+        if self.scheduler is not None:
+            self.scheduler.forget(card)
+        if self.card_index >= len(self.deck):
+            self.card_index = max(0, len(self.deck) - 1)
+        if self.checkpoint is not None:
+            self.checkpoint.drop(self, [slot])
+        return card
+
+    def delete_many(self, cards):
+        """Delete cards as one batch, staying on the current card if it survives."""
+        current = self.current()
+        removed = self.deck.delete_many(cards)
+        if self.scheduler is not None:
+            for card in removed:
+                self.scheduler.forget(card)
+        index = self.deck.position(current) if current is not None else None
+        if index is not None:
+            self.card_index = index
+        elif self.card_index >= len(self.deck):
+            self.card_index = max(0, len(self.deck) - 1)
+        self._rebased()
+        return removed
+
+    def dedupe(self):
+        """Remove duplicate cards from the deck; returns how many went."""
+        removed = self.deck.dedupe()
+        if self.scheduler is not None:
+            for card in removed:
+                self.scheduler.forget(card)
+        self.score = self.deck.correct_count()
+        if self.card_index >= len(self.deck):
+            self.card_index = max(0, len(self.deck) - 1)
+        self._rebased()
+        return len(removed)
+
+# -------------------- Session Checkpoint --------------------
+def _pair_check(q, a):
+    """64-bit fingerprint tying a logged storage index to the card that was
+    there; wide enough that a big deck has no collisions to speak of."""
+    return int.from_bytes(hashlib.blake2b(f"{q}\x1f{a}".encode("utf-8"), digest_size=8).digest(), "big")
+
+def _card_check(card):
+    return _pair_check(card["q"], card["a"])
+
+
+class SessionCheckpoint:
+    """Crash-safe record of a study session, kept next to the deck file.
+
+    A snapshot (<deck>.session.json) holds the quiz seed, score, current
+    card and every card answered this round; an append-only log
+    (<deck>.session.log) adds one line per answer, move or delete since.
+    Cards are named by storage index, which shuffles and deletes leave
+    alone, plus a checksum of their text, so a resume notices a deck that
+    changed underneath it and finds the card by content instead. As in
+    DeckJournal, lines carry sequence numbers and the snapshot names the
+    last one it covers, so a crash between writing a snapshot and clearing
+    the log is harmless. The UI thread only queues work; a writer thread
+    does all file I/O and reads the answers for each snapshot from the
+    deck itself. Replaying a line the snapshot already reflects changes
+    nothing, so it does not matter that the deck may be a step ahead.
+    """
+
+    VERSION = 2
+
+    def __init__(self, deck_path):
+        base = os.path.splitext(deck_path)[0]
+        self.snapshot = base + ".session.json"
+        self.log = base + ".session.log"
+        self.seq = 0
+        self.since = 0          # log lines since the last snapshot
+        self.pending = None     # (current, card_index) to restore once the deck loads
+        self.queue = queue.Queue()
+        self.writer = None
+
+    # ---- reading ----
+    def load(self):
+        """The saved session as a dict, or None if there is nothing to resume."""
+        try:
+            with open(self.snapshot, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") != self.VERSION:
+                return None
+            base = int(state["seq"])
+            answers = {int(s): [bool(ok), int(check)] for s, ok, check in state["answers"]}
+        except:
+            return None
+        last = base
+        try:
+            with open(self.log, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        n = int(rec["n"])
+                    except:
+                        continue    # torn write from a crash
+                    if n <= base:
+                        continue
+                    last = max(last, n)
+                    if "a" in rec:
+                        answers[int(rec["a"])] = [bool(rec["ok"]), int(rec["k"])]
+                    for slot in rec.get("d", ()):
+                        answers.pop(int(slot), None)
+                    if "s" in rec:
+                        state["score"] = rec["s"]
+                    state["current"] = rec.get("c")
+        except OSError:
+            pass
+        state["answers"], state["seq"] = answers, last
+        return state if answers else None
+
+    def resume(self, session, state):
+        """Replay a loaded state onto a freshly opened session.
+
+        The deck applies the answers itself (see restore_answers()): a
+        SQLite deck only writes the ones its rows lack, and a JSON deck
+        still loading places the rest as its cards stream in.
+        """
+        deck = session.deck
+        if deck.seed != state.get("seed"):
+            deck.shuffle(state.get("seed"))
+        deck.restore_answers(state["answers"])
+        session.score = int(state.get("score", deck.correct_count()))
+        current = state.get("current")
+        index = deck.slot_position(*current) if current else None
+        if index is not None:
+            session.card_index = index
+        elif current and deck.loading:
+            self.pending = (current, session.card_index)    # see loaded()
+        self.seq = state["seq"]
+        self.start(session)
+
+    def loaded(self, session):
+        """The deck finished loading: go back to the card the resumed
+        session was on, unless the student has moved on. True if it did."""
+        pending, self.pending = self.pending, None
+        if pending is None or session.card_index != pending[1]:
+            return False
+        index = session.deck.slot_position(*pending[0])
+        if index is None:
+            return False
+        session.card_index = index
+        self.move(session)
+        return True
+
+    # ---- writing ----
+    def start(self, session):
+        """Record session from here on, beginning with a fresh snapshot."""
+        session.checkpoint = self
+        self.rebase(session)
+
+    def rebase(self, session):
+        """Queue a snapshot of the session as it stands, e.g. after a
+        restart; the writer thread gathers the answers."""
+        state = {"version": self.VERSION, "seq": self.seq, "seed": session.deck.seed,
+                 "score": session.score, "current": self._current(session)}
+        self.since = 0
+        self._put(("snapshot", state, session.deck))
+
+    def answer(self, session, index, correct):
+        deck = session.deck
+        self._line({"a": deck.storage_index(index), "ok": int(correct), "k": _card_check(deck[index]),
+                    "s": session.score, "c": self._current(session)})
+        if self.since >= CHECKPOINT_EVERY:
+            self.rebase(session)
+
+    def move(self, session):
+        self._line({"c": self._current(session)})
+
+    def drop(self, session, slots):
+        """Log cards leaving the deck, by the storage indices they had."""
+        self._line({"d": list(slots), "s": session.score, "c": self._current(session)})
+
+    @staticmethod
+    def _current(session):
+        card = session.current()
+        if card is None:
+            return None
+        return [session.deck.storage_index(session.card_index), _card_check(card)]
+
+    def _line(self, body):
+        self.seq += 1
+        self.since += 1
+        self._put(("line", json.dumps({"n": self.seq, **body}) + "\n"))
+
+    def _put(self, item):
+        self.queue.put(item)
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write_loop, daemon=True)
+            self.writer.start()
+
+    def close(self, session=None):
+        """Write a final snapshot (if given a session) and wait for the disk."""
+        if session is not None and session.checkpoint is self:
+            self.rebase(session)
+        if self.writer is not None:
+            self.queue.put(None)
+            self.writer.join(5)
+            self.writer = None
+
+    def _write_loop(self):
+        while True:
+            items = [self.queue.get()]
+            while True:     # everything queued meanwhile goes out in one write
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            # A snapshot covers every line queued before it, so only the
+            # last one in the batch needs writing.
+            last = max((i for i, item in enumerate(items) if item is not None and item[0] == "snapshot"),
+                       default=0)
+            lines = []
+            for item in items[last:]:
+                if item is None:
+                    self._append(lines)
+                    return
+                if item[0] == "line":
+                    lines.append(item[1])
+                else:
+                    self._append(lines)
+                    lines = []
+                    self._write_snapshot(item[1], item[2])
+            self._append(lines)
+
+    def _append(self, lines):
+        if not lines:
+            return
+        try:
+            with open(self.log, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            STATS.wrote("session.log", sum(map(len, lines)))
+        except OSError:
+            pass
+
+    def _write_snapshot(self, state, deck):
+        try:
+            answers = deck.answered_state()
+        except Exception:
+            return      # keep the log; the next snapshot will try again
+        state["answers"] = [[slot, int(ok), check] for slot, (ok, check) in answers.items()]
+        try:
+            atomic_write(self.snapshot, lambda f: json.dump(state, f))
+            if STATS.enabled:
+                STATS.wrote("session.snapshot", os.path.getsize(self.snapshot))
+            # Every line up to state["seq"] was queued (and written) before
+            # this snapshot, so the log can start over.
+            open(self.log, "w").close()
+        except OSError:
+            pass
+
+# -------------------- Workspace --------------------
+class Workspace:
+    """The decks a student can pick from, and the ones currently open.
+
+    Decks are FLASH_JSON / FLASH_DB in the working directory plus every
+    deck file in WORKSPACE_DIR. Opened decks stay cached with their
+    session and checkpoint, most recently used last, until their estimated
+    memory passes DECK_CACHE_BYTES; the oldest are then checkpointed and
+    closed. Switching back to a cached deck is a dict lookup, and an
+    evicted one reopens from its memory-mapped file and checkpoint.
+    """
+
+    def __init__(self, root=WORKSPACE_DIR, budget=DECK_CACHE_BYTES):
+        self.root = root
+        self.budget = budget
+        self.cache = collections.OrderedDict()  # path -> (session, checkpoint)
+
+    def decks(self):
+        """Paths of every deck on offer, the working-directory deck first."""
+        found = [p for p in (FLASH_JSON, FLASH_DB) if os.path.exists(p)]
+        if os.path.isdir(self.root):
+            for name in sorted(os.listdir(self.root), key=str.casefold):
+                stem, ext = os.path.splitext(name)
+                if ext.lower() in DECK_EXTENSIONS and not stem.endswith((".session", ".sched")):
+                    found.append(os.path.join(self.root, name))
+        return found or [default_deck_path()]
+
+    @staticmethod
+    def cost(session):
+        """Estimated bytes a deck holds in memory."""
+        deck = session.deck
+        if isinstance(deck, SqliteDeck):
+            return deck.PAGE_SIZE * deck.MAX_PAGES * CARD_OVERHEAD_BYTES
+        try:
+            text = os.path.getsize(deck.path)
+        except OSError:
+            text = 0
+        count = len(deck)
+        if deck.loading:
+            # Still streaming in: size the whole file by its first cards.
+            sample = [c for c in deck.cards[:deck.FIRST_BATCH] if c is not None]
+            per_card = sum(len(c.q) + len(c.a) + 8 for c in sample) / max(len(sample), 1)
+            count = max(count, int(text / per_card))
+        return count * CARD_OVERHEAD_BYTES + text
+
+    def used(self):
+        return sum(self.cost(session) for session, _ in self.cache.values())
+
+    def open(self, path, spaced=False, seed=None):
+        """(session, checkpoint, saved) for path, cached or freshly opened.
+
+        saved is a checkpoint state to offer resuming; it is None for a
+        cached deck (its session is still live) or when nothing was saved.
+        """
+        entry = self.cache.pop(path, None)
+        if entry is not None:
+            self.cache[path] = entry
+            return entry + (None,)
+        session = StudySession(open_deck(path, seed), spaced=spaced)
+        checkpoint = SessionCheckpoint(path)
+        saved = checkpoint.load()
+        if saved is None:
+            checkpoint.start(session)
+        self.cache[path] = (session, checkpoint)
+        self.evict()
+        return session, checkpoint, saved
+
+    def evict(self):
+        """Close least recently used decks until the cache fits the budget;
+        the most recent one always stays."""
+        used = self.used()
+        while used > self.budget and len(self.cache) > 1:
+            path, (session, checkpoint) = self.cache.popitem(last=False)
+            used -= self.cost(session)
+            self._close(session, checkpoint)
+
+    @staticmethod
+    def _close(session, checkpoint):
+        checkpoint.close(session)
+        session.deck.close()
+
+    def close_all(self):
+        while self.cache:
+            _, (session, checkpoint) = self.cache.popitem()
+            self._close(session, checkpoint)
+
+# -------------------- Deck Listing --------------------
+class DeckListing:
+    """A deck's cards in browser order, read one window at a time.
+
+    In deck order rows come straight from the deck. A sorted order is a
+    list of handles (Card objects, or row ids for SQLite) produced by
+    deck.sort_order(), which may run on a worker thread.
+    """
+
+    def __init__(self, deck):
+        self.deck = deck
+        self.order = None
+        self.column = None
+        self.reverse = False
+
+    def __len__(self):
+        return len(self.deck) if self.order is None else len(self.order)
+
+    def set_order(self, column=None, reverse=False, order=None):
+        self.column, self.reverse = column, reverse
+        self.order = order if column else None
+
+    def rows(self, start, count):
+        end = min(start + count, len(self))
+        if self.order is None:
+            return [self.deck[i] for i in range(start, end)]
+        return self.deck.resolve(self.order[start:end])
+
+    def cards_at(self, rows):
+        """Cards at the given listing rows, fetched in contiguous runs."""
+        cards, run = [], []
+        for row in sorted(rows):
+            if run and row != run[-1] + 1:
+                cards.extend(self.rows(run[0], len(run)))
+                run = []
+            run.append(row)
+        if run:
+            cards.extend(self.rows(run[0], len(run)))
+        return cards
+
+    def discard(self, cards):
+        """Forget deleted cards; deck order needs nothing."""
+        if self.order is not None:
+            gone = {self.deck.handle(c) for c in cards}
+            self.order = [h for h in self.order if h not in gone]
+
+# -------------------- Bulk Import --------------------
+IMPORT_FORMATS = ("csv", "tsv", "jsonl")
+IMPORT_MAX_FIELD = 10000    # characters per question or answer
+IMPORT_CHUNK = 5000         # rows per worker task
+
+def guess_import_format(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext in ("jsonl", "ndjson"):
+        return "jsonl"
+    if ext in ("tsv", "tab"):
+        return "tsv"
+    return "csv"
+
+def _read_import_rows(path, fmt):
+    """Yield (line_no, payload) lazily; JSONL lines are parsed by the workers."""
+    if fmt == "jsonl":
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_no, line
+        return
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f, delimiter="\t" if fmt == "tsv" else ",")
+        for row in reader:
+            if reader.line_num == 1 and [c.strip().lower() for c in row[:2]] in (["question", "answer"], ["q", "a"]):
+                continue    # header row
+            if row:
+                yield reader.line_num, row
+
+def _clean_field(text):
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+def _normalize_import_rows(fmt, rows):
+    """Worker task: validate and normalize rows -> (accepted, rejected).
+
+    accepted holds (q, a, dedupe forms); rejected holds (line, reason, raw).
+    """
+    accepted, rejected = [], []
+    for line_no, payload in rows:
+        fields = payload
+        if fmt == "jsonl":
+            try:
+                fields = _parse_card_item(json.loads(payload))
+            except ValueError as e:
+                rejected.append((line_no, f"invalid JSON: {e}", payload[:200]))
+                continue
+            if fields is None:
+                rejected.append((line_no, "not a [question, answer] pair or question/answer object", payload[:200]))
+                continue
+        if len(fields) < 2:
+            rejected.append((line_no, "expected a question and an answer", str(payload)[:200]))
+            continue
+        q, a = _clean_field(fields[0]), _clean_field(fields[1])
+        if not q or not a:
+            rejected.append((line_no, "empty question or answer", str(payload)[:200]))
+        elif len(q) > IMPORT_MAX_FIELD or len(a) > IMPORT_MAX_FIELD:
+            rejected.append((line_no, f"field longer than {IMPORT_MAX_FIELD} characters", str(payload)[:200]))
+        else:
+            accepted.append((q, a, (_dedupe_text(q), _dedupe_text(a))))
+    return accepted, rejected
+
+def iter_chunk_results(task, path, rows, chunk_size, workers=None, initializer=None, initargs=(),
+                       mp_context=None):
+    """Run task over rows (read from the file at path) in chunks on a
+    process pool, yielding the results in file order.
+
+    At most two chunks per worker are in flight, so memory stays bounded
+    however large the file is. With one worker, or a file under 1 MiB,
+    everything runs inline instead. initializer(*initargs) runs once per
+    worker process (or once here when inline). mp_context, if given,
+    picks how the worker processes start.
+    """
+    chunks = iter(lambda: list(itertools.islice(rows, chunk_size)), [])
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or os.path.getsize(path) < 1 << 20:
+        if initializer is not None:
+            initializer(*initargs)
+        for chunk in chunks:
+            yield task(chunk)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                             initializer=initializer, initargs=initargs) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.submit(task, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_import_batches(path, fmt=None, workers=None, chunk_size=IMPORT_CHUNK, mp_context=None):
+    """Stream a CSV/TSV/JSONL file through a process pool, in file order."""
+    fmt = fmt or guess_import_format(path)
+    return iter_chunk_results(partial(_normalize_import_rows, fmt), path,
+                              _read_import_rows(path, fmt), chunk_size, workers,
+                              mp_context=mp_context)
+
+class BatchReport:
+    """Timing and rejected rows shared by ImportReport and GradeReport."""
+
+    MAX_KEPT_REJECTS = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self.rejected = 0
+        self.rejects = []       # first MAX_KEPT_REJECTS (line, reason, raw)
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def reject(self, rejected):
+        """Count rejected rows, keeping the first MAX_KEPT_REJECTS."""
+        self.rejected += len(rejected)
+        room = self.MAX_KEPT_REJECTS - len(self.rejects)
+        if room > 0:
+            self.rejects.extend(rejected[:room])
+
+class ImportReport(BatchReport):
+    def __init__(self, path):
+        super().__init__(path)
+        self.rows = 0
+        self.added = 0
+        self.duplicates = 0
+
+    def rate(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"{self.rows} rows in {self.seconds:.1f}s ({self.rate():.0f} rows/s): "
+                f"{self.added} added, {self.duplicates} duplicates, {self.rejected} rejected")
+
+class DeckImporter:
+    """Commits normalized import batches to a deck, skipping duplicates.
+
+    Duplicates are checked against the deck's own duplicate index, which
+    add_many keeps current, so earlier batches of the same import count
+    too; only repeats inside one batch need a local set.
+    """
+
+    def __init__(self, deck, path):
+        self.deck = deck
+        self.report = ImportReport(path)
+
+    def commit(self, batch):
+        accepted, rejected = batch
+        report, deck = self.report, self.deck
+        fresh, forms, batch_keys = [], [], set()
+        for q, a, f in accepted:
+            key = f if deck.match_answer else f[0]
+            if key in batch_keys or deck.has_duplicate_forms(f):
+                report.duplicates += 1
+                continue
+            batch_keys.add(key)
+            fresh.append((q, a))
+            forms.append(f)
+        if fresh:
+            deck.add_many(fresh, forms)
+        report.added += len(fresh)
+        report.reject(rejected)
+        report.rows += len(accepted) + len(rejected)
+        report.seconds = time.perf_counter() - report.started
+        return report
+
+@STATS.timed("deck.import")
+def import_cards(deck, path, fmt=None, workers=None):
+    """Headless import of a whole file into deck; returns the ImportReport."""
+    deck.wait()
+    importer = DeckImporter(deck, path)
+    for batch in iter_import_batches(path, fmt, workers):
+        importer.commit(batch)
+    return importer.report
+
+# -------------------- Batch Grading --------------------
+GRADE_CHUNK = 500           # answer sheets per worker task
+
+_grade_key = {}             # card id -> answer, set once per worker process
+_grade_matcher = None
+
+def deck_card_table(deck):
+    """card id -> (question, answer), with ids as strings (JSON object keys).
+
+    Ids are row ids for SQLite decks and 0-based positions in stored
+    order for JSON decks; neither changes when the quiz is reshuffled.
+    """
+    deck.wait()
+    if isinstance(deck, SqliteDeck):
+        return {str(c["id"]): (c["q"], c["a"]) for c in deck}
+    return {str(i): (c["q"], c["a"]) for i, c in enumerate(deck)}
+
+def _init_grader(key):
+    global _grade_key, _grade_matcher
+    _grade_key, _grade_matcher = key, AnswerMatcher()
+
+def _grade_sheet_lines(lines):
+    """Worker task: grade (line_no, JSON) sheets -> (scores, tallies, rejected).
+
+    scores holds (line, student, answered, correct, typos, unknown ids);
+    tallies maps card id -> [attempts, correct] within this chunk.
+    """
+    scores, tallies, rejected = [], {}, []
+    key, check = _grade_key, _grade_matcher.check
+    for line_no, raw in lines:
+        try:
+            sheet = json.loads(raw)
+        except ValueError as e:
+            rejected.append((line_no, f"invalid JSON: {e}", raw[:200]))
+            continue
+        if not isinstance(sheet, dict):
+            rejected.append((line_no, "not a JSON object", raw[:200]))
+            continue
+        student = sheet.get("student")
+        answers = sheet.get("answers") if "answers" in sheet else \
+            {k: v for k, v in sheet.items() if k != "student"}
+        if not isinstance(answers, dict):
+            rejected.append((line_no, "answers is not a {card id: answer} object", raw[:200]))
+            continue
+        answered = correct = typos = unknown = 0
+        for cid, text in answers.items():
+            expected = key.get(cid)
+            if expected is None:
+                unknown += 1
+                continue
+            answered += 1
+            tally = tallies.get(cid)
+            if tally is None:
+                tally = tallies[cid] = [0, 0]
+            tally[0] += 1
+            verdict = check(str(text), expected)
+            if verdict:
+                correct += 1
+                tally[1] += 1
+                if verdict == "typo":
+                    typos += 1
+        scores.append((line_no, f"line {line_no}" if student is None else str(student),
+                       answered, correct, typos, unknown))
+    return scores, tallies, rejected
+
+def iter_grade_batches(path, key, workers=None, chunk_size=GRADE_CHUNK):
+    """Stream a JSONL file of answer sheets through a process pool, in
+    order; each worker receives the answer key once, at start-up."""
+    return iter_chunk_results(_grade_sheet_lines, path, _read_import_rows(path, "jsonl"),
+                              chunk_size, workers, _init_grader, (key,))
+
+class GradeReport(BatchReport):
+    SCORE_FIELDS = ["line", "student", "answered", "correct", "typos", "unknown", "percent"]
+    DIFFICULTY_FIELDS = ["card_id", "question", "answer", "attempts", "correct", "percent"]
+
+    def __init__(self, path, cards):
+        super().__init__(path)
+        self.cards = cards      # deck_card_table()
+        self.sheets = 0
+        self.graded = 0         # individual answers
+        self.tallies = {}       # card id -> [attempts, correct]
+
+    def add(self, batch):
+        """Fold one graded batch in; returns its per-student score rows."""
+        scores, tallies, rejected = batch
+        for cid, (attempts, correct) in tallies.items():
+            tally = self.tallies.get(cid)
+            if tally is None:
+                self.tallies[cid] = [attempts, correct]
+            else:
+                tally[0] += attempts
+                tally[1] += correct
+        self.sheets += len(scores)
+        self.graded += sum(row[2] for row in scores)
+        self.reject(rejected)
+        self.seconds = time.perf_counter() - self.started
+        return [row + (round(100 * row[3] / row[2], 2) if row[2] else 0.0,) for row in scores]
+
+    def difficulty(self):
+        """(card id, q, a, attempts, correct, percent), hardest first."""
+        rows = []
+        for cid, (attempts, correct) in self.tallies.items():
+            q, a = self.cards[cid]
+            rows.append((cid, q, a, attempts, correct, round(100 * correct / attempts, 2)))
+        rows.sort(key=lambda r: (r[5], -r[3]))
+        return rows
+
+    def rate(self):
+        return self.sheets / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"{self.sheets} sheets, {self.graded} answers in {self.seconds:.1f}s "
+                f"({self.rate():.0f} sheets/s), {self.rejected} rejected")
+
+@STATS.timed("deck.grade")
+def grade_answer_sheets(deck, path, scores, workers=None):
+    """Grade every sheet in path against deck, writing one CSV row per
+    student to the open file scores as they finish; returns the GradeReport."""
+    report = GradeReport(path, deck_card_table(deck))
+    key = {cid: a for cid, (_, a) in report.cards.items()}
+    writer = csv.writer(scores)
+    writer.writerow(report.SCORE_FIELDS)
+    for batch in iter_grade_batches(path, key, workers):
+        writer.writerows(report.add(batch))
+    return report
+
+# -------------------- Classroom Server --------------------
+QUIZ_PORT = 8765
+LEADERBOARD_SIZE = 10
+QUIZ_MAX_LINE = 64 << 10    # longest request line the server will read
+
+class QuizPlayer:
+    __slots__ = ("name", "pos", "score", "answered")
+
+    def __init__(self, name):
+        self.name = name
+        self.pos = 0        # next quiz position to serve
+        self.score = 0
+        self.answered = 0
+
+class QuizServer:
+    """Serves one deck to a classroom over newline-delimited JSON.
+
+    Each request is one JSON object with an "op" (join, card, answer,
+    skip, leaderboard) and an optional "id" echoed in the reply. It runs
+    on asyncio with one coroutine per connection, and every request is
+    answered from memory without blocking, so hundreds of students share
+    one thread. Players walk the deck in the same quiz order and are keyed
+    by name, so a dropped client can rejoin where it left off. The
+    leaderboard is only re-ranked when a score has changed since it was
+    last asked for.
+    """
+
+    def __init__(self, deck, matcher=None):
+        self.deck = deck
+        self.matcher = matcher or AnswerMatcher()
+        self.players = {}       # name -> QuizPlayer
+        self.board = []
+        self.board_dirty = False
+        self.connected = 0
+
+    # ---- requests ----
+    def card(self, player):
+        if player.pos >= len(self.deck):
+            return None
+        return {"pos": player.pos, "q": self.deck[player.pos]["q"], "total": len(self.deck)}
+
+    def join(self, name):
+        player = self.players.get(name)
+        if player is None:
+            player = self.players[name] = QuizPlayer(name)
+            self.board_dirty = True
+        return player
+
+    def answer(self, player, text):
+        if player.pos >= len(self.deck):
+            return {"error": "no card left to answer"}
+        expected = self.deck[player.pos]["a"]
+        verdict = self.matcher.check(str(text), expected)
+        player.pos += 1
+        player.answered += 1
+        if verdict:
+            player.score += 1
+        self.board_dirty = True
+        return {"verdict": verdict, "answer": expected, "score": player.score, "card": self.card(player)}
+
+    def leaderboard(self):
+        if self.board_dirty:
+            top = heapq.nlargest(LEADERBOARD_SIZE, self.players.values(),
+                                 key=lambda p: (p.score, -p.answered))
+            self.board = [[p.name, p.score, p.answered] for p in top]
+            self.board_dirty = False
+        return self.board
+
+    def dispatch(self, req, player):
+        """Reply for one request -> (reply, player after it)."""
+        op = req.get("op")
+        if op == "join":
+            name = str(req.get("name", "")).strip()[:40]
+            if not name:
+                return {"error": "join needs a name"}, player
+            player = self.join(name)
+            return {"name": player.name, "score": player.score, "card": self.card(player)}, player
+        if op == "leaderboard":
+            return {"leaders": self.leaderboard(), "players": len(self.players)}, player
+        if player is None:
+            return {"error": "join first"}, player
+        if op == "card":
+            return {"card": self.card(player)}, player
+        if op == "answer":
+            return self.answer(player, req.get("text", "")), player
+        if op == "skip":
+            player.pos = min(player.pos + 1, len(self.deck))
+            return {"card": self.card(player)}, player
+        return {"error": f"unknown op {op!r}"}, player
+
+    # ---- networking ----
+    async def handle(self, reader, writer):
+        import asyncio
+        self.connected += 1
+        player = None
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError, asyncio.LimitOverrunError):
+                    break   # over QUIZ_MAX_LINE or reset by the client
+                if not line:
+                    break
+                try:
+                    req = json.loads(line)
+                    if not isinstance(req, dict):
+                        raise ValueError("not a JSON object")
+                    reply, player = self.dispatch(req, player)
+                except ValueError as e:
+                    req, reply = {}, {"error": f"bad request: {e}"}
+                if "id" in req:
+                    reply["id"] = req["id"]
+                writer.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connected -= 1
+            writer.close()
+
+    async def print_board(self, every=5.0):
+        """Keep a leaderboard on the console while the server runs."""
+        import asyncio
+        shown = None
+        while True:
+            await asyncio.sleep(every)
+            board = self.leaderboard()
+            if board != shown:
+                shown = [row[:] for row in board]
+                lines = [f"{i:>2}. {name:<20} {score:>5} / {answered}"
+                         for i, (name, score, answered) in enumerate(board, 1)]
+                print(f"-- {len(self.players)} players, {self.connected} connected --", *lines, sep="\n",
+                      flush=True)
+
+    async def serve(self, host="127.0.0.1", port=QUIZ_PORT, quiet=False):
+        import asyncio
+        self.deck.wait()
+        server = await asyncio.start_server(self.handle, host, port, limit=QUIZ_MAX_LINE)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"Serving {len(self.deck)} cards on {host}:{port}", flush=True)
+        async with server:
+            board = None if quiet else asyncio.ensure_future(self.print_board())
+            try:
+                await server.serve_forever()
+            finally:
+                if board is not None:
+                    board.cancel()
+
+def parse_address(text, default_host="127.0.0.1"):
+    """'host:port', ':port' or 'port' -> (host, port)."""
+    host, _, port = text.rpartition(":")
+    return host or default_host, int(port or QUIZ_PORT)
+
+class QuizClient:
+    """Blocking client for QuizServer; one request in flight at a time."""
+
+    def __init__(self, host, port, timeout=10):
+        import socket
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.file = self.sock.makefile("rwb")
+
+    def request(self, op, **fields):
+        self.file.write(json.dumps({"op": op, **fields}).encode("utf-8") + b"\n")
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        try:
+            self.file.close()
+        finally:
+            self.sock.close()
+
+# -------------------- Sound Effects --------------------
+SAMPLE_RATE = 22050
+TONES = {"correct": (700, 250), "wrong": (800, 250)}   # name -> (Hz, ms)
+
+def render_tone(freq, ms, rate=SAMPLE_RATE, channels=1, volume=0.4):
+    """16-bit PCM sine tone with short fades so it doesn't click."""
+    count = rate * ms // 1000
+    fade = max(1, rate // 200)
+    peak = 32767 * volume
+    step = 2 * math.pi * freq / rate
+    pcm = array("h", bytes(2 * count * channels))
+    for i in range(count):
+        env = min(1.0, i / fade, (count - i) / fade)
+        value = int(peak * env * math.sin(step * i))
+        for c in range(channels):
+            pcm[i * channels + c] = value
+    return pcm
+
+def load_wav_pcm(path):
+    """(pcm, rate, channels) for a 16-bit PCM WAV file, or None."""
+    try:
+        with wave.open(path, "rb") as w:
+            if w.getsampwidth() != 2:
+                return None
+            pcm = array("h")
+            pcm.frombytes(w.readframes(w.getnframes()))
+            if sys.byteorder == "big":
+                pcm.byteswap()
+            return pcm, w.getframerate(), w.getnchannels()
+    except Exception:
+        return None
+
+class NullSink:
+    """Swallows audio; streaming=True sinks receive mixed PCM chunks."""
+    streaming = True
+    blocking = False
+
+    def __init__(self):
+        self.frames = 0
+
+    def open(self, rate, channels):
+        self.channels = channels
+
+    def write(self, pcm):
+        self.frames += len(pcm) // self.channels
+
+    def close(self):
+        pass
+
+class WavFileSink(NullSink):
+    """Writes everything the engine plays into a WAV file (handy in tests)."""
+
+    def __init__(self, path):
+        NullSink.__init__(self)
+        self.path = path
+        self.out = None
+
+    def open(self, rate, channels):
+        NullSink.open(self, rate, channels)
+        self.out = wave.open(self.path, "wb")
+        self.out.setnchannels(channels)
+        self.out.setsampwidth(2)
+        self.out.setframerate(rate)
+
+    def write(self, pcm):
+        NullSink.write(self, pcm)
+        if sys.byteorder == "big":
+            pcm = array("h", pcm)
+            pcm.byteswap()
+        self.out.writeframes(pcm.tobytes())
+
+    def close(self):
+        if self.out:
+            self.out.close()
+            self.out = None
+
+class PipeSink(NullSink):
+    """Streams raw PCM to aplay/paplay, so Linux gets sound too."""
+    blocking = True
+
+    def __init__(self, player):
+        NullSink.__init__(self)
+        self.player = player
+        self.proc = None
+
+    def open(self, rate, channels):
+        NullSink.open(self, rate, channels)
+        if os.path.basename(self.player) == "paplay":
+            cmd = [self.player, "--raw", "--format=s16le", f"--rate={rate}", f"--channels={channels}"]
+        else:
+            cmd = [self.player, "-q", "-t", "raw", "-f", "S16_LE", "-r", str(rate), "-c", str(channels)]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                     stderr=subprocess.DEVNULL)
+
+    def write(self, pcm):
+        NullSink.write(self, pcm)
+        self.proc.stdin.write(pcm.tobytes())
+
+    def close(self):
+        if self.proc:
+            try:
+                self.proc.stdin.close()
+                self.proc.terminate()
+            except Exception:
+                pass
+            self.proc = None
+
+class WinsoundSink:
+    """Effects via winsound.Beep, which Windows mixes over the PlaySound music."""
+    streaming = False
+
+    def play(self, name):
+        freq, ms = TONES[name]
+        winsound.Beep(freq, ms)
+
+    def close(self):
+        pass
+
+def default_sink():
+    if WINSOUND_AVAILABLE:
+        return WinsoundSink()
+    for player in ("paplay", "aplay"):
+        path = shutil.which(player)
+        if path:
+            return PipeSink(path)
+    return NullSink()
+
+class AudioEngine:
+    """Plays sound effects from a dedicated worker thread.
+
+    play() only queues a name, so the UI thread never waits on audio. Tones
+    are rendered to PCM once when the worker starts. With a streaming sink
+    the worker also loops the background track itself and mixes effects
+    over it in CHUNK_MS blocks; it then offers the same start/toggle_mute
+    interface as MusicThread so the mute button can drive either.
+    """
+
+    CHUNK_MS = 50
+
+    def __init__(self, sink=None, music_file=None):
+        self.sink = sink or default_sink()
+        self.file = music_file
+        self.plays_music = bool(self.sink.streaming and music_file and os.path.exists(music_file))
+        self.running = False
+        self.muted = False
+        self.tones = {}
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
 
-QUESTION_COLORS = [
-    "#F4DF26", "#F79CA6", "#B4E57C",
-    "#C2AAEE", "#FCD191", "#F79ABA", "#C7EE9A"
-]
+    # ---- UI-thread API ----
+    def play(self, name):
+        STATS.count("audio." + name)
+        self.queue.put(name)
 
-FALLBACK_FLASHCARDS = [
-    ("What is Python?", "A high-level programming language."),
-    ("What is a variable?", "A container that stores data."),
-    ("What is a loop?", "A structure that repeats actions."),
-    ("What is a function?", "A reusable block of code."),
-    ("What planet is known as the Red Planet?", "Mars"),
-    ("What is H2O?", "Water"),
-]
+    def available(self):
+        return self.plays_music
 
-# -------------------- Helpers --------------------
-def safe_load_flashcards():
-    cards = []
-    if os.path.exists(FLASH_JSON):
-        try:
-            with open(FLASH_JSON, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            for item in data:
-                if isinstance(item, (list, tuple)) and len(item) >= 2:
-                    cards.append({"q": str(item[0]), "a": str(item[1]), "answered": False})
-                elif isinstance(item, dict):
-                    q = item.get("question") or item.get("q")
-                    a = item.get("answer") or item.get("a")
-                    if q and a:
-                        cards.append({"q": str(q), "a": str(a), "answered": False})
-        except:
-            pass
-    if not cards:
-        for q, a in FALLBACK_FLASHCARDS:
-            cards.append({"q": q, "a": a, "answered": False})
-    return cards
+    def start(self):
+        if self.plays_music:
+            self.running, self.muted = True, False
+            self.queue.put("")      # wake the worker
 
-def safe_save_flashcards(cards):
-    try:
-        with open(FLASH_JSON, "w", encoding="utf-8") as f:
-            json.dump([[c["q"], c["a"]] for c in cards], f, indent=2)
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not save:\n{e}")
+    def stop(self):
+        self.running = False
 
-def play_wrong_sound():
-    if WINSOUND_AVAILABLE:
-        try: winsound.Beep(800, 250)
-        except: pass
+    def toggle_mute(self):
+        if not self.plays_music:
+            return
+        if not self.running:
+            self.start()
+            return
+        self.muted = not self.muted
+        self.queue.put("")
 
-def play_correct_sound():
-    if WINSOUND_AVAILABLE:
-        try: winsound.Beep(700, 250)
-        except: pass
+    def close(self, timeout=1.0):
+        """Stop the worker and let it close the sink (child player, WAV file)."""
+        self.running = False
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    # ---- worker ----
+    def _run(self):
+        try:
+            if self.sink.streaming:
+                self._stream()
+            else:
+                while True:
+                    name = self.queue.get()
+                    if name is None:
+                        break
+                    if name in TONES:
+                        try:
+                            self.sink.play(name)
+                        except Exception:
+                            pass
+        finally:
+            self.sink.close()
+
+    def _stream(self):
+        music = load_wav_pcm(self.file) if self.plays_music else None
+        rate, channels = (music[1], music[2]) if music else (SAMPLE_RATE, 1)
+        music = music[0] if music else None
+        if music is None:
+            self.plays_music = False
+        self.tones = {name: render_tone(f, ms, rate, channels) for name, (f, ms) in TONES.items()}
+        self.sink.open(rate, channels)
+        chunk = rate * self.CHUNK_MS // 1000 * channels
+        music_pos = 0
+        active = []     # [pcm, offset] of effects still sounding
+        closing = False
+        while True:
+            music_on = music is not None and self.running and not self.muted
+            try:
+                name = None if closing else self.queue.get(block=not (active or music_on))
+                while not closing:
+                    if name is None:
+                        closing = True      # finish the effects already queued
+                    elif name in self.tones:
+                        active.append([self.tones[name], 0])
+                    name = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            music_on = music is not None and self.running and not self.muted and not closing
+            if not (active or music_on):
+                if closing:
+                    return
+                continue
+
+            if music_on:
+                end = music_pos + chunk
+                out = music[music_pos:end]
+                while len(out) < chunk:
+                    out.extend(music[:chunk - len(out)])
+                music_pos = end % len(music)
+            else:
+                out = array("h", bytes(2 * chunk))
+            for effect in active:
+                pcm, offset = effect
+                part = pcm[offset:offset + chunk]
+                for i, v in enumerate(part):
+                    mixed = out[i] + v
+                    out[i] = 32767 if mixed > 32767 else -32768 if mixed < -32768 else mixed
+                effect[1] = offset + chunk
+            active = [e for e in active if e[1] < len(e[0])]
+            self.sink.write(out)
+            if music_on and not self.sink.blocking:
+                time.sleep(self.CHUNK_MS / 1000)
 
 # -------------------- Music Handler --------------------
 class MusicThread:
@@ -91,6 +3532,9 @@ class MusicThread:
         self.running = False
         self.muted = False
 
+    def available(self):
+        return WINSOUND_AVAILABLE and bool(self.file) and os.path.exists(self.file)
+
     def start(self):
         if not WINSOUND_AVAILABLE or not self.file:
             return
@@ -141,15 +3585,542 @@ class MusicThread:
             except:
                 pass
 
+# -------------------- Animation --------------------
+class Animator:
+    """Time-based animations on the Tk event loop.
+
+    Progress comes from time.monotonic(), so a slow machine drops frames
+    instead of stretching the animation. Each key (usually a widget) has at
+    most one animation in flight; starting another cancels the old one.
+    """
+
+    FRAME_MS = 16
+
+    def __init__(self, root):
+        self.root = root
+        self.running = {}   # key -> pending after() id
+
+    def busy(self, key=None):
+        return bool(self.running) if key is None else key in self.running
+
+    def cancel(self, key):
+        after_id = self.running.pop(key, None)
+        if after_id is not None:
+            try:
+                self.root.after_cancel(after_id)
+            except Exception:
+                pass
+
+    def run(self, key, duration, step, done=None):
+        """Call step(t) for t in (0, 1] over duration seconds, then done()."""
+        self.cancel(key)
+        start = time.monotonic()
+
+        def tick():
+            t = (time.monotonic() - start) / duration if duration > 0 else 1.0
+            if t >= 1.0:
+                self.running.pop(key, None)
+                step(1.0)
+                if done:
+                    done()
+                return
+            step(t)
+            self.running[key] = self.root.after(self.FRAME_MS, tick)
+
+        self.running[key] = None
+        tick()
+
+# -------------------- Deck Browser --------------------
+def _one_line(text, width=120):
+    text = " ".join(text.split())
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+class DeckBrowser:
+    """Toplevel listing of the whole deck, drawn a screenful at a time.
+
+    Only VISIBLE_ROWS tree items ever exist; scrolling refills them from a
+    DeckListing, so opening the browser costs the same for ten cards or a
+    million. The selection is kept as listing rows and survives scrolling.
+    """
+
+    VISIBLE_ROWS = 25
+    COLUMNS = (("#", "#", 80), ("q", "Question", 420), ("a", "Answer", 300), ("status", "Status", 70))
+
+    def __init__(self, app):
+        from tkinter import ttk
+        self.app = app
+        self.listing = DeckListing(app.session.deck)
+        self.top_row = 0
+        self.selected = set()
+        self.sort_job = 0       # bumps on every sort request; stale results are dropped
+
+        self.win = tk.Toplevel(app.root)
+        self.win.title("Deck Browser")
+        self.win.geometry("920x640")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        bar = tk.Frame(self.win)
+        bar.pack(fill="x", padx=8, pady=6)
+        self.info = tk.Label(bar, text="", font=SCORE_FONT_STYLE)
+        self.info.pack(side="left")
+        tk.Button(bar, text="Delete Selected", bg="#E7695B", fg="white", font=("Helvetica", 12, "bold"),
+                  command=self.delete_selected).pack(side="right")
+        tk.Button(bar, text="Select All", font=("Helvetica", 12, "bold"),
+                  command=self.select_all).pack(side="right", padx=6)
+
+        body = tk.Frame(self.win)
+        body.pack(fill="both", expand=True, padx=8, pady=(0, 8))
+        self.tree = ttk.Treeview(body, columns=[c for c, _, _ in self.COLUMNS], show="headings",
+                                 height=self.VISIBLE_ROWS, selectmode="extended")
+        for col, title, width in self.COLUMNS:
+            self.tree.heading(col, text=title, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=width, stretch=col in ("q", "a"))
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scroll = tk.Scrollbar(body, orient="vertical", command=self.on_scroll)
+        self.scroll.pack(side="right", fill="y")
+
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_to(self.top_row + (-3 if e.delta > 0 else 3)))
+        self.tree.bind("<Button-4>", lambda e: self.scroll_to(self.top_row - 3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_to(self.top_row + 3))
+        self.tree.bind("<Prior>", lambda e: self.scroll_to(self.top_row - self.VISIBLE_ROWS))
+        self.tree.bind("<Next>", lambda e: self.scroll_to(self.top_row + self.VISIBLE_ROWS))
+        self.tree.bind("<Double-Button-1>", self.open_row)
+        self.tree.bind("<Delete>", lambda e: self.delete_selected())
+        self.win.bind("<Control-a>", lambda e: self.select_all())
+        self.redraw()
+
+    def exists(self):
+        return bool(self.win.winfo_exists())
+
+    def close(self):
+        self.win.destroy()
+        self.app.browser = None
+
+    # ---- drawing ----
+    def redraw(self):
+        total = len(self.listing)
+        self.top_row = max(0, min(self.top_row, total - self.VISIBLE_ROWS))
+        cards = self.listing.rows(self.top_row, self.VISIBLE_ROWS)
+        self.tree.delete(*self.tree.get_children())
+        for offset, card in enumerate(cards):
+            row = self.top_row + offset
+            status = "" if not card["answered"] else ("✓" if card.get("answered_correctly") else "✗")
+            self.tree.insert("", "end", iid=str(row),
+                             values=(row + 1, _one_line(card["q"]), _one_line(card["a"]), status))
+        self.tree.selection_set([str(r) for r in range(self.top_row, self.top_row + len(cards))
+                                 if r in self.selected])
+        if total:
+            self.scroll.set(self.top_row / total, (self.top_row + len(cards)) / total)
+        else:
+            self.scroll.set(0, 1)
+        self.update_info()
+
+    def update_info(self):
+        titles = {c: t.lower() for c, t, _ in self.COLUMNS}
+        order = "deck order" if self.listing.column is None else f"sorted by {titles[self.listing.column]}"
+        self.info.config(text=f"{len(self.listing)} cards, {order}, {len(self.selected)} selected")
+
+    def scroll_to(self, row):
+        self.top_row = row
+        self.redraw()
+        return "break"
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.listing)))
+        else:
+            step = self.VISIBLE_ROWS if unit == "pages" else 1
+            self.scroll_to(self.top_row + int(amount) * step)
+
+    def on_select(self, event=None):
+        # Mirror the visible part of the tree selection into self.selected;
+        # rows scrolled out of view keep their state.
+        picked = set(self.tree.selection())
+        for iid in self.tree.get_children():
+            if iid in picked:
+                self.selected.add(int(iid))
+            else:
+                self.selected.discard(int(iid))
+        self.update_info()
+
+    def select_all(self):
+        self.selected = set(range(len(self.listing)))
+        self.redraw()
+        return "break"
+
+    # ---- sorting ----
+    def sort_by(self, column, reverse=None):
+        """Sort on column; clicking the same heading again flips the order."""
+        self.sort_job += 1
+        self.selected.clear()
+        if column == "#":
+            self.listing.set_order()
+            self.redraw()
+            return
+        if reverse is None:
+            reverse = column == self.listing.column and not self.listing.reverse
+        self.info.config(text="Sorting...")
+        results, job, deck = queue.Queue(), self.sort_job, self.listing.deck
+        threading.Thread(target=lambda: results.put(deck.sort_order(column, reverse)), daemon=True).start()
+        self.poll_sort(results, job, column, reverse)
+
+    def poll_sort(self, results, job, column, reverse):
+        if job != self.sort_job or not self.exists():
+            return
+        try:
+            order = results.get_nowait()
+        except queue.Empty:
+            self.win.after(50, self.poll_sort, results, job, column, reverse)
+            return
+        self.listing.set_order(column, reverse, order)
+        self.top_row = 0
+        self.redraw()
+
+    def refresh(self):
+        """Called after the deck changed behind the browser's back."""
+        self.selected.clear()
+        if self.listing.column is None:
+            self.redraw()
+        else:
+            self.sort_by(self.listing.column, self.listing.reverse)
+
+    # ---- actions ----
+    def open_row(self, event):
+        iid = self.tree.identify_row(event.y)
+        if not iid or self.app.input_locked:
+            return
+        card = self.listing.rows(int(iid), 1)
+        if card and self.app.session.jump(card[0]) is not None:
+            self.app.display_card()
+
+    def delete_selected(self):
+        if not self.selected or self.app.input_locked:
+            return
+        if not messagebox.askyesno("Delete", f"Delete {len(self.selected)} selected card(s)?", parent=self.win):
+            return
+        cards = self.listing.cards_at(self.selected)
+        removed = self.app.session.delete_many(cards)
+        self.listing.discard(removed)
+        self.selected.clear()
+        self.redraw()
+        self.app.status.config(text=f"Deleted {len(removed)} card(s)")
+        self.app.display_card()
+
+# -------------------- Stats Panel --------------------
+class StatsPanel:
+    """Hidden Toplevel (Ctrl+Shift+S) showing what STATS has recorded.
+
+    Refreshes itself once a second while open, can switch instrumentation
+    on and off, and exports the numbers as JSON or CSV.
+    """
+
+    REFRESH_MS = 1000
+    COLUMNS = (("name", "Operation", 200), ("count", "Count", 70), ("mean", "Mean ms", 80),
+               ("p50", "p50 ms", 80), ("p95", "p95 ms", 80), ("p99", "p99 ms", 80),
+               ("max", "Max ms", 80))
+
+    def __init__(self, app):
+        from tkinter import ttk
+        self.app = app
+        self.job = None
+
+        self.win = tk.Toplevel(app.root)
+        self.win.title("Stats")
+        self.win.geometry("720x520")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        bar = tk.Frame(self.win)
+        bar.pack(fill="x", padx=8, pady=6)
+        self.toggle_btn = tk.Button(bar, font=("Helvetica", 12, "bold"), command=self.toggle)
+        self.toggle_btn.pack(side="left")
+        tk.Button(bar, text="Reset", font=("Helvetica", 12, "bold"),
+                  command=self.reset).pack(side="left", padx=6)
+        tk.Button(bar, text="Export CSV...", font=("Helvetica", 12, "bold"),
+                  command=lambda: self.export(".csv")).pack(side="right")
+        tk.Button(bar, text="Export JSON...", font=("Helvetica", 12, "bold"),
+                  command=lambda: self.export(".json")).pack(side="right", padx=6)
+
+        self.tree = ttk.Treeview(self.win, columns=[c for c, _, _ in self.COLUMNS], show="headings")
+        for col, title, width in self.COLUMNS:
+            self.tree.heading(col, text=title)
+            self.tree.column(col, width=width, stretch=col == "name", anchor="w" if col == "name" else "e")
+        self.tree.pack(fill="both", expand=True, padx=8)
+        self.totals = tk.Label(self.win, text="", font=("Helvetica", 12), justify="left", anchor="w")
+        self.totals.pack(fill="x", padx=8, pady=6)
+        self.refresh()
+
+    def exists(self):
+        return bool(self.win.winfo_exists())
+
+    def close(self):
+        if self.job is not None:
+            self.win.after_cancel(self.job)
+        self.win.destroy()
+        self.app.stats_panel = None
+
+    def refresh(self):
+        self.job = None
+        self.toggle_btn.config(text="Disable" if STATS.enabled else "Enable")
+        data = STATS.snapshot()
+        self.tree.delete(*self.tree.get_children())
+        for name, op in data["ops"].items():
+            self.tree.insert("", "end", values=(name, op["count"], f"{op['mean_ms']:.2f}",
+                                                f"{op['p50_ms']:.2f}", f"{op['p95_ms']:.2f}",
+                                                f"{op['p99_ms']:.2f}", f"{op['max_ms']:.2f}"))
+        counters = ", ".join(f"{k} {v}" for k, v in sorted(data["counters"].items())) or "none"
+        written = ", ".join(f"{k} {v / 1024:.1f} KiB" for k, v in sorted(data["bytes"].items())) or "none"
+        stall = data["stalls"][-1]["ms"] if data["stalls"] else None
+        self.totals.config(text=f"Counters: {counters}\nWritten: {written}\n"
+                                f"UI stalls: {len(data['stalls'])}"
+                                + (f" (last {stall:.0f} ms)" if stall is not None else ""))
+        self.job = self.win.after(self.REFRESH_MS, self.refresh)
+
+    def toggle(self):
+        STATS.enable(not STATS.enabled)
+        if STATS.enabled:
+            self.app.lag_monitor.start()
+        else:
+            self.app.lag_monitor.stop()
+        if self.job is not None:
+            self.win.after_cancel(self.job)
+        self.refresh()
+
+    def reset(self):
+        STATS.reset()
+        if self.job is not None:
+            self.win.after_cancel(self.job)
+        self.refresh()
+
+    def export(self, ext):
+        from tkinter import filedialog
+        path = filedialog.asksaveasfilename(parent=self.win, defaultextension=ext,
+                                            initialfile="studystack-stats" + ext,
+                                            filetypes=[(ext[1:].upper(), "*" + ext)])
+        if not path:
+            return
+        try:
+            STATS.export(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not export stats:\n{e}", parent=self.win)
+
+# -------------------- Classroom Client --------------------
+class QuizClientApp:
+    """Tk window for playing a QuizServer quiz.
+
+    Network calls run on a worker thread fed by a queue, and replies come
+    back through another queue polled with after(), so a slow or dead
+    server never freezes the window. The leaderboard refreshes every
+    BOARD_MS while the window is open.
+    """
+
+    POLL_MS = 50
+    BOARD_MS = 2000
+
+    def __init__(self, host, port, name):
+        _load_tk()
+        self.address = (host, port)
+        self.name = name
+        self.requests = queue.Queue()
+        self.replies = queue.Queue()
+        self.card = None
+        self.waiting = False
+
+        self.root = tk.Tk()
+        self.root.title(f"StudyStack Classroom - {name}")
+        self.root.geometry("900x620")
+        self.root.config(bg=GAME_LOBBY_BG)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        left = tk.Frame(self.root, bg=GAME_LOBBY_BG)
+        left.pack(side="left", fill="both", expand=True, padx=16, pady=16)
+        self.score_label = tk.Label(left, text="Connecting...", font=SCORE_FONT_STYLE,
+                                    bg=GAME_LOBBY_BG, fg=TEXT_COLOR)
+        self.score_label.pack(pady=6)
+        self.card_frame = tk.Frame(left, width=560, height=260, bg=CARD_FRAME_BG, bd=3, relief="raised")
+        self.card_frame.pack(pady=10)
+        self.card_frame.pack_propagate(False)
+        self.card_label = tk.Label(self.card_frame, text="", font=CARD_FONT_STYLE,
+                                   bg=CARD_LABEL_BG, fg=TEXT_COLOR, wraplength=520)
+        self.card_label.place(relx=0.5, rely=0.5, anchor="center")
+        self.entry = tk.Entry(left, width=36, font=("Helvetica", 18))
+        self.entry.pack(pady=10)
+        self.entry.bind("<Return>", lambda e: self.submit())
+        buttons = tk.Frame(left, bg=GAME_LOBBY_BG)
+        buttons.pack()
+        tk.Button(buttons, text="SUBMIT", font=FONT_STYLE, bg=SUBMIT_COLOR, fg="white",
+                  width=12, command=self.submit).grid(row=0, column=0, padx=6)
+        tk.Button(buttons, text="Skip", font=FONT_STYLE, bg=NAV_BTN_BG, fg=TEXT_COLOR,
+                  width=8, command=lambda: self.send("skip")).grid(row=0, column=1, padx=6)
+        self.status = tk.Label(left, text="", font=SCORE_FONT_STYLE, bg=STATUS_BG, fg=TEXT_COLOR)
+        self.status.pack(fill="x", pady=10)
+
+        right = tk.Frame(self.root, bg=GAME_LOBBY_BG)
+        right.pack(side="right", fill="y", padx=16, pady=16)
+        tk.Label(right, text="🏆 Leaderboard", font=FONT_STYLE, bg=GAME_LOBBY_BG,
+                 fg=TEXT_COLOR).pack(pady=6)
+        self.board = tk.Listbox(right, width=30, height=LEADERBOARD_SIZE + 2, font=("Courier", 13))
+        self.board.pack(fill="y", expand=True)
+
+        threading.Thread(target=self._network, daemon=True).start()
+        self.send("join", name=name)
+        self.root.after(self.POLL_MS, self.poll)
+        self.root.after(self.BOARD_MS, self.refresh_board)
+        self.root.mainloop()
+
+    # ---- worker thread ----
+    def _network(self):
+        client = None
+        while True:
+            item = self.requests.get()
+            if item is None:
+                break
+            op, fields = item
+            try:
+                if client is None:
+                    client = QuizClient(*self.address)
+                    if op != "join":
+                        client.request("join", name=self.name)
+                self.replies.put((op, client.request(op, **fields)))
+            except (OSError, ValueError) as e:
+                if client is not None:
+                    client.close()
+                    client = None   # reconnect (and rejoin) on the next request
+                self.replies.put((op, {"error": f"connection problem: {e}"}))
+        if client is not None:
+            client.close()
+
+    # ---- UI thread ----
+    def send(self, op, **fields):
+        if op != "leaderboard":
+            if self.waiting:
+                return
+            self.waiting = True
+        self.requests.put((op, fields))
+
+    def submit(self):
+        text = self.entry.get().strip()
+        if text and self.card is not None:
+            self.send("answer", text=text)
+
+    def refresh_board(self):
+        self.send("leaderboard")
+        self.root.after(self.BOARD_MS, self.refresh_board)
+
+    def poll(self):
+        try:
+            while True:
+                op, reply = self.replies.get_nowait()
+                self.show(op, reply)
+        except queue.Empty:
+            pass
+        self.root.after(self.POLL_MS, self.poll)
+
+    def show(self, op, reply):
+        if op != "leaderboard":
+            self.waiting = False
+        if "error" in reply:
+            self.status.config(text=reply["error"])
+            return
+        if op == "leaderboard":
+            self.board.delete(0, tk.END)
+            for i, (name, score, answered) in enumerate(reply["leaders"], 1):
+                self.board.insert(tk.END, f"{i:>2}. {name[:16]:<16} {score:>4}/{answered}")
+            return
+        if "score" in reply:
+            self.score_label.config(text=f"{self.name}: {reply['score']} points")
+        if op == "answer":
+            verdict = reply["verdict"]
+            self.status.config(text=("Correct!" if verdict == "exact" else
+                                     "Correct (watch the spelling)!" if verdict else "Wrong.")
+                               + f"  Answer: {reply['answer']}")
+        self.card = reply.get("card")
+        self.entry.delete(0, tk.END)
+        if self.card is None:
+            self.card_label.config(text="🏁 Finished! Watch the leaderboard.")
+        else:
+            self.card_label.config(text=self.card["q"])
+
+    def close(self):
+        self.requests.put(None)
+        self.root.destroy()
+
 # -------------------- Main App --------------------
 class FlashcardApp:
-    def __init__(self):
-        self.flashcards = safe_load_flashcards()
-        random.shuffle(self.flashcards)
+    def __init__(self, deck_path=None, spaced=False, reduced_motion=False, seed=None,
+                 profile_startup=False):
+        # Only the intro window is built before the first paint; the deck,
+        # audio and music load afterwards in STARTUP_PHASES, one step per
+        # event-loop turn, and Start stays disabled until they are in.
+        self.startup = StartupProfile()
+        self.startup.mark("python")     # module import and argument parsing
+        self.profile_startup = profile_startup
+        _load_tk()
+        self.startup.mark("tk")
+        self.workspace = Workspace()
+        self.spaced = spaced
+        self.seed = seed
+        self.deck_path = deck_path or default_deck_path()
+        self.session = self.checkpoint = self.saved_session = None
+        self.audio = self.music = None
+        self.pending = list(self.STARTUP_PHASES)
+        self.painted = False
+        self.reduced_motion = reduced_motion
+        self.input_locked = False
+        self.browser = None
 
-        self.score = 0
-        self.card_index = 0
+        self.show_intro()
+        self.close_audio()
+        self.workspace.close_all()
+
+    # -------------------- STARTUP --------------------
+    STARTUP_PHASES = ("deck", "audio")
 
+    def first_paint(self, event=None):
+        if self.painted:
+            return
+        self.painted = True
+        self.intro.unbind("<Expose>")
+        self.intro.update_idletasks()
+        self.startup.mark("window")
+        self.startup.milestone("first paint")
+        self.intro.after(1, self.load_next)
+
+    def load_next(self):
+        """Run the next startup phase, then give the event loop a turn."""
+        phase = self.pending.pop(0)
+        try:
+            getattr(self, "load_" + phase)()
+        except Exception as e:
+            report_error("StudyStack", f"Could not load the {phase}:\n{e}")
+        self.startup.mark(phase)
+        if self.pending:
+            self.intro.after(1, self.load_next)
+            return
+        if self.audio is None:      # the audio phase failed: carry on without sound
+            self.audio = AudioEngine(NullSink())
+            self.music = MusicThread(None)
+        self.update_start()
+        self.intro.update_idletasks()
+        self.startup.milestone("interactive")
+        if self.profile_startup:
+            self.startup.report(sys.stderr)
+            self.intro.destroy()
+        elif self.saved_session is not None:
+            self.offer_resume()
+
+    def load_deck(self):
+        if self.session is None:    # unless a deck was picked while loading
+            self.session, self.checkpoint, self.saved_session = self.workspace.open(
+                self.deck_path, self.spaced, self.seed)
+
+    def update_start(self):
+        if self.session is None:    # the deck failed to open; another can be picked
+            self.start_btn.config(text="Pick a deck", state="disabled")
+        else:
+            self.start_btn.config(text="Start Game", state="normal")
+
+    def load_audio(self):
         global EXTRA_MUSIC_PATH
         try:
             EXTRA_MUSIC_PATH
@@ -162,11 +4133,12 @@ class FlashcardApp:
         elif EXTRA_MUSIC_PATH and os.path.exists(EXTRA_MUSIC_PATH):
             music_file = EXTRA_MUSIC_PATH
 
-        self.music = MusicThread(music_file)
+        # Effects always go through the audio worker; it also takes over the
+        # background track when its sink can mix (no winsound needed).
+        self.audio = AudioEngine(music_file=music_file)
+        self.music = self.audio if self.audio.plays_music else MusicThread(music_file)
         self.music.start()
 
-        self.show_intro()
-
     # -------------------- START PROGRAM --------------------
     def start_program(self):
         self.intro.destroy()
@@ -196,11 +4168,15 @@ class FlashcardApp:
                           fg="#34495E", bg=GAME_LOBBY_BG)
         slogan.pack(pady=10)
 
-        start_btn = tk.Button(mid_frame, text="Start Game",
-                              font=("Helvetica", 26, "bold"),
-                              bg=CARD_FRAME_BG, fg="#2D455E",
-                              width=20, command=self.start_program)
-        start_btn.pack(pady=10)
+        self.deck_picker(mid_frame)
+
+        loading = bool(self.pending)
+        self.start_btn = tk.Button(mid_frame, text="Loading..." if loading else "Start Game",
+                                   font=("Helvetica", 26, "bold"),
+                                   bg=CARD_FRAME_BG, fg="#2D455E", width=20,
+                                   state="disabled" if loading else "normal",
+                                   command=self.start_program)
+        self.start_btn.pack(pady=10)
 
         instr_btn = tk.Button(mid_frame, text="Instructions",
                               font=("Helvetica", 22, "bold"),
@@ -220,8 +4196,55 @@ class FlashcardApp:
                              width=20, command=self.intro.destroy)
         exit_btn.pack(pady=10)
 
+        if loading:
+            self.intro.bind("<Expose>", self.first_paint)
+            self.intro.after(1000, self.first_paint)     # in case it starts iconified
+        elif self.saved_session is not None:
+            self.intro.after(100, self.offer_resume)
         self.intro.mainloop()
 
+    # -------------------- DECK PICKER --------------------
+    def deck_picker(self, parent):
+        from tkinter import ttk
+        paths = self.workspace.decks()
+        if self.deck_path not in paths:
+            paths.insert(0, self.deck_path)
+        names = [os.path.basename(p) for p in paths]
+        row = tk.Frame(parent, bg=GAME_LOBBY_BG)
+        row.pack(pady=10)
+        tk.Label(row, text="Deck:", font=("Helvetica", 18, "bold"),
+                 fg="#30475E", bg=GAME_LOBBY_BG).pack(side="left", padx=6)
+        picker = ttk.Combobox(row, values=names, state="readonly", width=30, font=("Helvetica", 16))
+        picker.current(paths.index(self.deck_path))
+        picker.pack(side="left")
+        picker.bind("<<ComboboxSelected>>", lambda e: self.select_deck(paths[picker.current()]))
+
+    def select_deck(self, path):
+        if path == self.deck_path and self.session is not None:
+            return
+        try:
+            opened = self.workspace.open(path, self.spaced)
+        except Exception as e:
+            report_error("StudyStack", f"Could not open {os.path.basename(path)}:\n{e}")
+            return
+        self.deck_path = path
+        self.session, self.checkpoint, self.saved_session = opened
+        if not self.pending:
+            self.update_start()
+        if self.saved_session is not None:
+            self.offer_resume()
+
+    # -------------------- RESUME --------------------
+    def offer_resume(self):
+        state, self.saved_session = self.saved_session, None
+        if state is None:
+            return      # another deck was picked before the offer came up
+        if messagebox.askyesno("Resume", f"Resume your last session?\n{len(state['answers'])} cards "
+                                         f"answered, score {state.get('score', 0)}."):
+            self.checkpoint.resume(self.session, state)
+        else:
+            self.checkpoint.start(self.session)
+
     # -------------------- INSTRUCTIONS --------------------
     def show_instructions(self):
         messagebox.showinfo(
@@ -256,20 +4279,38 @@ class FlashcardApp:
     # -------------------- BACK TO INTRO --------------------
     def back_to_intro(self):
         if messagebox.askyesno("Exit", "Are you sure you want to go back to the main menu?"):
+            self.checkpoint.close(self.session)
             self.root.destroy()
             self.show_intro()
 
+    def open_stats(self):
+        if self.stats_panel is not None and self.stats_panel.exists():
+            self.stats_panel.win.lift()
+        else:
+            self.stats_panel = StatsPanel(self)
+
+    def quit_app(self):
+        self.checkpoint.close(self.session)
+        self.close_audio()
+        self.root.destroy()
+
+    def close_audio(self):
+        if self.music is not None and self.music is not self.audio:
+            self.music.stop()
+        if self.audio is not None:
+            self.audio.close()
+        self.audio = self.music = None
+
     # -------------------- RESTART GAME --------------------
     def restart_game(self):
+        if self.input_locked:
+            return
         if messagebox.askyesno("Restart", "Restart the game and reset score?"):
-            self.score = 0
-            self.card_index = 0
-            for c in self.flashcards:
-                c["answered"] = False
-                c.pop("answered_correctly", None)
-            random.shuffle(self.flashcards)
-            self.score_label.config(text=f"Score: {self.score}")
-            self.display_card()
+            self.session.restart()
+            self.score_label.config(text=f"Score: {self.session.score}")
+            self.show_current()
+            self.status.config(text=f"New round, quiz order seed {self.session.deck.seed}")
+            self.deck_changed()
 
     # -------------------- MAIN WINDOW --------------------
     def main_window(self):
@@ -277,6 +4318,14 @@ class FlashcardApp:
         self.root.title("Flashcards")
         self.root.geometry("900x700")
         self.root.config(bg=GAME_LOBBY_BG)
+        self.root.protocol("WM_DELETE_WINDOW", self.quit_app)
+        self.root.bind("<Control-S>", lambda e: self.open_stats())     # Ctrl+Shift+S
+        self.animator = Animator(self.root)
+        self.lag_monitor = LagMonitor(self.root)
+        self.lag_monitor.start()
+        self.input_locked = False
+        self.browser = None
+        self.stats_panel = None
 
         exit_btn = tk.Button(self.root, text="⏴ Back to Menu",
                              font=("Helvetica", 12, "bold"),
@@ -288,7 +4337,7 @@ class FlashcardApp:
                                 bg="#3498DB", fg="white", command=self.restart_game)
         restart_btn.place(x=1430, y=10)
 
-        if WINSOUND_AVAILABLE and self.music.file and os.path.exists(self.music.file):
+        if self.music.available():
             mute_text = "🔊 Mute" if not self.music.muted else "🔈 Unmute"
             self.mute_btn = tk.Button(self.root, text=mute_text, font=("Helvetica", 12, "bold"),
                                       bg="#95A5A6", fg="white",
@@ -298,18 +4347,38 @@ class FlashcardApp:
                                       bg="#95A5A6", fg="white", state=tk.DISABLED)
         self.mute_btn.place(x=1320, y=10)
 
+        self.spaced_btn = tk.Button(self.root, font=("Helvetica", 12, "bold"),
+                                    bg="#8E44AD", fg="white", command=self.toggle_spaced)
+        self.spaced_btn.place(x=1170, y=10)
+        self.update_spaced_button()
+
         top = tk.Frame(self.root, bg=GAME_LOBBY_BG)
         top.pack(pady=20)
 
-        self.score_label = tk.Label(top, text=f"Score: {self.score}",
+        self.score_label = tk.Label(top, text=f"Score: {self.session.score}",
                                     font=SCORE_FONT_STYLE, fg=TEXT_COLOR, bg=GAME_LOBBY_BG)
         self.score_label.pack(side="left", padx=10)
 
+        tk.Label(top, text="🔍", font=SCORE_FONT_STYLE, bg=GAME_LOBBY_BG).pack(side="left", padx=(30, 2))
+        self.search_entry = tk.Entry(top, width=32, font=("Helvetica", 14))
+        self.search_entry.pack(side="left")
+        self.search_entry.bind("<KeyRelease>", self.on_search_key)
+        self.search_entry.bind("<Return>", lambda e: self.open_search_result(0))
+        self.search_entry.bind("<Down>", lambda e: self.focus_search_results())
+        self.search_entry.bind("<Escape>", lambda e: self.hide_search_results())
+        self.search_list = tk.Listbox(self.root, height=8, width=70, font=("Helvetica", 12))
+        self.search_list.bind("<Return>", lambda e: self.open_search_result())
+        self.search_list.bind("<Double-Button-1>", lambda e: self.open_search_result())
+        self.search_list.bind("<Escape>", lambda e: self.hide_search_results())
+        self.search_results = []
+        self.search_job = None
+
         self.card_index_label = tk.Label(self.root, text="", font=("Helvetica", 18, "bold"),
                                          bg=GAME_LOBBY_BG, fg=TEXT_COLOR)
         self.card_index_label.pack(pady=5)
 
-        self.card_frame = tk.Frame(self.root, width=819, height=293, bg=CARD_FRAME_BG,
+        self.card_width = 819
+        self.card_frame = tk.Frame(self.root, width=self.card_width, height=293, bg=CARD_FRAME_BG,
                                    bd=3, relief="raised")
         self.card_frame.pack(pady=10)
         self.card_frame.pack_propagate(False)
@@ -358,45 +4427,164 @@ class FlashcardApp:
         self.status = tk.Label(self.root, text="", fg=TEXT_COLOR, bg=STATUS_BG, font=SCORE_FONT_STYLE)
         self.status.pack()
 
-        self.display_card(initial=True)
+        menubar = tk.Menu(self.root)
+        deck_menu = tk.Menu(menubar, tearoff=0)
+        deck_menu.add_command(label="Browse Cards...", command=self.open_browser)
+        deck_menu.add_command(label="Import Cards...", command=self.import_cards_dialog)
+        deck_menu.add_command(label="Remove Duplicates", command=self.remove_duplicates)
+        menubar.add_cascade(label="Deck", menu=deck_menu)
+        self.root.config(menu=menubar)
+
+        if self.session.scheduler is not None:
+            self.next_card()
+        else:
+            self.display_card(initial=True)
+        self.poll_deck_loading()
+        self.poll_search_index()
         self.root.mainloop()
 
+    # -------------------- BACKGROUND DECK LOADING --------------------
+    def poll_deck_loading(self):
+        if not self.session.deck.loading:
+            return
+        before = len(self.session.deck)
+        done = self.session.deck.drain(self.session.card_index)
+        if len(self.session.deck) != before:
+            self.card_index_label.config(text=f"Card {self.session.card_index + 1} / {len(self.session.deck)}")
+            self.update_nav_buttons()
+        if done:
+            if self.checkpoint.loaded(self.session):
+                self.show_current()
+            self.status.config(text=f"Deck loaded: {len(self.session.deck)} cards, "
+                                    f"quiz order seed {self.session.deck.seed}")
+        else:
+            self.status.config(text=f"Loading deck... {len(self.session.deck)} cards")
+            self.root.after(50, self.poll_deck_loading)
+
+    # -------------------- SEARCH --------------------
+    SEARCH_LIMIT = 50
+
+    def poll_search_index(self):
+        # Small steps keep each tick well under a frame while the index builds.
+        if not self.session.deck.build_search(1000):
+            self.root.after(20, self.poll_search_index)
+        elif self.search_entry.get().strip():
+            self.run_search()
+
+    def on_search_key(self, event):
+        if event.keysym in ("Return", "Down", "Escape"):
+            return
+        if self.search_job is None:
+            self.search_job = self.root.after_idle(self.run_search)
+
+    def run_search(self):
+        self.search_job = None
+        query = self.search_entry.get().strip()
+        if not query:
+            self.hide_search_results()
+            return
+        self.search_results = self.session.search(query, self.SEARCH_LIMIT)
+        self.search_list.delete(0, tk.END)
+        for card in self.search_results:
+            line = f"{card['q']}  —  {card['a']}".replace("\n", " ")
+            self.search_list.insert(tk.END, line if len(line) <= 100 else line[:99] + "…")
+        if not self.search_results:
+            self.search_list.insert(tk.END, "No matching cards")
+        if not self.session.deck.build_search(0):
+            self.search_list.insert(tk.END, "Still indexing the deck, more results may follow...")
+        elif len(self.search_results) == self.SEARCH_LIMIT:
+            self.search_list.insert(tk.END, f"Showing the first {self.SEARCH_LIMIT} matches")
+        self.search_list.place(in_=self.search_entry, relx=0, rely=1, y=2)
+        self.search_list.lift()
+
+    def focus_search_results(self):
+        if self.search_results:
+            self.search_list.focus_set()
+            self.search_list.selection_clear(0, tk.END)
+            self.search_list.selection_set(0)
+            self.search_list.activate(0)
+
+    def hide_search_results(self):
+        self.search_list.place_forget()
+
+    def open_search_result(self, row=None):
+        if row is None:
+            picked = self.search_list.curselection()
+            row = picked[0] if picked else 0
+        if row >= len(self.search_results) or self.input_locked:
+            return
+        if self.session.jump(self.search_results[row]) is None:
+            self.status.config(text="That card has been deleted.")
+            self.run_search()
+            return
+        self.hide_search_results()
+        self.search_entry.delete(0, tk.END)
+        self.display_card()
+
     # -------------------- MUTE BUTTON CALLBACK --------------------
     def toggle_mute(self):
         self.music.toggle_mute()
-        if not WINSOUND_AVAILABLE or not self.music.file:
+        if not self.music.available():
             return
         if self.music.muted or not self.music.running:
             self.mute_btn.config(text="🔈 Unmute")
         else:
             self.mute_btn.config(text="🔊 Mute")
 
+    # -------------------- SPACED REPETITION --------------------
+    def update_spaced_button(self):
+        self.spaced_btn.config(text="🧠 Spaced: On" if self.session.scheduler is not None else "🧠 Spaced: Off")
+
+    def toggle_spaced(self):
+        if self.input_locked:
+            return
+        self.session.set_spaced(self.session.scheduler is None)
+        self.update_spaced_button()
+        self.show_current()
+
+    def show_current(self):
+        if self.session.caught_up:
+            self.show_caught_up()
+        else:
+            self.display_card()
+
+    def show_caught_up(self):
+        due = self.session.scheduler.next_due()
+        when = f"in {max(1, int((due - time.time()) // 60))} min" if due else "when you add new cards"
+        self.card_frame.config(bg=CARD_FRAME_BG)
+        self.card_label.config(bg=CARD_LABEL_BG, fg=TEXT_COLOR,
+                               text=f"✅ All caught up!\n\nNext review {when}.")
+        self.answer_entry.delete(0, tk.END)
+        self.card_index_label.config(text="Nothing due")
+        self.update_nav_buttons()
+
     # -------------------- DISPLAY CARD --------------------
+    @STATS.timed("ui.display_card")
     def display_card(self, initial=False):
-        if not self.flashcards:
+        if not self.session.deck:
             self.card_label.config(text="No flashcards available.")
             self.card_index_label.config(text="")
             self.update_nav_buttons()
             return
 
-        if all(c["answered"] for c in self.flashcards):
-            correct_count = sum(c.get("answered_correctly", False) for c in self.flashcards)
+        if self.session.finished():
+            correct_count = self.session.deck.correct_count()
             self.card_frame.config(bg=CARD_FRAME_BG)
             self.card_label.config(
                 bg=CARD_LABEL_BG,
                 fg=TEXT_COLOR,
-                text=f"🏁 Finished!\n\nYou answered {correct_count} correct out of {len(self.flashcards)}."
+                text=f"🏁 Finished!\n\nYou answered {correct_count} correct out of {len(self.session.deck)}."
             )
             self.answer_entry.delete(0, tk.END)
             self.card_index_label.config(text="All cards answered")
             self.update_nav_buttons()
             return
 
-        q = self.flashcards[self.card_index]["q"]
+        q = self.session.deck[self.session.card_index]["q"]
 
         self.card_frame.config(bg=CARD_FRAME_BG)
         self.card_label.config(bg=CARD_LABEL_BG, text=q, fg=TEXT_COLOR)
-        self.card_index_label.config(text=f"Card {self.card_index + 1} / {len(self.flashcards)}")
+        self.card_index_label.config(text=f"Card {self.session.card_index + 1} / {len(self.session.deck)}")
         self.answer_entry.delete(0, tk.END)
         self.status.config(text="")
 
@@ -406,114 +4594,113 @@ class FlashcardApp:
     # -------------------- NAVIGATION BUTTON STATE --------------------
     def update_nav_buttons(self):
         """Enable or disable next/prev buttons based on current card index."""
-        if not self.flashcards or len(self.flashcards) == 0:
+        if not self.session.deck or len(self.session.deck) == 0:
             self.next_btn.config(state="disabled")
             self.prev_btn.config(state="disabled")
             return
 
+        # Spaced mode always serves whatever is due next
+        if self.session.scheduler is not None:
+            self.prev_btn.config(state="disabled")
+            self.next_btn.config(state="normal")
+            return
+
         # Disable Prev if at first card
-        if self.card_index == 0:
+        if self.session.card_index == 0:
             self.prev_btn.config(state="disabled")
         else:
             self.prev_btn.config(state="normal")
 
         # Disable Next if at last card
-        if self.card_index >= len(self.flashcards) - 1:
+        if self.session.card_index >= len(self.session.deck) - 1:
             self.next_btn.config(state="disabled")
         else:
             self.next_btn.config(state="normal")
 
     # -------------------- NAVIGATION --------------------
     def next_card(self):
-        if not self.flashcards:
+        if not self.session.deck or self.input_locked:
             return
-        start_index = self.card_index
-        while True:
-            if self.card_index < len(self.flashcards) - 1:
-                self.card_index += 1
-            else:
-                messagebox.showinfo("Info", "No more unanswered cards ahead.")
-                self.card_index = start_index
-                return
-            if not self.flashcards[self.card_index]["answered"]:
-                break
-        self.display_card()
+        if self.session.next() is None and self.session.scheduler is None:
+            messagebox.showinfo("Info", "No more unanswered cards ahead.")
+            return
+        self.show_current()
 
     def prev_card(self):
-        if not self.flashcards:
+        if not self.session.deck or self.input_locked:
+            return
+        if self.session.prev() is None:
+            messagebox.showinfo("Info", "No more unanswered cards behind.")
             return
-        start_index = self.card_index
-        while True:
-            if self.card_index > 0:
-                self.card_index -= 1
-            else:
-                messagebox.showinfo("Info", "No more unanswered cards behind.")
-                self.card_index = start_index
-                return
-            if not self.flashcards[self.card_index]["answered"]:
-                break
         self.display_card()
 
     # -------------------- FLIP ANIMATION --------------------
-    def flip_card_horizontal(self, callback, steps=15, delay=30):
-        original_width = self.card_frame.winfo_width()
-
-        def shrink(step=0):
-            if step <= steps:
-                factor = 1 - (step / steps)
-                self.card_frame.config(width=int(max(1, original_width * factor)))
-                self.root.after(delay, shrink, step + 1)
-            else:
-                callback()
-                expand()
-
-        def expand(step=0):
-            if step <= steps:
-                factor = step / steps
-                self.card_frame.config(width=int(max(1, original_width * factor)))
-                self.root.after(delay, expand, step + 1)
-            else:
-                self.card_frame.config(width=original_width)
+    def flip_card_horizontal(self, callback, duration=0.9):
+        """Fold the card shut, call callback, unfold it; callback runs exactly once."""
+        self.animator.cancel(self.card_frame)
+        if self.reduced_motion:
+            self.card_frame.config(width=self.card_width)
+            callback()
+            return
 
-        shrink()
+        def resize(factor):
+            self.card_frame.config(width=int(max(1, self.card_width * factor)))
+
+        def halfway():
+            callback()
+            self.animator.run(self.card_frame, duration / 2, resize)
+
+        self.animator.run(self.card_frame, duration / 2, lambda t: resize(1 - t), halfway)
 
     # -------------------- CHECK ANSWER --------------------
+    @STATS.timed("ui.submit_answer")
     def submit_answer(self):
+        if self.input_locked:
+            return
         user = self.answer_entry.get().strip()
         if not user:
             messagebox.showerror("Error", "Please enter an answer before submitting.")
             return
 
-        card = self.flashcards[self.card_index]
-        correct = card["a"]
-
-        def norm(s): return "".join(s.lower().split())
+        index = self.session.card_index
+        correct = self.session.deck[index]["a"]
+        verdict = self.session.check(user, index)
+        # Hold off further input until the next card is up, so a double
+        # click can't grade the same card twice.
+        self.input_locked = True
+        started = time.perf_counter()
 
         def reveal_result():
-            if norm(user) == norm(correct):
-                play_correct_sound()
-                self.score += 1
-                card["answered_correctly"] = True
-                self.score_label.config(text=f"Score: {self.score}")
+            STATS.observe("ui.answer_reveal", time.perf_counter() - started)    # includes the flip
+            STATS.count("answers.correct" if verdict else "answers.wrong")
+            if verdict:
+                self.audio.play("correct")
+                self.session.record(index, verdict)
+                self.score_label.config(text=f"Score: {self.session.score}")
                 self.card_frame.config(bg="#2ecc71")
                 self.card_label.config(bg="#2ecc71", fg="white",
-                                        text=f"Correct!\nAnswer: {correct}")
+                                        text=f"Correct!\nAnswer: {correct}" if verdict == "exact"
+                                        else f"Correct (watch the spelling)!\nAnswer: {correct}")
             else:
-                play_wrong_sound()
-                card["answered_correctly"] = False
+                self.audio.play("wrong")
+                self.session.record(index, verdict)
                 self.card_frame.config(bg="#e74c3c")
                 self.card_label.config(bg="#e74c3c", fg="white",
                                         text=f"The correct\nAnswer is: {correct}")
 
-            card["answered"] = True
-
-            if all(c["answered"] for c in self.flashcards):
-                self.root.after(1500, self.display_card)
+            if self.browser is not None and self.browser.exists():
+                self.browser.redraw()    # status column
+            if self.session.finished():
+                self.root.after(1500, self.unlock_then, self.display_card)
             else:
-                self.root.after(3000, self.next_card)
+                self.root.after(3000, self.unlock_then, self.next_card)
 
         self.flip_card_horizontal(reveal_result)
 
+    def unlock_then(self, action):
+        self.input_locked = False
+        action()
+
     # -------------------- ADD / DELETE --------------------
     def add_card_window(self):
         win = tk.Toplevel(self.root)
@@ -534,28 +4721,214 @@ class FlashcardApp:
             if not q or not a:
                 messagebox.showerror("Error", "Both fields required.")
                 return
-            self.flashcards.append({"q": q, "a": a, "answered": False})
-            safe_save_flashcards(self.flashcards)
+            if self.session.is_duplicate(q, a) and not messagebox.askyesno(
+                    "Duplicate", "The deck already has a card with this question.\n\nAdd it anyway?",
+                    parent=win):
+                return
+            self.session.add(q, a)
             messagebox.showinfo("Saved", "Flashcard added!")
             win.destroy()
-            self.card_index = len(self.flashcards) - 1
             self.display_card()
+            self.deck_changed()
 
         tk.Button(win, text="Save", bg=SUBMIT_COLOR, fg="white",
                   font=("Helvetica", 12, "bold"), command=save).pack(pady=10)
 
+    # -------------------- BULK IMPORT --------------------
+    def import_cards_dialog(self):
+        from tkinter import filedialog
+        if self.session.deck.loading:
+            messagebox.showinfo("Import", "The deck is still loading, try again in a moment.")
+            return
+        path = filedialog.askopenfilename(
+            parent=self.root, title="Import flashcards",
+            filetypes=[("Card files", "*.csv *.tsv *.jsonl"), ("All files", "*.*")])
+        if not path:
+            return
+        # Parsing and normalizing run off the UI thread; batches are committed
+        # here so the deck is only ever touched from the Tk thread. The queue
+        # is bounded like the pool itself, so a slow commit holds the reader
+        # back instead of piling parsed batches up in memory.
+        # The pool starts from a worker thread while Tk, audio and loader
+        # threads run; a forked child could inherit a lock one of them held,
+        # so the workers are spawned instead.
+        import multiprocessing
+        importer = DeckImporter(self.session.deck, path)
+        workers = os.cpu_count() or 1
+        results = queue.Queue(maxsize=workers * 2)
+        spawn = multiprocessing.get_context("spawn")
+
+        def work():
+            try:
+                for batch in iter_import_batches(path, workers=workers, mp_context=spawn):
+                    results.put(batch)
+                results.put(None)
+            except Exception as e:
+                results.put(e)
+
+        threading.Thread(target=work, daemon=True).start()
+        self.poll_import(importer, results)
+
+    IMPORT_BATCHES_PER_TICK = 2     # each is a journal append plus index updates
+
+    def poll_import(self, importer, results):
+        report = importer.report
+        for _ in range(self.IMPORT_BATCHES_PER_TICK):
+            try:
+                item = results.get_nowait()
+            except queue.Empty:
+                break
+            if item is None or isinstance(item, Exception):
+                self.status.config(text=f"Import finished: {report.summary()}")
+                self.card_index_label.config(
+                    text=f"Card {self.session.card_index + 1} / {len(self.session.deck)}")
+                self.update_nav_buttons()
+                self.deck_changed()
+                details = "".join(f"\nline {line}: {reason}" for line, reason, _ in report.rejects[:10])
+                if isinstance(item, Exception):
+                    messagebox.showerror("Import", f"Import stopped: {item}\n\n{report.summary()}")
+                else:
+                    messagebox.showinfo("Import", report.summary() + details)
+                return
+            importer.commit(item)
+        self.status.config(text=f"Importing... {report.summary()}")
+        self.root.after(1 if results.qsize() else 50, self.poll_import, importer, results)
+
+    def remove_duplicates(self):
+        if self.input_locked:
+            return
+        if self.session.deck.loading:
+            messagebox.showinfo("Remove Duplicates", "The deck is still loading, try again in a moment.")
+            return
+        if not messagebox.askyesno("Remove Duplicates",
+                                   "Delete every card that repeats an earlier card's question?"):
+            return
+        removed = self.session.dedupe()
+        messagebox.showinfo("Remove Duplicates", f"Removed {removed} duplicate card(s).")
+        self.show_current()
+        self.deck_changed()
+
     def delete_card(self):
-        if not self.flashcards:
+        if not self.session.deck or self.input_locked:
             return
-        card = self.flashcards[self.card_index]
+        card = self.session.deck[self.session.card_index]
         if messagebox.askyesno("Delete", f"Delete this card?\n\n{card['q']}\n{card['a']}"):
-            del self.flashcards[self.card_index]
-            safe_save_flashcards(self.flashcards)
-            if self.card_index >= len(self.flashcards):
-                self.card_index = max(0, len(self.flashcards) - 1)
+            self.session.delete()
             self.display_card()
+            self.deck_changed()
+
+    # -------------------- DECK BROWSER --------------------
+    def open_browser(self):
+        if self.browser is not None and self.browser.exists():
+            self.browser.win.lift()
+            return
+        self.browser = DeckBrowser(self)
+
+    def deck_changed(self):
+        if self.browser is not None and self.browser.exists():
+            self.browser.refresh()
 
 
 # -------------------- RUN --------------------
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="StudyStack flashcards")
+    parser.add_argument("--deck", help="deck file to open (.json, or .db/.sqlite for the SQLite backend)")
+    parser.add_argument("--spaced", action="store_true", help="start in spaced-repetition mode")
+    parser.add_argument("--reduced-motion", action="store_true", help="show answers without the flip animation")
+    parser.add_argument("--seed", type=int, help="quiz order seed; the same seed gives the same order")
+    parser.add_argument("--stats", action="store_true",
+                        help="record timings from launch (Ctrl+Shift+S shows them)")
+    parser.add_argument("--stats-out", metavar="FILE",
+                        help="write recorded timings here on exit (.csv or .json); implies --stats")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="time each startup phase to first paint and to interactive, print them and exit")
+    parser.add_argument("--import", dest="import_file", metavar="FILE",
+                        help="import cards from a CSV, TSV or JSONL file into the deck and exit")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="import file format (default: from extension)")
+    parser.add_argument("--grade", metavar="SHEETS",
+                        help="grade a JSONL file of answer sheets against the deck and exit; each line is "
+                             '{"student": ..., "answers": {card id: answer}}')
+    parser.add_argument("--scores", metavar="FILE", help="per-student scores CSV for --grade (default: stdout)")
+    parser.add_argument("--difficulty", metavar="FILE", help="per-card difficulty CSV for --grade")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help=f"run a classroom quiz server for the deck (default port {QUIZ_PORT}; 0 picks one)")
+    parser.add_argument("--join", metavar="[HOST:]PORT", help="play on a classroom quiz server")
+    parser.add_argument("--name", help="your name on the leaderboard for --join")
+    parser.add_argument("--workers", type=int, help="worker processes for --import/--grade (default: CPU count)")
+    parser.add_argument("--rejects", metavar="FILE", help="write rejected import rows or answer sheets to this CSV file")
+    args = parser.parse_args(argv)
+    STATS.enable(args.stats or bool(args.stats_out))
+    try:
+        return _run(args)
+    finally:
+        if args.stats_out:
+            STATS.export(args.stats_out)
+
+
+def _print_rejects(report, path, out=None):
+    for line, reason, _ in report.rejects[:20]:
+        print(f"  line {line}: {reason}", file=out)
+    if report.rejected > 20:
+        print(f"  ... {report.rejected - 20} more", file=out)
+    if path:
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["line", "reason", "row"])
+            writer.writerows(report.rejects)
+
+
+def _run(args):
+    if args.import_file:
+        deck = open_deck(args.deck)
+        try:
+            report = import_cards(deck, args.import_file, args.format, args.workers)
+        finally:
+            deck.close()
+        print(report.summary())
+        _print_rejects(report, args.rejects)
+        return 0
+
+    if args.grade:
+        deck = open_deck(args.deck)
+        out = open(args.scores, "w", encoding="utf-8", newline="") if args.scores else sys.stdout
+        try:
+            report = grade_answer_sheets(deck, args.grade, out, args.workers)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+            deck.close()
+        if args.difficulty:
+            with open(args.difficulty, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(report.DIFFICULTY_FIELDS)
+                writer.writerows(report.difficulty())
+        print(report.summary(), file=sys.stderr)
+        _print_rejects(report, args.rejects, sys.stderr)
+        return 0
+
+    if args.serve:
+        import asyncio
+        deck = open_deck(args.deck, args.seed)
+        try:
+            asyncio.run(QuizServer(deck).serve(*parse_address(args.serve, "0.0.0.0")))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            deck.close()
+        return 0
+
+    if args.join:
+        name = args.name or os.environ.get("USER") or os.environ.get("USERNAME") or "student"
+        QuizClientApp(*parse_address(args.join), name)
+        return 0
+
+    FlashcardApp(args.deck, spaced=args.spaced, reduced_motion=args.reduced_motion, seed=args.seed,
+                 profile_startup=args.profile_startup)
+    return 0
+
+
 if __name__ == "__main__":
-    FlashcardApp()
+    import multiprocessing
+    multiprocessing.freeze_support()    # worker processes in the PyInstaller build
+    sys.exit(main())
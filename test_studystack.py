@@ -0,0 +1,1039 @@
+"""Tests for the StudyStack logic that runs without a display.
+
+    python -m pytest -q test_studystack.py
+"""
+import csv
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+import wave
+
+import pytest
+
+import studystack
+
+
+# -------------------- Deck Journal --------------------
+def replay(snapshot, records):
+    """Apply journal records one at a time: a delete drops the leftmost copy."""
+    deck = list(snapshot)
+    for rec in records:
+        pair = (rec["q"], rec["a"])
+        if rec["op"] == "add":
+            deck.append(pair)
+        elif pair in deck:
+            deck.remove(pair)
+    return deck
+
+def write_journal(tmp_path, snapshot, records, seq=0):
+    paths = str(tmp_path / "deck.json"), str(tmp_path / "deck.journal")
+    with open(paths[0], "w", encoding="utf-8") as f:
+        json.dump([{"seq": seq}] + [list(p) for p in snapshot], f)
+    with open(paths[1], "w", encoding="utf-8") as f:
+        for n, rec in enumerate(records, seq + 1):
+            f.write(json.dumps({"n": n, **rec}) + "\n")
+    return studystack.DeckJournal(*paths)
+
+def test_journal_replays_records(tmp_path):
+    snapshot = [("a", "1"), ("b", "2"), ("a", "1"), ("c", "3")]
+    records = [{"op": "add", "q": "d", "a": "4"},
+               {"op": "del", "q": "a", "a": "1"},
+               {"op": "add", "q": "a", "a": "1"},
+               {"op": "del", "q": "d", "a": "4"},
+               {"op": "del", "q": "b", "a": "2"}]
+    journal = write_journal(tmp_path, snapshot, records)
+    assert journal.load() == replay(snapshot, records) == [("a", "1"), ("c", "3"), ("a", "1")]
+    assert journal.seq == len(records)
+
+@pytest.mark.parametrize("seed", range(30))
+def test_journal_matches_sequential_replay(tmp_path, seed):
+    rng = random.Random(seed)
+    pool = [(f"q{i}", f"a{i}") for i in range(5)]
+    snapshot = [rng.choice(pool) for _ in range(rng.randrange(10))]
+    records = [{"op": rng.choice(["add", "del"]), "q": q, "a": a}
+               for q, a in (rng.choice(pool) for _ in range(rng.randrange(15)))]
+    assert sorted(write_journal(tmp_path, snapshot, records).load()) == sorted(replay(snapshot, records))
+
+def test_journal_skips_folded_and_torn_records(tmp_path):
+    journal = write_journal(tmp_path, [("a", "1")], [], seq=5)
+    with open(journal.journal, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"n": 5, "op": "del", "q": "a", "a": "1"}) + "\n")   # already folded
+        f.write(json.dumps({"n": 6, "op": "add", "q": "b", "a": "2"}) + "\n")
+        f.write('{"n": 7, "op": "add", "q": "c"')                                  # torn by a crash
+    assert journal.load() == [("a", "1"), ("b", "2")]
+
+def test_journal_records_survive_reload(tmp_path):
+    journal = write_journal(tmp_path, [("q1", "a1"), ("q2", "a2")], [])
+    cards = [{"q": q, "a": a} for q, a in journal.load()]
+    added = {"q": "q3", "a": "a3"}
+    cards.append(added)
+    journal.record_add(cards, added)
+    removed = cards.pop(0)
+    journal.record_delete(cards, removed)
+    assert studystack.DeckJournal(journal.snapshot, journal.journal).load() == [("q2", "a2"), ("q3", "a3")]
+    journal.write_snapshot(cards)
+    assert not os.path.exists(journal.journal)
+    assert studystack.DeckJournal(journal.snapshot, journal.journal).load() == [("q2", "a2"), ("q3", "a3")]
+
+def test_journal_replays_batched_adds(tmp_path):
+    journal = write_journal(tmp_path, [("q1", "a1")], [])
+    cards = [{"q": q, "a": a} for q, a in journal.load()]
+    added = [{"q": "q2", "a": "a2"}, {"q": "q1", "a": "a1"}]
+    journal.record_add_many(cards + added, added)
+    journal.record_delete(cards + added, cards[0])
+    assert studystack.DeckJournal(journal.snapshot, journal.journal).load() == [("q2", "a2"), ("q1", "a1")]
+
+def test_journal_replays_batched_deletes(tmp_path):
+    journal = write_journal(tmp_path, [("q1", "a1"), ("q2", "a2"), ("q1", "a1")], [])
+    cards = [{"q": q, "a": a} for q, a in journal.load()]
+    added = [{"q": "q3", "a": "a3"}, {"q": "q4", "a": "a4"}]
+    journal.record_add_many(cards + added, added)
+    journal.record_delete_many(cards, [cards[0], added[0], cards[1]])
+    assert studystack.DeckJournal(journal.snapshot, journal.journal).load() == [("q1", "a1"), ("q4", "a4")]
+
+# -------------------- Unanswered Index --------------------
+def make_index(flags):
+    index = studystack.UnansweredIndex(len(flags))
+    for i, flag in enumerate(flags):
+        index.set(i, flag)
+    return index
+
+def brute_nearest(flags, index, step):
+    if step > 0:
+        return next((i for i in range(index + 1, len(flags)) if flags[i]), None)
+    return next((i for i in reversed(range(min(max(index, 0), len(flags)))) if flags[i]), None)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_nearest_matches_brute_force(seed):
+    rng = random.Random(seed)
+    flags = [1] * rng.randrange(0, 60)
+    index = make_index(flags)
+    for _ in range(300):
+        op = rng.random()
+        if op < 0.6 and flags:
+            i = rng.randrange(len(flags))
+            flags[i] = int(rng.random() < 0.3)
+            index.set(i, flags[i])
+        elif op < 0.75:
+            flags.append(int(rng.random() < 0.5))
+            index.append(flags[-1])
+        elif op < 0.8 and flags:
+            flags.pop()
+            index.pop()
+        assert index.total == sum(flags)
+        for i in range(-1, len(flags) + 1):
+            assert index.nearest(i, 1) == brute_nearest(flags, i, 1)
+            assert index.nearest(i, -1) == brute_nearest(flags, i, -1)
+
+class CountingTree(dict):
+    """Fenwick node storage that counts every node it is asked for."""
+    reads = 0
+
+    def get(self, key, default=None):
+        self.reads += 1
+        return dict.get(self, key, default)
+
+def navigation_steps(size, answered):
+    """Tree nodes read to step over `answered` cards in each direction."""
+    index = studystack.UnansweredIndex(size)
+    for i in range(1, answered + 1):
+        index.set(i, 0)
+    index.tree = CountingTree(index.tree)
+    assert index.nearest(0, 1) == answered + 1
+    assert index.nearest(answered + 1, -1) == 0
+    return index.tree.reads
+
+def test_navigation_cost_stays_flat():
+    small = navigation_steps(10, 8)
+    large = navigation_steps(1_000_000, 50_000)
+    # Both are O(log n): a million cards cost a few bits more per walk,
+    # not the 50,000 answered cards a linear scan would step over.
+    assert large <= 4 * (1_000_000).bit_length()
+    assert large <= 6 * small
+
+# -------------------- SQLite Deck --------------------
+def write_deck(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([[f"question {i}", f"answer {i}"] for i in range(count)], f)
+
+def pairs_of(deck):
+    return [(deck[i]["q"], deck[i]["a"]) for i in range(len(deck))]
+
+def open_backend(tmp_path, backend, count):
+    source = str(tmp_path / "source.json")
+    write_deck(source, count)
+    if backend.endswith(".json"):
+        deck = studystack.JsonDeck(source)
+    else:
+        deck = studystack.SqliteDeck(str(tmp_path / backend), seed_from=source)
+    deck.wait()
+    return deck
+
+class SmallPages(studystack.SqliteDeck):
+    PAGE_SIZE = 8
+    MAX_PAGES = 3
+
+def test_sqlite_deck_seeds_new_file_from_json(tmp_path):
+    source = str(tmp_path / "deck.json")
+    write_deck(source, 50)
+    deck = studystack.SqliteDeck(str(tmp_path / "deck.db"), seed_from=source)
+    assert sorted(pairs_of(deck)) == sorted((f"question {i}", f"answer {i}") for i in range(50))
+    deck.close()
+
+def test_sqlite_deck_pages_match_storage(tmp_path):
+    source = str(tmp_path / "deck.json")
+    write_deck(source, 200)
+    whole = studystack.SqliteDeck(str(tmp_path / "deck.db"), seed_from=source)
+    expected = pairs_of(whole)
+    whole.close()
+    deck = SmallPages(str(tmp_path / "deck.db"), seed_from=source)
+    rng = random.Random(1)
+    for _ in range(300):
+        i = rng.randrange(len(deck))
+        assert (deck[i]["q"], deck[i]["a"]) == expected[i]
+        assert len(deck.pages) <= SmallPages.MAX_PAGES
+    with pytest.raises(IndexError):
+        deck[len(deck)]
+    deck.close()
+
+def test_sqlite_deck_keeps_edits_and_progress(tmp_path):
+    source, path = str(tmp_path / "deck.json"), str(tmp_path / "deck.db")
+    write_deck(source, 20)
+    deck = studystack.SqliteDeck(path, seed_from=source)
+    deck.add("new question", "new answer")
+    gone = deck.delete(3)
+    deck.mark_answered(0, True)
+    deck.mark_answered(5, False)
+    expected = pairs_of(deck)
+    assert deck.next_unanswered(0) == 1
+    assert deck.next_unanswered(6, -1) == 4
+    deck.close()
+
+    deck = studystack.SqliteDeck(path, seed_from=source)
+    assert pairs_of(deck) == expected
+    assert (gone["q"], gone["a"]) not in expected
+    assert deck.correct_count() == 1
+    assert [deck[i]["answered"] for i in (0, 1, 5)] == [True, False, True]
+    assert not deck.all_answered()
+    deck.close()
+
+def test_open_deck_picks_backend_by_extension(tmp_path):
+    write_deck(str(tmp_path / "deck.json"), 5)
+    assert isinstance(studystack.open_deck(str(tmp_path / "deck.json")), studystack.JsonDeck)
+    deck = studystack.open_deck(str(tmp_path / "deck.db"))
+    assert isinstance(deck, studystack.SqliteDeck)
+    deck.close()
+
+def test_only_the_default_db_migrates_from_flashcards_json(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_deck(studystack.FLASH_JSON, 5)
+    os.mkdir("decks")
+    deck = studystack.open_deck(os.path.join("decks", "chem.db"))
+    assert sorted(pairs_of(deck)) == sorted(studystack.FALLBACK_FLASHCARDS)
+    while len(deck):
+        deck.delete(0)
+    deck.close()
+    deck = studystack.open_deck(os.path.join("decks", "chem.db"))
+    assert len(deck) == 0           # deleted cards don't come back
+    deck.close()
+    deck = studystack.open_deck(studystack.FLASH_DB)
+    assert sorted(pairs_of(deck)) == sorted((f"question {i}", f"answer {i}") for i in range(5))
+    deck.close()
+
+# -------------------- Streaming JSON Deck --------------------
+def test_json_deck_streams_without_moving_seen_cards(tmp_path):
+    path = str(tmp_path / "deck.json")
+    write_deck(path, 5000)
+    deck = studystack.JsonDeck(path)
+    assert deck.loading and len(deck) == studystack.JsonDeck.FIRST_BATCH
+    seen = pairs_of(deck)[:11]
+    while not deck.drain(frontier=10, limit=1000):
+        pass
+    assert pairs_of(deck)[:11] == seen
+    assert sorted(pairs_of(deck)) == sorted((f"question {i}", f"answer {i}") for i in range(5000))
+
+# -------------------- Cards --------------------
+def test_card_behaves_like_the_old_dict():
+    card = studystack.Card("What is H2O?", "Water")
+    assert (card["q"], card["a"], card["answered"]) == ("What is H2O?", "Water", False)
+    assert "answered_correctly" not in card
+    assert card.get("answered_correctly") is None
+    with pytest.raises(KeyError):
+        card["answered_correctly"]
+    with pytest.raises(KeyError):
+        card["colour"] = "red"
+    card["answered"], card["answered_correctly"] = True, False
+    assert "answered_correctly" in card and card.get("answered_correctly") is False
+    assert card.pop("answered_correctly") is False
+    assert card.pop("answered_correctly", None) is None
+    assert not hasattr(card, "__dict__")
+
+# -------------------- Quiz Order --------------------
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 16, 17, 255, 1000, 4097])
+def test_lazy_permutation_is_a_bijection(n):
+    for seed in (0, 1, 12345):
+        perm = studystack.LazyPermutation(n, seed)
+        values = [perm[i] for i in range(n)]
+        assert sorted(values) == list(range(n))
+        assert all(perm.index(v) == i for i, v in enumerate(values))
+        assert values == [studystack.LazyPermutation(n, seed)[i] for i in range(n)]
+
+def test_quiz_order_matches_swap_delete_list():
+    rng = random.Random(7)
+    order = studystack.QuizOrder(300, seed=3)
+    model = [order[p] for p in range(len(order))]
+    next_slot = 300
+    for _ in range(500):
+        if model and rng.random() < 0.6:
+            p = rng.randrange(len(model))
+            assert order.remove(p) == model[p]
+            model[p] = model[-1]
+            model.pop()
+        else:
+            assert order.append(next_slot) == len(model)
+            model.append(next_slot)
+            next_slot += 1
+    assert [order[p] for p in range(len(order))] == model
+    assert all(order.index(s) == p for p, s in enumerate(model))
+    restored = studystack.QuizOrder.restore(order.size, order.seed, order.base, order.moved)
+    assert [restored[p] for p in range(len(restored))] == model
+
+@pytest.mark.parametrize("backend", ["deck.json", "deck.db"])
+def test_same_seed_gives_the_same_order(tmp_path, backend):
+    deck = open_backend(tmp_path, backend, 500)
+    deck.shuffle(42)
+    first = pairs_of(deck)
+    deck.shuffle(7)
+    assert pairs_of(deck) != first
+    deck.shuffle(42)
+    assert pairs_of(deck) == first
+    assert sorted(first) == sorted((f"question {i}", f"answer {i}") for i in range(500))
+    deck.close()
+
+@pytest.mark.parametrize("backend", ["deck.json", "deck.db"])
+def test_locate_finds_current_positions(tmp_path, backend):
+    deck = open_backend(tmp_path, backend, 200)
+    gone = deck.delete(3)
+    deck.shuffle(9)
+    keys = {pair_at(deck, i) for i in (0, 50, 150)} | {(gone["q"], gone["a"])}
+    found = dict((key, pos) for pos, key in deck.locate(keys))
+    assert len(found) == 3
+    assert all(pair_at(deck, pos) == key for key, pos in found.items())
+    deck.close()
+
+def test_sqlite_locate_reads_only_the_wanted_rows(tmp_path):
+    deck = open_backend(tmp_path, "deck.db", 5000)
+    deck.add("question 7", "another answer")
+    keys = {pair_at(deck, i) for i in range(0, 5000, 7)} | {("question 7", "answer 7"), ("nowhere", "x")}
+    statements = []
+    deck.db.set_trace_callback(statements.append)
+    found = dict((key, pos) for pos, key in deck.locate(keys))
+    deck.db.set_trace_callback(None)
+    assert len(found) == len(keys) - 1
+    assert all(pair_at(deck, pos) == key for key, pos in found.items())
+    assert len(statements) == 2 and all("WHERE qkey IN" in sql for sql in statements)
+    deck.close()
+
+def test_sqlite_deck_keeps_its_order_across_reopen(tmp_path):
+    deck = open_backend(tmp_path, "deck.db", 300)
+    deck.shuffle(5)
+    deck.delete(10)
+    deck.add("late question", "late answer")
+    deck.mark_answered(0, True)
+    expected = pairs_of(deck)
+    deck.close()
+    again = studystack.SqliteDeck(str(tmp_path / "deck.db"))
+    assert pairs_of(again) == expected
+    assert again.seed == 5 and again.correct_count() == 1 and again.next_unanswered(-1) == 1
+    again.close()
+
+# -------------------- Spaced Repetition --------------------
+def pair_at(deck, index):
+    return deck[index]["q"], deck[index]["a"]
+
+def wait_saved(scheduler):
+    deadline = time.time() + 5
+    while scheduler.saving and time.time() < deadline:
+        time.sleep(0.01)
+
+def test_scheduler_serves_new_cards_then_due_ones(tmp_path):
+    path = str(tmp_path / "deck.json")
+    write_deck(path, 5)
+    deck = studystack.JsonDeck(path)
+    sched = studystack.Scheduler(deck)
+    now, step, day = 1000.0, studystack.Scheduler.LEARN_STEP, studystack.Scheduler.DAY
+    assert sched.next_position(now) == 0
+    sched.grade(0, False, now)
+    assert sched.next_position(now) == 1      # the miss is not due yet
+    sched.grade(1, True, now)
+    assert sched.next_position(now + step) == 0
+    sched.grade(0, True, now + step)
+    assert [sched.next_position(now + step) for _ in range(4)] == [2, 3, 4, None]
+    assert sched.next_due() == now + day
+    assert sched.next_position(now + day) == 1
+
+@pytest.mark.parametrize("backend", ["deck.json", "deck.db"])
+def test_scheduler_follows_cards_the_deck_moves(tmp_path, backend):
+    deck = open_backend(tmp_path, backend, 20)
+    sched = studystack.Scheduler(deck, str(tmp_path / "deck.sched.json"))
+    key = pair_at(deck, 7)
+    sched.grade(7, False, 0.0)
+    deck.delete(0)
+    assert pair_at(deck, sched.next_position(studystack.Scheduler.LEARN_STEP)) == key
+    deck.shuffle()
+    assert pair_at(deck, sched.next_position(studystack.Scheduler.LEARN_STEP)) == key
+
+def test_scheduler_state_persists(tmp_path):
+    path = str(tmp_path / "deck.json")
+    write_deck(path, 10)
+    deck = studystack.JsonDeck(path)
+    sched = studystack.Scheduler(deck)
+    for pos in range(4):
+        sched.grade(pos, pos % 2 == 0, 100.0)
+    wait_saved(sched)
+    again = studystack.Scheduler(deck)
+    assert again.state == sched.state
+    assert again.next_due() == sched.next_due()
+
+def test_scheduler_finds_its_cards_after_reopen(tmp_path):
+    deck = open_backend(tmp_path, "deck.db", 100)
+    sched = studystack.Scheduler(deck)
+    keys = [pair_at(deck, p) for p in (4, 60)]
+    sched.grade(4, False, 0.0)
+    sched.grade(60, False, 10.0)
+    wait_saved(sched)
+    deck.close()
+    deck = studystack.SqliteDeck(str(tmp_path / "deck.db"))
+    deck.shuffle(3)
+    sched = studystack.Scheduler(deck)
+    later = 10.0 + studystack.Scheduler.LEARN_STEP
+    first = sched.next_position(later)
+    assert pair_at(deck, first) == keys[0]
+    sched.grade(first, True, later)
+    assert pair_at(deck, sched.next_position(later)) == keys[1]
+    deck.close()
+
+def test_atomic_write_replaces_whole_file(tmp_path):
+    path = str(tmp_path / "out.json")
+    def torn(f):
+        f.write("partial")
+        raise ValueError("disk full")
+
+    studystack.atomic_write(path, lambda f: f.write("old"))
+    with pytest.raises(ValueError):
+        studystack.atomic_write(path, torn)
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "old"
+    studystack.atomic_write(path, lambda f: f.write("new"))
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "new"
+
+# -------------------- Answer Matching --------------------
+def levenshtein(a, b):
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+    return row[-1]
+
+def test_edit_distance_within_matches_levenshtein():
+    rng = random.Random(11)
+    for _ in range(3000):
+        a = "".join(rng.choice("abc") for _ in range(rng.randrange(12)))
+        b = "".join(rng.choice("abc") for _ in range(rng.randrange(12)))
+        limit = rng.randrange(5)
+        d = levenshtein(a, b)
+        assert studystack.edit_distance_within(a, b, limit) == (d if d <= limit else None), (a, b, limit)
+
+def test_edit_distance_within_long_words():
+    rng = random.Random(5)
+    for _ in range(200):
+        a = "".join(rng.choice("abcdef") for _ in range(rng.randrange(60, 90)))
+        b = list(a)
+        for _ in range(rng.randrange(4)):
+            b[rng.randrange(len(b))] = rng.choice("abcdefg")
+        b = "".join(b)
+        d = levenshtein(a, b)
+        assert studystack.edit_distance_within(a, b, 3) == (d if d <= 3 else None)
+
+def test_matcher_grades_exact_typo_and_alternatives():
+    check = studystack.AnswerMatcher().check
+    assert check("  MARS! ", "Mars") == "exact"
+    assert check("cafe", "Café") == "exact"
+    assert check("color", "colour; color") == "exact"
+    assert check("United Kingdom", "UK / United Kingdom") == "exact"
+    assert check("Mississipi", "Mississippi") == "typo"
+    assert check("Venus", "Mars") is None
+    assert check("43", "42") is None
+    assert check("Mars", "Marz") is None        # too short to forgive a typo
+    assert check("", "Mars") is None
+    assert studystack.AnswerMatcher(fuzzy=False).check("Mississipi", "Mississippi") is None
+
+@pytest.mark.parametrize("typed, answer", [
+    ("1", "1/2"), ("12", "1/2"), ("h", "km/h"), ("IP", "TCP/IP"), ("s", "9.81 m/s"),
+    ("314", "3.14"), ("5", "-5"), ("12.345679", "12.345678"), ("s", "9.81 m / s"), ("10", "10 / 20")])
+def test_matcher_rejects_parts_of_an_answer(typed, answer):
+    assert studystack.AnswerMatcher().check(typed, answer) is None
+
+@pytest.mark.parametrize("typed, answer", [
+    ("1/2", "1/2"), ("km/h", "km/h"), ("KM / H", "km/h"), ("tcp/ip", "TCP/IP"), ("9.81 m/s", "9.81 m/s"),
+    ("3.14", "3.14"), ("-5", "-5"), ("UK", "UK / United Kingdom"), ("10 / 20", "10 / 20"),
+    ("Well-known.", "well known")])
+def test_matcher_accepts_whole_answers(typed, answer):
+    assert studystack.AnswerMatcher().check(typed, answer) == "exact"
+
+def test_sqlite_deck_rekeys_rows_from_an_older_normalizer(tmp_path):
+    path = str(tmp_path / "deck.db")
+    deck = studystack.SqliteDeck(path, seed_from=str(tmp_path / "none.json"))
+    deck.add("3.14", "pi")
+    with deck.db:
+        deck.db.execute("UPDATE cards SET qkey = '314' WHERE q = '3.14'")
+        deck.db.execute("DELETE FROM meta WHERE key = 'keys'")
+    deck.close()
+    deck = studystack.SqliteDeck(path)
+    assert deck.has_duplicate("3.14", "pi") and not deck.has_duplicate("314", "pi")
+    deck.close()
+
+# -------------------- Study Session --------------------
+def test_session_runs_a_round_headlessly(tmp_path):
+    path = str(tmp_path / "deck.json")
+    write_deck(path, 6)
+    session = studystack.StudySession(studystack.JsonDeck(path))
+    assert session.answer("wrong") is None
+    assert session.next() == 1
+    while True:
+        card = session.current()
+        assert session.answer(card["a"]) == "exact"
+        if session.next() is None:
+            break
+    assert session.finished() and session.score == 5
+    assert session.prev() is None
+    session.restart()
+    assert (session.score, session.card_index, session.finished()) == (0, 0, False)
+
+def test_import_leaves_tkinter_unloaded():
+    code = "import sys, studystack; print('tkinter' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    assert out.stdout.strip() == "False"
+
+# -------------------- Benchmarks --------------------
+def test_benchmark_smoke_run(tmp_path):
+    import bench_studystack
+    out = str(tmp_path / "bench.jsonl")
+    assert bench_studystack.main(["--sizes", "50", "100", "--repeat", "1", "--out", out]) == 0
+    with open(out, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert {r["size"] for r in rows} == {50, 100}
+    assert {"shape", "op", "seconds"} <= set(rows[0])
+
+# -------------------- Animation --------------------
+class FakeRoot:
+    """Stands in for Tk: after() callbacks run when the test says so."""
+
+    def __init__(self):
+        self.calls = {}
+        self.ids = 0
+
+    def after(self, ms, fn):
+        self.ids += 1
+        self.calls[self.ids] = fn
+        return self.ids
+
+    def after_cancel(self, after_id):
+        self.calls.pop(after_id, None)
+
+    def run_pending(self):
+        calls, self.calls = self.calls, {}
+        for fn in calls.values():
+            fn()
+
+def test_animator_follows_the_clock(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(studystack.time, "monotonic", lambda: clock[0])
+    root, seen, done = FakeRoot(), [], []
+    anim = studystack.Animator(root)
+    anim.run("card", 0.5, seen.append, lambda: done.append(True))
+    for dt in (0.1, 0.3, 0.3):      # a slow frame skips ahead instead of stretching
+        clock[0] += dt
+        root.run_pending()
+    assert seen == [0.0, pytest.approx(0.2), pytest.approx(0.8), 1.0]
+    assert done == [True] and not anim.busy()
+
+def test_animator_cancels_the_old_animation(monkeypatch):
+    monkeypatch.setattr(studystack.time, "monotonic", lambda: 0.0)
+    root, first, second = FakeRoot(), [], []
+    anim = studystack.Animator(root)
+    anim.run("card", 1.0, first.append)
+    anim.run("card", 1.0, second.append)
+    root.run_pending()
+    assert first == [0.0] and second == [0.0, 0.0]
+    anim.cancel("card")
+    assert not anim.busy("card") and not root.calls
+
+# -------------------- Audio --------------------
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_audio_engine_writes_effects_to_wav(tmp_path):
+    path = str(tmp_path / "out.wav")
+    engine = studystack.AudioEngine(studystack.WavFileSink(path))
+    tone = studystack.SAMPLE_RATE * studystack.TONES["correct"][1] // 1000
+    engine.play("correct")
+    engine.play("wrong")
+    engine.close()      # plays out the queued effects first
+    assert not engine.thread.is_alive()
+    with wave.open(path) as w:
+        assert (w.getnchannels(), w.getsampwidth(), w.getframerate()) == (1, 2, studystack.SAMPLE_RATE)
+        frames = w.getnframes()
+        # Both effects start together, so the file lasts as long as one tone.
+        assert frames == engine.sink.frames >= tone
+        assert any(w.readframes(frames))
+
+def test_audio_engine_loops_music_under_effects(tmp_path):
+    music = str(tmp_path / "bgm.wav")
+    with wave.open(music, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(studystack.render_tone(440, 100, 8000, 2).tobytes())
+    engine = studystack.AudioEngine(studystack.WavFileSink(str(tmp_path / "out.wav")), music)
+    assert engine.available()
+    engine.start()
+    assert wait_for(lambda: engine.sink.frames >= 8000 * 3 // 10)     # looped past the 0.1 s track
+    assert engine.sink.channels == 2
+    engine.close()
+    engine.thread.join(5)
+
+# -------------------- Bulk Import --------------------
+def write_rows(path, rows, delimiter=","):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f, delimiter=delimiter).writerows(rows)
+
+def deck_pairs(path):
+    deck = studystack.JsonDeck(path)
+    deck.wait()
+    return sorted(pairs_of(deck))
+
+def test_import_cli_adds_cards_and_reports_rejects(tmp_path, capsys):
+    deck, source, rejects = (str(tmp_path / n) for n in ("deck.json", "new.csv", "rejects.csv"))
+    write_deck(deck, 3)
+    write_rows(source, [["question", "answer"],
+                        ["What is H2O?", "Water"],
+                        ["  QUESTION 1 ", "answer 1!"],      # already in the deck
+                        ["What is H2O?", "water"],           # earlier in this file
+                        ["No answer", ""],
+                        ["Lonely field"],
+                        ["Capital of   France?", "Paris"]])
+    assert studystack.main(["--deck", deck, "--import", source, "--workers", "1", "--rejects", rejects]) == 0
+    assert "2 added, 2 duplicates, 2 rejected" in capsys.readouterr().out
+    assert deck_pairs(deck) == sorted([(f"question {i}", f"answer {i}") for i in range(3)] +
+                                      [("What is H2O?", "Water"), ("Capital of France?", "Paris")])
+    with open(rejects, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["line", "reason", "row"] and [r[0] for r in rows[1:]] == ["5", "6"]
+
+def test_import_reads_tsv_and_jsonl(tmp_path):
+    deck, tsv, jsonl = (str(tmp_path / n) for n in ("deck.json", "new.tsv", "new.jsonl"))
+    write_deck(deck, 1)
+    write_rows(tsv, [["q tab", "a, with comma"]], delimiter="\t")
+    with open(jsonl, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"question": "q obj", "answer": "a obj"}) + "\n")
+        f.write(json.dumps(["q pair", "a pair"]) + "\n")
+        f.write("{not json\n")
+    opened = studystack.JsonDeck(deck)
+    assert studystack.import_cards(opened, tsv, workers=1).added == 1
+    report = studystack.import_cards(opened, jsonl, workers=1)
+    assert (report.added, report.rejected) == (2, 1)
+    assert deck_pairs(deck) == [("q obj", "a obj"), ("q pair", "a pair"), ("q tab", "a, with comma"),
+                                ("question 0", "answer 0")]
+
+def test_import_pool_matches_inline(tmp_path):
+    source = str(tmp_path / "big.csv")
+    write_rows(source, [[f"question number {i} " + "x" * 40, f"answer {i % 700}"] for i in range(25000)])
+    assert os.path.getsize(source) > 1 << 20     # large enough to use the pool
+    inline = list(studystack.iter_import_batches(source, workers=1, chunk_size=2000))
+    pooled = list(studystack.iter_import_batches(source, workers=2, chunk_size=2000))
+    assert pooled == inline and sum(len(a) for a, _ in pooled) == 25000
+    spawned = studystack.iter_import_batches(source, workers=2, chunk_size=2000,
+                                             mp_context=multiprocessing.get_context("spawn"))
+    assert list(spawned) == inline
+
+# -------------------- Duplicates --------------------
+def test_duplicate_index_is_a_multiset():
+    index = studystack.DuplicateIndex(match_answer=True)
+    key = index.key("What is H2O?", "Water")
+    assert key == index.key("  what is h2o ", "WATER!")
+    assert key != index.key("What is H2O?", "Ice")
+    index.add_key(key)
+    index.add_key(key)
+    assert key in index and len(index) == 1
+    index.discard_key(key)
+    assert key in index
+    index.discard_key(key)
+    assert key not in index
+
+def test_duplicate_keys_follow_match_answer():
+    by_question = studystack.DuplicateIndex(match_answer=False)
+    assert by_question.key("Capital of France?", "Paris") == by_question.key("capital of france", "paris, fr")
+    both = studystack.DuplicateIndex(match_answer=True)
+    assert both.key("Capital of France?", "Paris") != both.key("capital of france", "paris, fr")
+    # All-punctuation questions still get keys of their own.
+    assert both.key("???", "x") != both.key("!!!", "x")
+
+@pytest.mark.parametrize("backend", ["deck.json", "deck.db"])
+def test_deck_dedupe_keeps_first_copies(tmp_path, backend):
+    source = str(tmp_path / "source.json")
+    with open(source, "w", encoding="utf-8") as f:
+        json.dump([["Q1", "A1"], ["Q2", "A2"], ["q1!", "a1"], ["Q3", "A3"], [" q2", "A2."]], f)
+    path = str(tmp_path / backend)
+    deck = studystack.JsonDeck(source) if backend.endswith(".json") else studystack.SqliteDeck(path, seed_from=source)
+    assert deck.has_duplicate("q3", "a3") and not deck.has_duplicate("Q4", "A4")
+    removed = deck.dedupe()
+    assert len(removed) == 2 and len(deck) == 3
+    assert sorted(studystack.normalize_answer(q) for q, _ in pairs_of(deck)) == ["q1", "q2", "q3"]
+    assert deck.dedupe() == []
+    deck.add("Q4", "A4")
+    assert deck.has_duplicate("q4", "a4")
+    deck.close()
+
+# -------------------- Search --------------------
+def brute_search(cards, query):
+    terms = studystack.search_words(query)
+    return {id(c) for c in cards
+            if all(any(w.startswith(t) for w in studystack.search_words(c.q + " " + c.a)) for t in terms)}
+
+def built_index(cards):
+    index = studystack.TextIndex(cards)
+    while not index.build(100):
+        pass
+    return index
+
+def test_text_index_matches_brute_force():
+    rng = random.Random(2)
+    vocab = ["apple", "apricot", "banana", "band", "bandit", "cherry", "café", "cab", "zebra"]
+    cards = [studystack.Card(" ".join(rng.sample(vocab, 2)), rng.choice(vocab)) for _ in range(400)]
+    index = built_index(cards)
+    for _ in range(200):
+        query = " ".join(rng.choice(vocab)[:rng.randrange(1, 5)] for _ in range(rng.randrange(1, 4)))
+        assert {id(c) for c in index.search(query, limit=len(cards))} == brute_search(cards, query), query
+
+def test_text_index_tracks_adds_and_removes():
+    cards = [studystack.Card(f"river {i}", "water") for i in range(10)]
+    index = studystack.TextIndex(cards)
+    index.remove(cards[0])      # before the build reaches it
+    while not index.build(3):
+        pass
+    extra = studystack.Card("Rivet gun", "tool")
+    index.add(extra)
+    index.remove(cards[1])
+    assert {id(c) for c in index.search("riv", 50)} == {id(c) for c in cards[2:] + [extra]}
+    assert index.search("gun riv", 50) == [extra]
+    assert index.search("zzz", 50) == []
+    assert len(index.search("water", 3)) == 3
+
+@pytest.mark.parametrize("backend", ["deck.json", "deck.db"])
+def test_deck_search_finds_positions(tmp_path, backend):
+    source = str(tmp_path / "source.json")
+    write_deck(source, 300)
+    path = str(tmp_path / backend)
+    deck = studystack.JsonDeck(source) if backend.endswith(".json") else studystack.SqliteDeck(path, seed_from=source)
+    deck.wait()
+    while not deck.build_search():
+        pass
+    found = deck.search("answer 123", 10)
+    assert [(c["q"], c["a"]) for c in found] == [("question 123", "answer 123")]
+    assert pair_at(deck, deck.position(found[0])) == ("question 123", "answer 123")
+    deck.close()
+
+# -------------------- Deck Browser --------------------
+@pytest.mark.parametrize("backend", ["deck.json", "deck.db"])
+def test_listing_sorts_and_deletes_in_one_batch(tmp_path, backend):
+    deck = open_backend(tmp_path, backend, 60)
+    listing = studystack.DeckListing(deck)
+    listing.set_order("q", order=deck.sort_order("q"))
+    questions = [c["q"] for c in listing.rows(0, len(listing))]
+    assert questions == sorted(questions, key=studystack.normalize_answer)
+    assert [c["q"] for c in listing.rows(10, 5)] == questions[10:15]
+    doomed = listing.cards_at([0, 1, 2, 40])
+    removed = deck.delete_many(doomed)
+    listing.discard(removed)
+    assert len(deck) == len(listing) == 56
+    assert [c["q"] for c in listing.rows(0, len(listing))] == [q for i, q in enumerate(questions)
+                                                             if i not in (0, 1, 2, 40)]
+    deck.close()
+
+@pytest.mark.parametrize("backend", ["deck.json", "deck.db"])
+def test_session_delete_many_keeps_the_current_card(tmp_path, backend):
+    session = studystack.StudySession(open_backend(tmp_path, backend, 30))
+    session.card_index = 20
+    current = pair_at(session.deck, 20)
+    session.delete_many([session.deck[i] for i in (0, 5, 29)])
+    assert len(session.deck) == 27
+    assert pair_at(session.deck, session.card_index) == current
+    session.deck.close()
+
+# -------------------- Session Checkpoint --------------------
+def study(path, answers=40):
+    """Answer some cards, skip around and delete one; returns the session."""
+    deck = studystack.JsonDeck(path, seed=1)
+    session = studystack.StudySession(deck)
+    studystack.SessionCheckpoint(path).start(session)
+    for i in range(answers):
+        session.record(session.card_index, i % 3 != 0)
+        if i == answers // 2:
+            session.delete()
+        session.next()
+    session.next()
+    return session
+
+def answered_questions(deck):
+    return {deck[p]["q"] for p in deck.answered_positions()}
+
+def check_resumed(path, studied, wait_first):
+    deck = studystack.JsonDeck(path)
+    if wait_first:
+        deck.wait()
+    session = studystack.StudySession(deck)
+    checkpoint = studystack.SessionCheckpoint(path)
+    checkpoint.resume(session, checkpoint.load())
+    if deck.loading:
+        deck.wait()
+        checkpoint.loaded(session)
+    assert deck.seed == studied.deck.seed
+    assert session.score == studied.score
+    assert deck.correct_count() == studied.deck.correct_count()
+    assert answered_questions(deck) == answered_questions(studied.deck)
+    assert session.current()["q"] == studied.current()["q"]
+    checkpoint.close()
+
+@pytest.mark.parametrize("wait_first", [True, False])
+def test_checkpoint_resumes_from_snapshot(tmp_path, wait_first):
+    path = str(tmp_path / "deck.json")
+    write_deck(path, 1000)
+    studied = study(path)
+    studied.checkpoint.close(studied)
+    assert studystack.SessionCheckpoint(path).load()["seq"] > 0
+    check_resumed(path, studied, wait_first)
+
+@pytest.mark.parametrize("wait_first", [True, False])
+def test_checkpoint_replays_log(tmp_path, wait_first):
+    path = str(tmp_path / "deck.json")
+    write_deck(path, 1000)
+    studied = study(path)
+    studied.checkpoint.close()      # flush the log, no final snapshot
+    with open(studied.checkpoint.log, encoding="utf-8") as f:
+        assert sum(1 for _ in f) > 40
+    check_resumed(path, studied, wait_first)
+
+def test_checkpoint_ignores_other_versions(tmp_path):
+    path = str(tmp_path / "deck.json")
+    checkpoint = studystack.SessionCheckpoint(path)
+    with open(checkpoint.snapshot, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "seq": 0, "answers": [[0, 1, 0]]}, f)
+    assert checkpoint.load() is None
+
+def test_checkpoint_without_snapshot_is_empty(tmp_path):
+    assert studystack.SessionCheckpoint(str(tmp_path / "deck.json")).load() is None
+
+# -------------------- Stats --------------------
+def test_histogram_percentiles_bound_samples():
+    hist = studystack.Histogram()
+    for us in range(1, 1001):
+        hist.add(us / 1e6)
+    assert hist.count == 1000 and hist.max == 1000 / 1e6
+    for q in (0.5, 0.95, 0.99):
+        exact = q * 1000 / 1e6
+        assert exact <= hist.percentile(q) <= 2 * exact
+
+def test_stats_record_only_while_enabled(tmp_path):
+    stats = studystack.Stats()
+    work = stats.timed("work")(lambda x: x * 2)
+    assert work(2) == 4
+    stats.count("hits")
+    assert stats.snapshot()["ops"] == {} and stats.snapshot()["counters"] == {}
+    stats.enable()
+    for i in range(5):
+        work(i)
+    stats.count("hits", 3)
+    stats.wrote("deck", 100)
+    data = stats.snapshot()
+    assert data["ops"]["work"]["count"] == 5
+    assert data["counters"] == {"hits": 3} and data["bytes"] == {"deck": 100}
+
+    stats.export(str(tmp_path / "stats.json"))
+    with open(tmp_path / "stats.json", encoding="utf-8") as f:
+        assert json.load(f)["ops"]["work"]["count"] == 5
+    stats.export(str(tmp_path / "stats.csv"))
+    with open(tmp_path / "stats.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["kind"], r["name"]) for r in rows] == [
+        ("latency", "work"), ("counter", "hits"), ("bytes", "deck")]
+
+def test_stats_csv_keeps_single_line_endings_on_windows(tmp_path, monkeypatch):
+    write = studystack.atomic_write
+    def windows_text_mode(path, fn, newline=None):
+        # Text mode on Windows turns every "\n" into os.linesep, "\r\n".
+        write(path, fn, "\r\n" if newline is None else newline)
+    monkeypatch.setattr(studystack, "atomic_write", windows_text_mode)
+    stats = studystack.Stats()
+    stats.enable()
+    stats.count("hits")
+    stats.export(str(tmp_path / "stats.csv"))
+    data = (tmp_path / "stats.csv").read_bytes()
+    assert b"\r\r\n" not in data and data.count(b"\r\n") == 2
+
+# -------------------- Workspace --------------------
+def test_mapped_text_decodes_across_chunks(tmp_path):
+    path = tmp_path / "deck.json"
+    pairs = [[f"café {i} ✓", f"naïve {i}"] for i in range(200)]
+    path.write_text(json.dumps(pairs, ensure_ascii=False), encoding="utf-8")
+    text = studystack.MappedText(str(path))
+    try:
+        assert list(studystack.iter_json_array(text, chunk_size=7)) == pairs
+    finally:
+        text.close()
+
+def test_workspace_lists_and_evicts_least_recent_decks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("decks")
+    for name in ("b.json", "A.json", "c.json"):
+        write_deck(os.path.join("decks", name), 100)
+    (tmp_path / "decks" / "a.session.json").write_text("{}")
+    workspace = studystack.Workspace("decks", budget=2 * 100 * studystack.CARD_OVERHEAD_BYTES + 8000)
+    assert workspace.decks() == [os.path.join("decks", n) for n in ("A.json", "b.json", "c.json")]
+
+    a, b, c = workspace.decks()
+    session_a, _, saved = workspace.open(a)
+    assert saved is None
+    session_a.deck.wait()
+    session_a.record(session_a.card_index, True)
+    workspace.open(b)[0].deck.wait()
+    assert workspace.open(a)[0] is session_a       # cached: the same live session
+    workspace.open(c)[0].deck.wait()
+    workspace.evict()
+    assert list(workspace.cache) == [a, c]          # b was least recently used
+
+    workspace.close_all()
+    session, checkpoint, saved = workspace.open(a)
+    assert saved is not None and saved["score"] == 1
+    checkpoint.resume(session, saved)
+    assert session.deck.correct_count() == 1
+    workspace.close_all()
+
+def test_workspace_stops_and_costs_decks_still_loading(tmp_path):
+    path = str(tmp_path / "deck.json")
+    write_deck(path, 200000)
+    deck = studystack.JsonDeck(path)
+    assert deck.loading
+    cost = studystack.Workspace.cost(studystack.StudySession(deck))
+    assert cost >= 0.8 * 200000 * studystack.CARD_OVERHEAD_BYTES
+    deck.close()
+    deck.wait()
+    assert not deck.loading and len(deck) < 200000
+
+# -------------------- Batch Grading --------------------
+def test_grade_cli_scores_sheets_and_ranks_cards(tmp_path, capsys):
+    deck, sheets, scores, difficulty, rejects = (
+        str(tmp_path / n) for n in ("deck.json", "sheets.jsonl", "scores.csv", "hard.csv", "rejects.csv"))
+    with open(deck, "w", encoding="utf-8") as f:
+        json.dump([["Capital of France?", "Paris"], ["Largest planet?", "Jupiter"],
+                   ["Red planet?", "Mars"]], f)
+    with open(sheets, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"student": "ann", "answers": {"0": "paris", "1": "Jupitr", "2": "Venus"}}) + "\n")
+        f.write(json.dumps({"0": "Paris", "2": "Mars", "9": "??"}) + "\n")     # flat sheet, unknown id
+        f.write("{not json\n")
+        f.write(json.dumps(["a", "list"]) + "\n")
+    assert studystack.main(["--deck", deck, "--grade", sheets, "--workers", "1", "--scores", scores,
+                            "--difficulty", difficulty, "--rejects", rejects]) == 0
+    assert "2 sheets, 5 answers" in capsys.readouterr().err
+    with open(scores, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows == [studystack.GradeReport.SCORE_FIELDS,
+                    ["1", "ann", "3", "2", "1", "0", "66.67"],
+                    ["2", "line 2", "2", "2", "0", "1", "100.0"]]
+    with open(difficulty, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert [(r[0], r[3], r[4]) for r in rows[1:]] == [("2", "2", "1"), ("0", "2", "2"), ("1", "1", "1")]
+    with open(rejects, encoding="utf-8", newline="") as f:
+        assert [r[0] for r in csv.reader(f)][1:] == ["3", "4"]
+
+def test_grade_pool_matches_inline(tmp_path):
+    sheets = str(tmp_path / "sheets.jsonl")
+    key = {str(i): f"answer {i}" for i in range(50)}
+    with open(sheets, "w", encoding="utf-8") as f:
+        for s in range(6000):
+            answers = {str(i): f"answer {i}" if (s + i) % 3 else "wrong" for i in range(0, 50, 2)}
+            f.write(json.dumps({"student": f"student {s}", "answers": answers}) + "\n")
+    assert os.path.getsize(sheets) > 1 << 20
+    inline = list(studystack.iter_grade_batches(sheets, key, workers=1, chunk_size=500))
+    pooled = list(studystack.iter_grade_batches(sheets, key, workers=2, chunk_size=500))
+    assert pooled == inline and sum(len(s) for s, _, _ in pooled) == 6000
+
+# -------------------- Classroom Server --------------------
+def answer_for(card):
+    return card["q"].replace("question", "answer")
+
+def test_quiz_server_scores_players_and_ranks_them(tmp_path):
+    path = str(tmp_path / "deck.json")
+    write_deck(path, 5)
+    deck = studystack.JsonDeck(path)
+    deck.wait()
+    server = studystack.QuizServer(deck)
+    assert server.dispatch({"op": "card"}, None)[0] == {"error": "join first"}
+    assert "error" in server.dispatch({"op": "join", "name": "  "}, None)[0]
+
+    reply, ann = server.dispatch({"op": "join", "name": "ann"}, None)
+    assert reply["score"] == 0 and reply["card"]["total"] == 5
+    reply, _ = server.dispatch({"op": "answer", "text": answer_for(reply["card"])}, ann)
+    assert reply["verdict"] == "exact" and reply["score"] == 1
+    reply, _ = server.dispatch({"op": "answer", "text": "nope"}, ann)
+    assert reply["verdict"] is None and reply["score"] == 1
+    _, bob = server.dispatch({"op": "join", "name": "bob"}, None)
+    for _ in range(5):
+        card = server.dispatch({"op": "card"}, bob)[0]["card"]
+        server.dispatch({"op": "answer", "text": answer_for(card)}, bob)
+    assert server.dispatch({"op": "answer", "text": "x"}, bob)[0] == {"error": "no card left to answer"}
+    assert server.dispatch({"op": "leaderboard"}, None)[0] == {
+        "leaders": [["bob", 5, 5], ["ann", 1, 2]], "players": 2}
+    assert server.dispatch({"op": "join", "name": "ann"}, None)[1] is ann    # rejoin keeps progress
+
+def test_quiz_server_over_the_network(tmp_path):
+    path = str(tmp_path / "deck.json")
+    write_deck(path, 20)
+    proc = subprocess.Popen([sys.executable, studystack.__file__, "--deck", path, "--serve", "127.0.0.1:0"],
+                            stdout=subprocess.PIPE, text=True, cwd=str(tmp_path))
+    try:
+        line = proc.stdout.readline()
+        assert line.startswith("Serving 20 cards on ")
+        host, port = studystack.parse_address(line.split()[-1])
+        client = studystack.QuizClient(host, port)
+        try:
+            card = client.request("join", name="ann")["card"]
+            for _ in range(3):
+                reply = client.request("answer", text=answer_for(card), id=7)
+                assert reply["verdict"] == "exact" and reply["id"] == 7
+                card = reply["card"]
+            assert "error" in client.request("bogus")
+            client.file.write(b"[1, 2]\n")
+            client.file.flush()
+            assert json.loads(client.file.readline())["error"].startswith("bad request")
+        finally:
+            client.close()
+        client = studystack.QuizClient(host, port)     # a dropped client rejoins where it left off
+        try:
+            assert client.request("join", name="ann")["score"] == 3
+            assert client.request("leaderboard")["leaders"] == [["ann", 3, 3]]
+        finally:
+            client.close()
+    finally:
+        proc.kill()
+        proc.wait()